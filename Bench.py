@@ -0,0 +1,166 @@
+from Board import Board
+from generateTree import Tree, EvalCache, SearchState
+import argparse
+import json
+import subprocess
+import time
+
+# Benchmark of the engine on a fixed set of positions
+#
+# Every position is searched with iterative deepening from depth 1 to the bench depth without any time limit, so the
+# number of nodes searched is always the same for the same code. The total number of nodes is the signature of the
+# bench: if a change wasn't meant to change the search, the signature must stay the same. NPS and time-to-depth show
+# if a change made the engine faster.
+#
+# Use from the command line: python Bench.py [--depth 3] [--suite demo] [--json bench.json]
+# Or with the UCI command: bench [depth]
+
+# Constants:
+DEFAULT_BENCH_DEPTH = 3
+DEFAULT_Q_DEPTH = 5
+
+# Positions of the bench, by suite
+POSITIONS = {
+    # Positions from MiniMaxDemo.py
+    'demo': [
+        "3k3q/8/8/6N1/8/8/8/1K6 w - - 0 1",
+        "3k4/1n6/8/8/8/8/5N2/3K4 w - - 0 1",
+        "k7/8/4n3/3P4/8/8/8/K7 w - - 0 1",
+        "3k4/q7/6b1/4N3/8/P7/1PP5/1K6 w - - 0 1",
+        "k7/8/8/3r4/8/8/4B3/2K5 w - - 0 1",
+        "1Q2qk2/4pp2/8/8/8/8/8/K5R1 w - - 0 1",
+        "2r5/pp4P1/5R2/8/4k3/8/7P/4K3 w - - 0 1",
+        "8/1k6/2n1n3/3K4/8/8/8/8 w - - 0 1",
+        "8/8/8/8/3k4/2N1N3/1K6/8 b - - 0 1",
+        "k7/5p2/8/8/2n5/8/8/1bK2R2 w - - 0 1",
+        "3k3r/q7/6b1/4N1p1/7P/P5P1/1PP5/1K6 w - - 0 1",
+        "1k1q2b1/1pp1r3/p4r2/3n4/5N2/P7/BPPQ4/1KR5 w - - 0 1",
+    ],
+    # Standard middlegame positions (perft and engine bench positions)
+    'middlegame': [
+        "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        "r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4",
+        "rn1qkb1r/4pppp/p5b1/1p2N3/5N2/3B4/PP1Q1PPP/R3K2R b KQkq - 0 16",
+    ],
+    # Standard endgame positions
+    'endgame': [
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "8/8/1p1k4/p1p5/P1P1K3/1P6/8/8 w - - 0 1",
+        "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+        "8/5pk1/6p1/8/3R4/6P1/r4PK1/8 b - - 0 1",
+        "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1",
+    ],
+}
+
+# Searches one position with iterative deepening
+#
+# Parameters:
+#   fen: the position to search
+#   depth: the depth to search to
+#   q_depth: the quiescence depth
+#
+# Returns a dict with the results of the search
+def bench_position(fen: str, depth: int = DEFAULT_BENCH_DEPTH, q_depth: int = DEFAULT_Q_DEPTH) -> dict:
+    board = Board(fen)
+    eval_cache = EvalCache()
+    # Shared between the iterations like in MiniMax
+    search_state = SearchState()
+    nodes = 0
+    time_to_depth = []
+    tree = None
+    start_time = time.perf_counter()
+
+    for current_depth in range(1, depth + 1):
+        tree = Tree(board, current_depth, q_depth=q_depth, eval_cache=eval_cache, search_state=search_state)
+        while (tree.next()):
+            pass
+        search_state.update(board, tree.get_pv())
+        nodes += tree.get_nodes_searched()
+        time_to_depth.append(time.perf_counter() - start_time)
+
+    search_time = time_to_depth[-1]
+    return {'fen': fen,
+            'nodes': nodes,
+            'time': search_time,
+            'nps': nodes / search_time if search_time > 0 else 0,
+            'time_to_depth': time_to_depth,
+            'best_move': str(tree.best_move()),
+            'score': tree.root().score}
+
+# Returns the commit of the code being benched, None if it isn't in a git repository
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], text=True, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Runs the bench
+#
+# Parameters:
+#   depth: the depth to search every position to
+#   suites: the suites of POSITIONS to run (default value is None - every suite)
+#   q_depth: the quiescence depth
+#   verbose: print the result of every position
+#
+# Returns a dict with the results of every position and the totals
+def run_bench(depth: int = DEFAULT_BENCH_DEPTH, suites: list[str] = None, q_depth: int = DEFAULT_Q_DEPTH,
+              verbose: bool = True) -> dict:
+    suites = suites if suites != None else list(POSITIONS.keys())
+    positions = []
+
+    for suite in suites:
+        for fen in POSITIONS[suite]:
+            result = bench_position(fen, depth, q_depth)
+            result['suite'] = suite
+            positions.append(result)
+            if verbose:
+                print(f"{suite:<10} nodes {result['nodes']:>9} time {result['time']:8.3f} nps {result['nps']:9.0f} "
+                      + f"bestmove {result['best_move']} fen {fen}")
+
+    nodes = sum(result['nodes'] for result in positions)
+    bench_time = sum(result['time'] for result in positions)
+    results = {'commit': get_commit(),
+               'depth': depth,
+               'q_depth': q_depth,
+               'suites': suites,
+               'positions': positions,
+               'nodes': nodes,
+               'time': bench_time,
+               'nps': nodes / bench_time if bench_time > 0 else 0,
+               # Time to reach every depth, summed over the positions
+               'time_to_depth': [sum(result['time_to_depth'][i] for result in positions) for i in range(depth)],
+               'signature': nodes}
+    if verbose:
+        print_summary(results)
+    return results
+
+# Prints the totals of a bench
+def print_summary(results: dict) -> None:
+    print("===========================")
+    print(f"Total time (s) : {results['time']:.3f}")
+    print(f"Nodes searched : {results['nodes']}")
+    print(f"Nodes/second   : {results['nps']:.0f}")
+    for depth, time_to_depth in enumerate(results['time_to_depth'], start=1):
+        print(f"Time to depth {depth} : {time_to_depth:.3f}")
+    print(f"Signature      : {results['signature']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine on a fixed set of positions")
+    parser.add_argument("--depth", type=int, default=DEFAULT_BENCH_DEPTH, help="depth to search every position to")
+    parser.add_argument("--q-depth", type=int, default=DEFAULT_Q_DEPTH, help="quiescence depth")
+    parser.add_argument("--suite", action="append", choices=list(POSITIONS.keys()), help="suite to run (default: all)")
+    parser.add_argument("--json", help="file to write the results to as JSON")
+    args = parser.parse_args()
+
+    results = run_bench(args.depth, args.suite, args.q_depth)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Results saved to: " + args.json)
+
+if __name__ == "__main__":
+    main()
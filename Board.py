@@ -440,8 +440,43 @@ class PieceActionInfo:
     def __str__(self):
         return "Valid Moves: " + str(self.valid_move_coords) + "\nAttack Coords: " + str(self.attack_coords)
 
+# Class used to keep the moves which give check to the king of the team that isn't moving - computed once per position
+# by Board._get_check_info() so Board.move_causes_check() is a lookup
+#
+# NOTE: Squares are stored as row * 8 + col
+class CheckInfo:
+    # Creates a CheckInfo Object
+    #
+    # Parameters:
+    #   check_squares: The squares each piece type gives direct check from, indexed by the piece type's value
+    #   line_extensions: For a piece which is the first piece on a line from the king, the piece type moving along the
+    #       line (rook or bishop) and the squares further along the line (a rook, bishop or queen moving there, or a pawn
+    #       promoting to one, gives check since it stops blocking its own line)
+    #   discovered_lines: For a piece blocking a line from the king to a rook, bishop or queen of its team, the squares of
+    #       the line (moving to any other square gives a discovered check)
+    def __init__(self, check_squares: list[set[int]], line_extensions: dict[int, tuple[PieceType, set[int]]], 
+                 discovered_lines: dict[int, set[int]]):
+        self.check_squares: list[set[int]] = check_squares
+        self.line_extensions: dict[int, tuple[PieceType, set[int]]] = line_extensions
+        self.discovered_lines: dict[int, set[int]] = discovered_lines
+
+# Seed for the random numbers used to hash the pawn structure
+# Fixed so every board gives the same pawn hash for the same pawn structure (the pawn table is shared between boards)
+PAWN_HASH_SEED: int = 506
+# Random numbers used to hash the pawn structure, one for each square for each team (indexed by the team color's value)
+# The index 0 is for A1, 1 for B1, 8 for A2, etc
+_pawn_random = random.Random(PAWN_HASH_SEED)
+PAWN_ZOBRIST_TABLE: list[list[int]] = [[_pawn_random.getrandbits(64) for i in range(64)] for j in range(2)]
+
 # Class used to keep track of all piece locations and where they can capture
 class PieceTracker:
+    # Values of each piece type indexed by the piece type's value (same values as Board.get_piece_value)
+    _PIECE_VALUES: list[int] = [1, 3, 3, 5, 9, 200]
+    # Indexes of the white rooks, bishops and queens in the piece locations (add 6 for black)
+    _ROOK_INDEX: int = PieceType.ROOK.value
+    _BISHOP_INDEX: int = PieceType.BISHOP.value
+    _QUEEN_INDEX: int = PieceType.QUEEN.value
+
     # Creates a PieceTracker Object
     def __init__(self):
         # List of dicts for piece locations
@@ -453,6 +488,16 @@ class PieceTracker:
 
         # Number of pieces
         self._piece_count: int = 0
+
+        # Running totals used by the evaluation, updated whenever a piece is added or removed
+        # Difference between the material value of white and black pieces (white - black)
+        self._material: int = 0
+        # Material value of all the pieces on the board
+        self._total_material: int = 0
+        # Number of pawns in each column for each team (indexed by the team color's value)
+        self._pawn_columns: list[list[int]] = [[0 for i in range(8)] for j in range(2)]
+        # Zobrist style hash of the pawns only (see PAWN_ZOBRIST_TABLE)
+        self._pawn_hash: int = 0
     
     # Gets the piece index for a specific team and piece type
     #
@@ -485,6 +530,8 @@ class PieceTracker:
     def add_piece(self, piece: Piece, coord: Coordinate, piece_action_info: PieceActionInfo):
         # Add to the piece count
         self._piece_count += 1
+        # Add the piece to the running totals
+        self.__update_totals(piece, coord, 1)
         # Add the piece to the piece locations
         self.update_piece(piece, coord, piece_action_info)
     
@@ -506,9 +553,53 @@ class PieceTracker:
     def remove_piece(self, piece: Piece, coord: Coordinate):
         # Remove from the piece count
         self._piece_count -= 1
+        # Remove the piece from the running totals
+        self.__update_totals(piece, coord, -1)
         # Remove the piece from the piece locations
         del self._piece_locations[self._get_locations_index(piece.Type, piece.Color)][coord]
     
+    # Private method that updates the material and pawn column totals when a piece is added or removed
+    #
+    # Parameters:
+    #   piece: The piece being added or removed
+    #   coord: The coordinate of the piece
+    #   sign: 1 if the piece is being added, -1 if the piece is being removed
+    def __update_totals(self, piece: Piece, coord: Coordinate, sign: int):
+        value = self._PIECE_VALUES[piece.Type.value] * sign
+        self._total_material += value
+        if (piece.Color == TeamColor.WHITE):
+            self._material += value
+        else:
+            self._material -= value
+        
+        if (piece.Type == PieceType.PAWN):
+            self._pawn_columns[piece.Color.value][coord.col] += sign
+            # XOR is its own inverse so adding and removing a pawn is the same operation
+            self._pawn_hash ^= PAWN_ZOBRIST_TABLE[piece.Color.value][coord.row * 8 + coord.col]
+
+    # Gets the difference between the material value of white and black pieces (white - black)
+    def get_material(self) -> int:
+        return self._material
+
+    # Gets the material value of all the pieces on the board
+    def get_total_material(self) -> int:
+        return self._total_material
+
+    # Gets the hash of the pawn structure
+    def get_pawn_hash(self) -> int:
+        return self._pawn_hash
+
+    # Gets the number of pawns in each column for a team
+    #
+    # Parameters:
+    #   team_color: The team color of the pawns
+    #
+    # NOTE: Returns the list used by the tracker, do not modify it
+    #
+    # Returns a list of 8 pawn counts (one for each column)
+    def get_pawn_columns(self, team_color: TeamColor) -> list[int]:
+        return self._pawn_columns[team_color.value]
+
     # Gets the piece locations for a specific team and piece type
     #
     # Parameters:
@@ -520,6 +611,18 @@ class PieceTracker:
         # Get the piece locations
         return self._piece_locations[self._get_locations_index(piece_type, team_color)]
 
+    # Gets the locations of the pieces that can pin a piece to the king (rooks, bishops and queens) of a team
+    #
+    # Parameters:
+    #   team_color: The team color of the pieces to get
+    #
+    # Returns a tuple of (piece locations, moves along straight lines, moves along diagonals) for the rooks, bishops and queens
+    def get_pinning_piece_locations(self, team_color: TeamColor) -> tuple[tuple[dict[Coordinate, PieceActionInfo], bool, bool], ...]:
+        offset = 6 if team_color == TeamColor.BLACK else 0
+        return ((self._piece_locations[self._ROOK_INDEX + offset], True, False),
+                (self._piece_locations[self._BISHOP_INDEX + offset], False, True),
+                (self._piece_locations[self._QUEEN_INDEX + offset], True, True))
+
     # Gets the pieces as a list of PieceCoordinate for a specific team and piece type
     #
     # Parameters:
@@ -571,6 +674,57 @@ class PieceTracker:
 
 
 
+# Class for a bounded cache of pawn structure scores
+#
+# Used by Board._pawn_structure so pawn structures that were already scored don't need to be scored again
+# Entries are stored in a fixed size list indexed by the pawn hash, a new entry replaces the entry in the same slot
+class PawnHashTable:
+    # Default number of entries (power of 2 so the index can be found with a mask)
+    DEFAULT_SIZE: int = 1 << 14
+
+    # Creates a PawnHashTable object
+    #
+    # Parameters:
+    #   size: The number of entries in the table (rounded up to a power of 2)
+    def __init__(self, size: int = DEFAULT_SIZE):
+        size = 1 << max(size - 1, 0).bit_length()
+        self._mask: int = size - 1
+        # Each entry is a tuple of (pawn hash, score) or None if empty
+        # Stored as a tuple so the hash and score are always set together
+        self._entries: list[tuple[int, float]] = [None] * size
+        self.hits: int = 0
+        self.misses: int = 0
+    
+    # Gets the score for a pawn hash
+    #
+    # Parameters:
+    #   pawn_hash: The pawn hash to get the score for
+    #
+    # Returns the score, or None if the pawn hash isn't in the table
+    def get(self, pawn_hash: int) -> float:
+        entry = self._entries[pawn_hash & self._mask]
+        if (entry != None and entry[0] == pawn_hash):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    # Stores the score for a pawn hash
+    #
+    # Parameters:
+    #   pawn_hash: The pawn hash to store the score for
+    #   score: The score of the pawn structure
+    def store(self, pawn_hash: int, score: float):
+        self._entries[pawn_hash & self._mask] = (pawn_hash, score)
+
+    # Removes every entry and resets the hit and miss counters
+    def clear(self):
+        self._entries = [None] * len(self._entries)
+        self.hits = 0
+        self.misses = 0
+
+
+
 # Class for a chess board
 # 
 # Used to keep track of the chess board and make moves
@@ -578,6 +732,14 @@ class Board:
     # Score for a checkmate when evaluated
     CHECKMATE_SCORE: int = 1000000
 
+    # Directions (row, col) of the lines from the king walked to find pins (straight lines first, then diagonals)
+    _KING_RAY_DIRECTIONS: tuple[tuple[int, int], ...] = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+    # Offsets (row, col) of the spaces a knight attacks
+    _KNIGHT_OFFSETS: tuple[tuple[int, int], ...] = ((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2))
+
+    # Cache of pawn structure scores shared by every board (so it's shared by the boards used in a search)
+    _pawn_table: PawnHashTable = PawnHashTable()
+
     # The board 2D array of pieces (8x8 board)
     _board_arr: list[list[Piece]]
 
@@ -615,9 +777,18 @@ class Board:
     _white_valid_moves: list[Move] | None
     _black_valid_moves: list[Move] | None
 
+    # The moves giving check in the current position - used as a cache by move_causes_check()
+    _check_info: CheckInfo | None
+
     # Keeps track of the current Zobrist table of the position
     _zobrist_table: list[list[int]]
 
+    # Seed for the zobrist random numbers (fixed so the same position has the same hash on every board and every run)
+    ZOBRIST_SEED: int = 4506
+
+    # The (zobrist table, zobrist misc) shared by every board, created by the first board
+    _shared_zobrist_tables: tuple[list[list[int]], list[list[int]]] | None = None
+
     # Keep track of the current zobrist hash of the position
     _zobrist_hash: int
 
@@ -671,6 +842,7 @@ class Board:
         # Reset the valid moves
         self._white_valid_moves = None
         self._black_valid_moves = None
+        self._check_info = None
 
         # Reset the previous moves
         self._previous_moves = deque()
@@ -792,8 +964,17 @@ class Board:
 
         # Get the king location for the team who's turn it is
         king_coord = self._pieces.get_king_coord(self._turn)
-        # Get the valid check coordinates for the king
-        valid_check_coords: list[Coordinate] | None = self._get_valid_check_coords(king_coord, other_team)
+        king_in_check = self._team_attacking_coord(other_team, king_coord)
+        # When not in check, a king move is legal if the space isn't under attack. Check the king moves first since they
+        #   don't need the masks
+        if (not king_in_check):
+            for to_coord in self._pieces.get_piece_locations_and_action_info(PieceType.KING, self._turn)[king_coord].valid_move_coords:
+                if (not self._team_attacking_coord(other_team, to_coord)):
+                    # Game is not over (there's a legal move)
+                    return False
+
+        # Get the check mask, pin masks and king danger coordinates once for every move
+        check_mask, pin_masks, king_danger = self._get_legal_move_masks(king_coord, self._turn, other_team)
 
         for piece_type in PieceType:
             # Get the pieces for the piece type
@@ -801,44 +982,32 @@ class Board:
 
             # Check if the piece type is a king
             if (piece_type == PieceType.KING):
-                # Get the pieces attacking the king from the attack array
-                from_attack_dict = self._attack_arr[king_coord.row][king_coord.col][other_team]
+                # The king moves were already checked if not in check
+                if (not king_in_check):
+                    continue
                 for to_coord in piece_locations[king_coord].valid_move_coords:
-                    # Get the row direction fo the move (positive, negative, or zero)
-                    row_dir =   (SignDirection.ZERO if to_coord.row == king_coord.row else 
-                                (SignDirection.POSITIVE if to_coord.row > king_coord.row else SignDirection.NEGATIVE))
-                    
-                    # Get the column direction of the move (positive, negative, or zero)
-                    col_dir =   (SignDirection.ZERO if to_coord.col == king_coord.col else 
-                                (SignDirection.POSITIVE if to_coord.col > king_coord.col else SignDirection.NEGATIVE))
-
-                    # Check if the king is not in check after the move
-                    # Checks both if the space the king is moving to is under attack and if any of the pieces previously attacking it still do
-                    if (self._team_attacking_coord(other_team, to_coord) or
-                        self._move_puts_king_in_check(king_coord, to_coord, row_dir, col_dir, True, from_attack_dict)):
+                    # Check if the space the king is moving to is under attack or still on the line of a checking piece
+                    if (self._team_attacking_coord(other_team, to_coord) or to_coord in king_danger):
                         continue
 
                     # Game is not over (there's a legal move)
                     return False
             else:
-                # Check if the king is in check
-                if (valid_check_coords != None):
-                    # Check if double check (meaning multiple pieces are attacking the king)
-                    # Check if multiple types of pieces are attacking or if only one type check if multiple of that type are attacking
-                    # King must move on double check so no other piece moves are valid, therefore return empty list
-                    if (len(valid_check_coords) == 0):
-                        # Return empty list as the king must move (no other piece can get the king out of check)
-                        continue
-                    # Otherwise Single check (continuing signifies single check - no need to set anything)
+                # King must move on double check so no other piece moves are valid
+                if (check_mask != None and len(check_mask) == 0):
+                    continue
                 
                 # Loop through the pieces and get the moves for each piece
                 for piece_coord in piece_locations:
-                    # Get the pieces attacking the piece from the attack array
-                    from_attack_dict = self._attack_arr[piece_coord.row][piece_coord.col][other_team]
+                    pin_mask = pin_masks.get(piece_coord)
                     # Loop through the valid moves piece action info and create a move for each one
                     for to_coord in piece_locations[piece_coord].valid_move_coords:
-                        # Check if move causes check
-                        if (self._king_in_check_after_non_king_move(piece_coord, to_coord, king_coord, valid_check_coords, from_attack_dict)):
+                        # Check if en passant (pawn moving diagonally to an empty space)
+                        if (piece_type == PieceType.PAWN and to_coord.col != piece_coord.col and self._board_arr[to_coord.row][to_coord.col] == None):
+                            if (self._en_passant_leaves_king_in_check(piece_coord, to_coord, king_coord, self._turn, check_mask)):
+                                continue
+                        # Check if the move doesn't get out of check or leaves the pin line
+                        elif ((check_mask != None and to_coord not in check_mask) or (pin_mask != None and to_coord not in pin_mask)):
                             continue
 
                         # Game is not over (there's a legal move)
@@ -912,8 +1081,8 @@ class Board:
 
         # Get the king location for the team who's turn it is
         king_coord = self._pieces.get_king_coord(team_color)
-        # Get the valid check coordinates for the king
-        valid_check_coords: list[Coordinate] | None = self._get_valid_check_coords(king_coord, other_team)
+        # Get the check mask, pin masks and king danger coordinates once for every move
+        check_mask, pin_masks, king_danger = self._get_legal_move_masks(king_coord, team_color, other_team)
 
         for piece_type in PieceType:
             # Get the pieces for the piece type
@@ -921,47 +1090,32 @@ class Board:
 
             # Check if the piece type is a king
             if (piece_type == PieceType.KING):
-                # Get the pieces attacking the king from the attack array
-                from_attack_dict = self._attack_arr[king_coord.row][king_coord.col][other_team]
                 for to_coord in piece_locations[king_coord].valid_move_coords:
-                    # Get the row direction fo the move (positive, negative, or zero)
-                    row_dir =   (SignDirection.ZERO if to_coord.row == king_coord.row else 
-                                (SignDirection.POSITIVE if to_coord.row > king_coord.row else SignDirection.NEGATIVE))
-                    
-                    # Get the column direction of the move (positive, negative, or zero)
-                    col_dir =   (SignDirection.ZERO if to_coord.col == king_coord.col else 
-                                (SignDirection.POSITIVE if to_coord.col > king_coord.col else SignDirection.NEGATIVE))
-
-                    # Check if the king is not in check after the move
-                    # Checks both if the space the king is moving to is under attack and if any of the pieces previously attacking it still do
-                    if (self._team_attacking_coord(other_team, to_coord) or
-                        self._move_puts_king_in_check(king_coord, to_coord, row_dir, col_dir, True, from_attack_dict)):
+                    # Check if the space the king is moving to is under attack or still on the line of a checking piece
+                    if (self._team_attacking_coord(other_team, to_coord) or to_coord in king_danger):
                         continue
 
                     # Add the move
                     legal_moves.append(Move(from_coord=king_coord, to_coord=to_coord, promotion=None))
             else:
-                # Check if the king is in check
-                if (valid_check_coords != None):
-                    # Check if double check (meaning multiple pieces are attacking the king)
-                    # Check if multiple types of pieces are attacking or if only one type check if multiple of that type are attacking
-                    # King must move on double check so no other piece moves are valid, therefore return empty list
-                    if (len(valid_check_coords) == 0):
-                        # Return empty list as the king must move (no other piece can get the king out of check)
-                        continue
-                    # Otherwise Single check (continuing signifies single check - no need to set anything)
+                # King must move on double check so no other piece moves are valid
+                if (check_mask != None and len(check_mask) == 0):
+                    continue
                 
                 # Check if the piece type is a pawn
                 if (piece_type == PieceType.PAWN):
                     promotion_row = self._get_pawn_promotion_row(team_color)
                     # Loop through the pieces and get the moves for each piece
                     for piece_coord in piece_locations:
-                        # Get the pieces attacking the pawn from the attack array
-                        from_attack_dict = self._attack_arr[piece_coord.row][piece_coord.col][other_team]
+                        pin_mask = pin_masks.get(piece_coord)
                         # Loop through the valid moves piece action info and create a move for each one
                         for to_coord in piece_locations[piece_coord].valid_move_coords:
-                            # Check if move causes check
-                            if (self._king_in_check_after_non_king_move(piece_coord, to_coord, king_coord, valid_check_coords, from_attack_dict)):
+                            # Check if en passant (pawn moving diagonally to an empty space)
+                            if (to_coord.col != piece_coord.col and self._board_arr[to_coord.row][to_coord.col] == None):
+                                if (self._en_passant_leaves_king_in_check(piece_coord, to_coord, king_coord, team_color, check_mask)):
+                                    continue
+                            # Check if the move doesn't get out of check or leaves the pin line
+                            elif ((check_mask != None and to_coord not in check_mask) or (pin_mask != None and to_coord not in pin_mask)):
                                 continue
 
                             # Check if the move is a promotion
@@ -977,28 +1131,14 @@ class Board:
                 else:
                     # Loop through the pieces and get the moves for each piece
                     for piece_coord in piece_locations:
-                        # Get the pieces attacking the piece from the attack array
-                        from_attack_dict = self._attack_arr[piece_coord.row][piece_coord.col][other_team]
+                        pin_mask = pin_masks.get(piece_coord)
                         # Loop through the valid moves piece action info and create a move for each one
                         for to_coord in piece_locations[piece_coord].valid_move_coords:
-                            # Check if move causes check
-                            if (self._king_in_check_after_non_king_move(piece_coord, to_coord, king_coord, valid_check_coords, from_attack_dict)):
-                                # if piece_type == PieceType.KNIGHT and piece_coord == Coordinate(2, 2) and to_coord == Coordinate(3, 4):
-                                #     print("Knight (c3) for logging:")
-                                #     print(piece_locations[piece_coord])
-                                #     print(piece_type)
-                                #     print("To Coord:")
-                                #     print(to_coord)
+                            # Check if the move doesn't get out of check or leaves the pin line
+                            if ((check_mask != None and to_coord not in check_mask) or (pin_mask != None and to_coord not in pin_mask)):
                                 continue
 
                             # Add the move
-                            # if (piece_coord == piece_coord_for_logging):
-                            #     # print("Piece (h5):")
-                            #     # print(piece_locations[piece_coord])
-                            #     # print(piece_type)
-                            #     if (to_coord == piece_to_coord_for_logging):
-                            #         print("To Coord:")
-                            #         print(to_coord)
                             legal_moves.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=None))
                 
         # # Loop through the moves and convert them to move strings
@@ -1014,6 +1154,126 @@ class Board:
 
         return legal_moves
 
+    # Gets a list of the legal captures and promotions for a team (the moves searched by quiescence)
+    # Only the moves to a square with an enemy piece, en passant captures and promotions are checked for legality,
+    # so this is much faster than get_all_legal_moves() when the legal moves haven't been generated yet
+    #
+    # Parameters:
+    #   team_color: The team color to get the legal captures for (default is None which gets the legal captures for the current turn)
+    #
+    # Returns a list of the legal captures and promotions as move objects, in the same order as get_all_legal_moves()
+    #@profile
+    def get_legal_captures(self, team_color: TeamColor | None = None) -> list[Move]:
+        # If no team color was provided then get the legal captures for the current turn
+        if (team_color == None):
+            team_color = self._turn
+
+        # If the legal moves were already generated then only filter them
+        valid_moves = self._white_valid_moves if team_color == TeamColor.WHITE else self._black_valid_moves
+        if (valid_moves != None):
+            return [move for move in valid_moves if self._is_capture_or_promotion(move)]
+        
+        other_team = TeamColor.BLACK if team_color == TeamColor.WHITE else TeamColor.WHITE
+        # Create a list of all legal captures
+        legal_captures = []
+
+        # Check if their team is in check (if so, game is over - checkmate) - return empty list as no valid moves
+        if (self._team_attacking_coord(team_color, self._pieces.get_king_coord(other_team))):
+            return legal_captures
+
+        # Get the king location for the team who's turn it is
+        king_coord = self._pieces.get_king_coord(team_color)
+        # The check mask, pin masks and king danger coordinates are only computed once there is a capture to check, since
+        #   most positions have few captures
+        masks = None
+        board_arr = self._board_arr
+
+        for piece_type in PieceType:
+            # Get the pieces for the piece type
+            piece_locations = self._pieces.get_piece_locations_and_action_info(piece_type, team_color)
+
+            # Check if the piece type is a king
+            if (piece_type == PieceType.KING):
+                for to_coord in piece_locations[king_coord].valid_move_coords:
+                    # The king can only capture (castling never captures)
+                    cap_piece = board_arr[to_coord.row][to_coord.col]
+                    if (cap_piece == None or cap_piece.Color == team_color):
+                        continue
+
+                    if (masks == None):
+                        masks = check_mask, pin_masks, king_danger = self._get_legal_move_masks(king_coord, team_color, other_team)
+                    # Check if the space the king is moving to is under attack or still on the line of a checking piece
+                    if (self._team_attacking_coord(other_team, to_coord) or to_coord in king_danger):
+                        continue
+
+                    legal_captures.append(Move(from_coord=king_coord, to_coord=to_coord, promotion=None))
+            else:
+                # King must move on double check so no other piece moves are valid
+                if (masks != None and check_mask != None and len(check_mask) == 0):
+                    continue
+                
+                # Check if the piece type is a pawn
+                if (piece_type == PieceType.PAWN):
+                    promotion_row = self._get_pawn_promotion_row(team_color)
+                    for piece_coord in piece_locations:
+                        for to_coord in piece_locations[piece_coord].valid_move_coords:
+                            # Diagonal pawn moves are always captures (including en passant)
+                            if (to_coord.col == piece_coord.col and to_coord.row != promotion_row):
+                                continue
+                            if (masks == None):
+                                masks = check_mask, pin_masks, king_danger = self._get_legal_move_masks(king_coord, team_color, other_team)
+                            pin_mask = pin_masks.get(piece_coord)
+                            # Check if en passant (pawn moving diagonally to an empty space)
+                            if (to_coord.col != piece_coord.col and board_arr[to_coord.row][to_coord.col] == None):
+                                if (self._en_passant_leaves_king_in_check(piece_coord, to_coord, king_coord, team_color, check_mask)):
+                                    continue
+                            # Check if the move doesn't get out of check or leaves the pin line
+                            elif ((check_mask != None and to_coord not in check_mask) or (pin_mask != None and to_coord not in pin_mask)):
+                                continue
+
+                            # Check if the move is a promotion
+                            if (to_coord.row == promotion_row):
+                                # Add the promotion moves (same move but with different promotion pieces)
+                                legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=PieceType.QUEEN))
+                                legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=PieceType.ROOK))
+                                legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=PieceType.BISHOP))
+                                legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=PieceType.KNIGHT))
+                            else:
+                                legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=None))
+                else:
+                    for piece_coord in piece_locations:
+                        for to_coord in piece_locations[piece_coord].valid_move_coords:
+                            # Only check the legality of captures
+                            cap_piece = board_arr[to_coord.row][to_coord.col]
+                            if (cap_piece == None or cap_piece.Color == team_color):
+                                continue
+                            if (masks == None):
+                                masks = check_mask, pin_masks, king_danger = self._get_legal_move_masks(king_coord, team_color, other_team)
+                            pin_mask = pin_masks.get(piece_coord)
+                            # Check if the move doesn't get out of check or leaves the pin line
+                            if ((check_mask != None and to_coord not in check_mask) or (pin_mask != None and to_coord not in pin_mask)):
+                                continue
+
+                            legal_captures.append(Move(from_coord=piece_coord, to_coord=to_coord, promotion=None))
+
+        return legal_captures
+
+    # Private method that checks if a move is a capture (including en passant) or a promotion
+    #
+    # Parameters:
+    #   move: The move to check (must be a legal move of the team whose piece is on the from coordinate)
+    #
+    # Returns true if the move is a capture or a promotion
+    def _is_capture_or_promotion(self, move: Move) -> bool:
+        if (move.promotion != None):
+            return True
+        from_piece = self._board_arr[move.from_coord.row][move.from_coord.col]
+        to_piece = self._board_arr[move.to_coord.row][move.to_coord.col]
+        if (to_piece != None):
+            return to_piece.Color != from_piece.Color
+        # A pawn moving diagonally to an empty square is an en passant capture
+        return from_piece.Type == PieceType.PAWN and move.from_coord.col != move.to_coord.col
+
     # Moves the piece using a move object
     #
     # Parameters:
@@ -1233,17 +1493,13 @@ class Board:
         
         # Update castling moves
         # Castling Rights checked in _update_castling_moves
-        # Only update for the team who's turn it is
-        if (self._turn == TeamColor.WHITE):
-            self._update_castling_moves(TeamColor.WHITE, True)
-            self._update_castling_moves(TeamColor.WHITE, False)
-        else:
-            self._update_castling_moves(TeamColor.BLACK, True)
-            self._update_castling_moves(TeamColor.BLACK, False)
+        # Only the team who's turn it is can castle
+        self._update_all_castling_moves()
         
         # Reset the valid moves
         self._white_valid_moves = None
         self._black_valid_moves = None
+        self._check_info = None
 
         # Set the new zobrist hash
         self._zobrist_hash = self.update_zobrist_hash_from_move_info(move_info)
@@ -1376,6 +1632,9 @@ class Board:
 
             # Reset the black's legal move
             self._black_valid_moves = None
+
+        # Reset the moves giving check
+        self._check_info = None
         
         # Reset half moves to previous value
         self._half_moves = prev_move.half_moves
@@ -1403,13 +1662,8 @@ class Board:
         
         # Update castling moves
         # Castling Rights checked in _update_castling_moves
-        # Only update for the team who's turn it is
-        if (self._turn == TeamColor.WHITE):
-            self._update_castling_moves(TeamColor.WHITE, True)
-            self._update_castling_moves(TeamColor.WHITE, False)
-        else:
-            self._update_castling_moves(TeamColor.BLACK, True)
-            self._update_castling_moves(TeamColor.BLACK, False)        
+        # Only the team who's turn it is can castle
+        self._update_all_castling_moves()
 
         # Completed undoing move return True
         return True
@@ -1487,7 +1741,8 @@ class Board:
                 # Update all the other pieces this capture piece was blocking
                 self._update_pieces_blocked(move.from_coord, piece.Color)
                 # Update all the other pieces the captured en passant pawn is now blocking
-                self._update_pieces_blocked(undo_coord, undo_cap_on_space_piece.Color, move.from_coord, move.to_coord)
+                self._update_pieces_blocked(undo_coord, undo_cap_on_space_piece.Color, move.from_coord, move.to_coord,
+                                            from_coord_updated=True)
             # Normal Undo Capture - Allows for special case for more efficient updating blocked pieces
             else:
                 # Update all the other pieces this piece was blocking (knowing it was a capture we can update more efficiently)
@@ -1495,7 +1750,8 @@ class Board:
                 self._update_pieces_blocked_when_undoing_capture(move.from_coord, move.to_coord)
             
             # Update all the other pieces this piece is blocking
-            self._update_pieces_blocked(move.to_coord, piece.Color, move.from_coord)
+            # When undoing en passant the from coord was already updated above
+            self._update_pieces_blocked(move.to_coord, piece.Color, move.from_coord, from_coord_updated=undoing_en_passant)
             
         # Otherwise no capture so update pieces blocked for the piece moved to
         else:
@@ -1657,7 +1913,8 @@ class Board:
                     # location the capture piece is now)
                     else:
                         # Check if the piece could be blocking another piece that could capture (must be in valid direction to block)
-                        if (to_prev_is_valid_dir):
+                        # Only rooks, bishops and queens can be blocked, a knight can be in the same direction without being blocked
+                        if (to_prev_is_valid_dir and piece_type in (PieceType.ROOK, PieceType.BISHOP, PieceType.QUEEN)):
                             blocked_coord_row_dir = SignDirection.ZERO if capt_coord.row == blocked_coord.row else SignDirection.NEGATIVE if capt_coord.row > blocked_coord.row else SignDirection.POSITIVE
                             blocked_coord_col_dir = SignDirection.ZERO if capt_coord.col == blocked_coord.col else SignDirection.NEGATIVE if capt_coord.col > blocked_coord.col else SignDirection.POSITIVE
 
@@ -1674,6 +1931,8 @@ class Board:
     #   move_color: The color of the piece that was moved
     #   move_from_coord: The coordinate the piece moved from (default None if coord is the from coordinate)
     #   undoing_en_passant_coord: The coordinate of the capturing piece after undoing en passant (default None if not undoing en passant)
+    #   from_coord_updated: If the pieces blocked by move_from_coord were already updated, so it's no longer blocking
+    #       (default False, True when undoing en passant as the from coordinate is updated first)
     # 
     # NOTE: This does not include pawn pieces that are blocked for non attacting (capture) moves
     # NOTE: This assumed this was either (the from coordinate) or (the to coordinate on a non-capture move)
@@ -1685,7 +1944,7 @@ class Board:
     # TODO: See if there's a way to just do one update (for to and from) instead of two for each move in castling
     #@profile
     def _update_pieces_blocked(self, coord: Coordinate, move_color: TeamColor, move_from_coord: Coordinate | None = None, 
-                               undoing_en_passant_coord: Coordinate | None = None):
+                               undoing_en_passant_coord: Coordinate | None = None, from_coord_updated: bool = False):
         attack_dict = self._attack_arr[coord.row][coord.col]
 
         piece = self._board_arr[coord.row][coord.col]
@@ -1748,12 +2007,14 @@ class Board:
                                 
                                 # Check if the blocked piece is in the same direction as the from coord
                                 if (row_dir == from_row_dir and col_dir == from_col_dir):
-                                    # Get the distance from the blocked piece to the from coord
-                                    row_dist = abs(move_from_coord.row - coord.row)
-                                    col_dist = abs(move_from_coord.col - coord.col)
-
-                                    # Get the max spaces to move
-                                    max_spaces = max(row_dist, col_dist)
+                                    # If the from coord was already updated (no longer blocking) the whole direction needs to be updated
+                                    if (not from_coord_updated):
+                                        # Get the distance from the blocked piece to the from coord
+                                        row_dist = abs(move_from_coord.row - coord.row)
+                                        col_dist = abs(move_from_coord.col - coord.col)
+
+                                        # Get the max spaces to move
+                                        max_spaces = max(row_dist, col_dist)
                                 # Otherwise check if it's in the other direction (means its already been checked by from coord)
                                 else:
                                     # Get the direction from the the piece that moved to move_from_coord
@@ -1805,7 +2066,8 @@ class Board:
                                 new_action_info.valid_move_coords.append(coord)
                                 # Also if the from coord is in valid moves then remove it
                                 # This is because the piece couldn't have moved to that spot before as it would have captured a piece on it's team
-                                if (move_from_coord != None):
+                                # NOTE: Not if the from coord was already updated, as it was added to the valid moves then
+                                if (move_from_coord != None and not from_coord_updated):
                                     try:
                                         new_action_info.valid_move_coords.remove(move_from_coord)
                                     except ValueError:
@@ -2095,11 +2357,20 @@ class Board:
                     self._remove_valid_move(PieceType.PAWN, team, Coordinate(new_row, coord.col), 
                                             Coordinate(coord.row, coord.col))
         
+    # Update the castling moves of both teams. Only the team whose turn it is has its valid castling moves, the castling
+    # moves of the other team are removed so the valid moves only depend on the position (not on the moves played to it)
+    def _update_all_castling_moves(self):
+        for team in TeamColor:
+            self._update_castling_moves(team, True)
+            self._update_castling_moves(team, False)
+
     # Update the castling moves available
     #
     # Parameters:
     #   team: The team whose castling moves to change
     #   kingside: Whether to change the kingside castling move or the queenside castling move
+    #
+    # NOTE: The castling moves are removed if it isn't the team's turn
     #@profile
     def _update_castling_moves(self, team: TeamColor, kingside: bool):
         # Starting coord
@@ -2116,7 +2387,7 @@ class Board:
         col = start_coord.col + 2 if kingside else start_coord.col - 2
 
         # Check if castle is valid then add it to the valid moves
-        if (self._valid_castle(team, kingside)):
+        if (team == self._turn and self._valid_castle(team, kingside)):
             self._add_valid_move(PieceType.KING, team, start_coord, Coordinate(row, col))
         # Otherwise remove the move from the valid moves
         else:
@@ -2619,13 +2890,8 @@ class Board:
         if (self._en_passant_avail != None):
             self._add_en_passant_moves()
         
-        # Update castling (_update_castling_moves checks for CastlingRights) only for the team whose turn it is
-        if (self._turn == TeamColor.WHITE):
-            self._update_castling_moves(TeamColor.WHITE, True)
-            self._update_castling_moves(TeamColor.WHITE, False)
-        else:
-            self._update_castling_moves(TeamColor.BLACK, True)
-            self._update_castling_moves(TeamColor.BLACK, False)
+        # Update castling (_update_castling_moves checks for CastlingRights) only the team whose turn it is can castle
+        self._update_all_castling_moves()
     
     # Private method that converts a string to an int if all characters are digits. Otherwise returns None
     #
@@ -3010,114 +3276,112 @@ class Board:
         
         return valid_check_coords
                     
-    # Private method that checks if the king is in check after a non-king move
+    # Private method that gets the masks used to check the legality of the moves of a team, computed once per position
+    #   - check mask: the coordinates a non-king piece can move to in order to get out of check (None if not in check,
+    #       empty if double check since only the king can move)
+    #   - pin masks: for every pinned piece, the coordinates it can move to without leaving the pin line (the spaces
+    #       between the king and the pinning piece and the pinning piece itself)
+    #   - king danger: the coordinates the king can't move to even though they aren't attacked because the king itself
+    #       blocks the attack (the space behind the king on the line of a checking rook, bishop or queen)
     #
     # Parameters:
-    #   from_coord: The coordinate the piece is moving from
-    #   to_coord: The coordinate the piece is moving to
-    #   king_loc: The PieceCoordinate of the king
-    #   valid_check_coords: The valid coordinates to block check for the king (None if king is not in check)
-    #   from_attack_dict: The pieces on the other team attacking the from space from the attack array
+    #   king_coord: The coordinate of the king of the team
+    #   team_color: The team color to get the masks for
+    #   other_team: The team color of the other team
     #
-    # Returns if the king is in check after the non king move
-    #@profile
-    def _king_in_check_after_non_king_move(self, from_coord: Coordinate, to_coord: Coordinate, king_coord: Coordinate, 
-                                  valid_check_coords: list[Coordinate], from_attack_dict: dict[PieceType, list[Coordinate]]) -> bool:
-        # Check if in check and did not move to a valid check coordinate
-        if (valid_check_coords != None and to_coord not in valid_check_coords):
-            # Didn't block check - still in check
-            return True
-        
-        # Check if there's no pieces attacking the from space (from_attack_dict is empty)
-        if (not from_attack_dict):
-            # No pieces attacking from space - wasn't in check - not blocking check - so not in check
-            return False
-        
-        # Check if any pieces could have been blocked from check before the move (only possible if from_coord is horizontal, vertical, or 
-        #   diagonal space from the king location, i.e. can be captured by a piece that can be blocked - rook, bishop, or queen)
-        row_diff = from_coord.row - king_coord.row
-        col_diff = from_coord.col - king_coord.col
-        # Check if not horizontal, vertical, or diagonal
-        if (row_diff != 0 and col_diff != 0 and abs(row_diff) != abs(col_diff)):
-            # No pieces were blocked from check - not in check
-            return False
-        
-        # Is horizontal or vertical or diagonal
-        # Get the direction required for piece to put king in check
-        row_dir = SignDirection.POSITIVE if row_diff > 0 else (SignDirection.NEGATIVE if row_diff < 0 else SignDirection.ZERO)
-        col_dir = SignDirection.POSITIVE if col_diff > 0 else (SignDirection.NEGATIVE if col_diff < 0 else SignDirection.ZERO)
-
-        
-        # Get the distance between the king and the piece - 1 (max spaces available to have been blocking check)
-        max_block_spaces = max(abs(row_diff), abs(col_diff)) - 1
-        spaces_available = self._get_spaces_available_in_move_dir(from_coord=king_coord, row_dir=row_dir, col_dir=col_dir, 
-                                                                  team_color=False, max_spaces=max_block_spaces)
-
-        # Check if king check is being blocked by piece already in the way
-        if (spaces_available != max_block_spaces):
-            # Piece is already blocking check - not in check
-            return False
-
-        # Check if king check is being blocked by piece that moved to the space
-        return self._move_puts_king_in_check(from_coord, to_coord, row_dir, col_dir, False, from_attack_dict)
+    # NOTE: A non-king move is legal if its to coordinate is in the check mask (if not None) and in its pin mask (if pinned).
+    #       En passant captures remove two pieces from the board so they are checked by _en_passant_leaves_king_in_check()
+    #
+    # Returns a tuple of the check mask, the pin masks by pinned piece coordinate and the king danger coordinates
+    def _get_legal_move_masks(self, king_coord: Coordinate, team_color: TeamColor, 
+                              other_team: TeamColor) -> tuple[set[Coordinate] | None, dict[Coordinate, set[Coordinate]], set[Coordinate]]:
+        board_arr = self._board_arr
+        king_row, king_col = king_coord.row, king_coord.col
+        check_mask: set[Coordinate] | None = None
+        king_danger: set[Coordinate] = set()
+
+        # Check mask (the blocking / capturing coordinates) and the spaces behind the king on the line of sliding checkers
+        king_attack_dict = self._attack_arr[king_row][king_col][other_team]
+        if (king_attack_dict):
+            check_mask = set(self._get_valid_check_coords(king_coord, other_team))
+            for piece_type in (PieceType.ROOK, PieceType.BISHOP, PieceType.QUEEN):
+                for attack_coord in king_attack_dict.get(piece_type, ()):
+                    row = king_row + ((king_row > attack_coord.row) - (king_row < attack_coord.row))
+                    col = king_col + ((king_col > attack_coord.col) - (king_col < attack_coord.col))
+                    if (0 <= row < 8 and 0 <= col < 8):
+                        king_danger.add(Coordinate(row, col))
+
+        # Pin masks: only a rook, bishop or queen of the other team on a line with the king can pin a piece. Walk the spaces
+        #   between it and the king, a piece is pinned if it is the only piece there and it's on the team
+        pin_masks: dict[Coordinate, set[Coordinate]] = dict()
+        for slider_locations, straight, diagonal in self._pieces.get_pinning_piece_locations(other_team):
+            for slider_coord in slider_locations:
+                row_diff = slider_coord.row - king_row
+                col_diff = slider_coord.col - king_col
+                # Check if the piece is on a line it can move along (straight for rook and queen, diagonal for bishop and queen)
+                if (not (straight and (row_diff == 0 or col_diff == 0)) and not (diagonal and abs(row_diff) == abs(col_diff))):
+                    continue
 
-    # Private method that checks if any of the pieces a piece previously blocked before a move are now attacking the king
-    # 
+                row_dir = (row_diff > 0) - (row_diff < 0)
+                col_dir = (col_diff > 0) - (col_diff < 0)
+                spaces = max(abs(row_diff), abs(col_diff))
+                pinned_coord = None
+                for i in range(1, spaces):
+                    piece = board_arr[king_row + i * row_dir][king_col + i * col_dir]
+                    if (piece != None):
+                        # A piece of the other team or a second piece blocks the line - nothing is pinned
+                        if (piece.Color != team_color or pinned_coord != None):
+                            pinned_coord = None
+                            break
+                        pinned_coord = Coordinate(king_row + i * row_dir, king_col + i * col_dir)
+                if (pinned_coord != None):
+                    pin_masks[pinned_coord] = {Coordinate(king_row + i * row_dir, king_col + i * col_dir) for i in range(1, spaces + 1)}
+
+        return check_mask, pin_masks, king_danger
+
+    # Private method that checks if an en passant capture leaves the king in check. The moving pawn and the captured pawn
+    # both leave their spaces, which can uncover an attack on the king that the pin masks don't see (Ex: both pawns on
+    # the rank of the king between the king and a rook)
+    #
     # Parameters:
-    #  from_coord: The coordinate the piece is moving from
-    #  to_coord: The coordinate the piece is moving to
-    #  row_dir: The direction in the row the piece moved
-    #  col_dir: The direction in the column the piece moved
-    #  king_move: Whether the piece moving is the king or not
-    #  from_attack_dict: The pieces on the other team attacking the from space from the attack array
-    # 
-    # Returns if the move puts the kings in check
-    #@profile
-    def _move_puts_king_in_check(self, from_coord: Coordinate, to_coord: Coordinate,row_dir: SignDirection, col_dir: SignDirection, 
-                                 king_move: bool, from_attack_dict: dict[PieceType, list[Coordinate]]) -> bool:
-        # Loop through the pieces attacking the from space
-        for piece_type in from_attack_dict:
-            # Skip if piece that can't be blocked (pawn, knight, king)
-            if (piece_type == PieceType.PAWN or piece_type == PieceType.KNIGHT or piece_type == PieceType.KING):
-                continue
-
-            # Check if the piece can move in the direction required to put king in check
-            # Check if horizontal or vertical is correct direction (rook or queen - not bishop since pawn, knight, king already skipped)
-            # Check if diagonal is correct direction (bishop or queen - not rook since pawn, knight, king already skipped)
-            if (((row_dir == SignDirection.ZERO or col_dir == SignDirection.ZERO) and piece_type != PieceType.BISHOP) or 
-                ((row_dir != SignDirection.ZERO or col_dir != SignDirection.ZERO) and piece_type != PieceType.ROOK)):
-                # Loop through the attack coordinates for the piece
-                for attack_coord in from_attack_dict[piece_type]:
-                    # Checks if attacking piece is being captured (Piece can no longer capture the king, so continue)
-                    if (to_coord == attack_coord):
-                        continue
+    #   from_coord: The coordinate the pawn is moving from
+    #   to_coord: The coordinate the pawn is moving to
+    #   king_coord: The coordinate of the king of the team
+    #   team_color: The team color of the pawn
+    #   check_mask: The check mask from _get_legal_move_masks()
+    #
+    # Returns if the king is in check after the en passant capture
+    def _en_passant_leaves_king_in_check(self, from_coord: Coordinate, to_coord: Coordinate, king_coord: Coordinate,
+                                         team_color: TeamColor, check_mask: set[Coordinate] | None) -> bool:
+        captured_coord = Coordinate(from_coord.row, to_coord.col)
+        # When in check, the capture must capture the checking pawn or block the check
+        if (check_mask != None and to_coord not in check_mask and captured_coord not in check_mask):
+            return True
 
-                    # Get the directions
-                    attack_row_dir = (SignDirection.ZERO if attack_coord.row == from_coord.row else 
-                                     (SignDirection.POSITIVE if attack_coord.row > from_coord.row else SignDirection.NEGATIVE))
-                    attack_col_dir = (SignDirection.ZERO if attack_coord.col == from_coord.col else 
-                                     (SignDirection.POSITIVE if attack_coord.col > from_coord.col else SignDirection.NEGATIVE))
-                    # Check if king move
-                    # When the piece moving is the king, we have to check both the direction and the negated direction 
-                    # as moving towards or away (same direction just negated) from the attacking piece still puts the king in check.
-                    if (king_move):
-                        negated_row_dir = (row_dir if row_dir == SignDirection.ZERO else 
-                                          (SignDirection.POSITIVE if row_dir == SignDirection.NEGATIVE else SignDirection.NEGATIVE))
-                        negated_col_dir = (col_dir if col_dir == SignDirection.ZERO else 
-                                          (SignDirection.POSITIVE if col_dir == SignDirection.NEGATIVE else SignDirection.NEGATIVE))
-                        # Check if the piece can move in the direction required to put king in check (same direction as the piece was from the king)
-                        if ((attack_row_dir == row_dir and attack_col_dir == col_dir) or 
-                            (attack_row_dir == negated_row_dir and attack_col_dir == negated_col_dir)):
-                            # Piece can move in direction required to put king in check and attacker not captured - king now in check
-                            return True 
-                    else:
-                        # Check if the piece can move in the direction required to put king in check (same direction as the piece was from the king)
-                        if (attack_row_dir == row_dir and attack_col_dir == col_dir):
-                            # Piece can move in direction required to put king in check and attacker not captured - king now in check
-                            return True 
-        
-        # No pieces can move in direction required to put king in check - king not in check
-        return False
+        # Make the capture on the board array, look for a rook, bishop or queen attacking the king, then undo it
+        board_arr = self._board_arr
+        pawn = board_arr[from_coord.row][from_coord.col]
+        captured_pawn = board_arr[captured_coord.row][captured_coord.col]
+        board_arr[from_coord.row][from_coord.col] = None
+        board_arr[captured_coord.row][captured_coord.col] = None
+        board_arr[to_coord.row][to_coord.col] = pawn
+        in_check = False
+        for row_dir, col_dir in self._KING_RAY_DIRECTIONS:
+            slider_type = PieceType.BISHOP if (row_dir != 0 and col_dir != 0) else PieceType.ROOK
+            row, col = king_coord.row + row_dir, king_coord.col + col_dir
+            while (0 <= row < 8 and 0 <= col < 8):
+                piece = board_arr[row][col]
+                if (piece != None):
+                    in_check = piece.Color != team_color and (piece.Type == slider_type or piece.Type == PieceType.QUEEN)
+                    break
+                row += row_dir
+                col += col_dir
+            if (in_check):
+                break
+        board_arr[to_coord.row][to_coord.col] = None
+        board_arr[captured_coord.row][captured_coord.col] = captured_pawn
+        board_arr[from_coord.row][from_coord.col] = pawn
+        return in_check
 
 
     # Private method that gets all the valid coordinates a piece can moves
@@ -3505,49 +3769,54 @@ class Board:
     #
     # Returns the total material on the board
     def get_total_material(self) -> int:
-        # Run through the board and count each piece's value
         # Pawn = 1, Knight = 3, Bishop = 3, Rook = 5, Queen = 9
         # Return the sum of white and black's material 
         # material score = piece_value * (white + black)
-        total_material = 0  
-        for piece_type in PieceType:
-            w_piece = self._get_pieces(piece_type, TeamColor.WHITE)
-            b_piece = self._get_pieces(piece_type, TeamColor.BLACK)
-            total_material += self.get_piece_value(piece_type) * (len(w_piece) + len(b_piece))
-        return total_material
+        # NOTE: Kept up to date by the piece tracker whenever a piece is added or removed
+        return self._pieces.get_total_material()
     
     # Finds and returns the difference between the material value of white and black pieces on the board
     def _count_material(self) -> int:
-        # Run through the board and count each piece's value
         # Pawn = 1, Knight = 3, Bishop = 3, Rook = 5, Queen = 9
         # Return the difference between white and black's material 
         # material score = piece_value * (white - black)
-        # Checkmate = no legal moves and in check
-        # Stalemate if not in check
-        # Checkmate evaluates to large value
-        total_material = 0  
-        for piece_type in PieceType:
-            w_piece = self._get_pieces(piece_type, TeamColor.WHITE)
-            b_piece = self._get_pieces(piece_type, TeamColor.BLACK)
-            total_material += self.get_piece_value(piece_type) * (len(w_piece) - len(b_piece))
-        return total_material
+        # NOTE: Kept up to date by the piece tracker whenever a piece is added or removed
+        return self._pieces.get_material()
     
     # Gets the number of doubled, isolated, blocked, and passed pawns
     def _pawn_structure(self) -> int:
+        # Doubled, isolated and passed pawns only depend on where the pawns are, so they're cached by the pawn hash
+        pawn_hash = self._pieces.get_pawn_hash()
+        column_score = self._pawn_table.get(pawn_hash)
+        if (column_score == None):
+            column_score = self._pawn_column_score(self._pieces.get_pawn_columns(TeamColor.WHITE),
+                                                   self._pieces.get_pawn_columns(TeamColor.BLACK))
+            self._pawn_table.store(pawn_hash, column_score)
+
+        # Count the number of blocked pawns
+        # Not cached as a pawn can be blocked by any piece, not just pawns
+        # blocked_pawns is defined as the number of blocked white pawns minus blocked black pawns
+        # Loop through each pawn, check if there is a piece in front of it
+        # If there is, count it as a blocked pawn
+        blocked_pawns = 0
+        for coord in self._pieces.get_piece_locations_and_action_info(PieceType.PAWN, TeamColor.WHITE):
+            if (self._board_arr[coord.row + 1][coord.col] != None):
+                blocked_pawns += 1
+        for coord in self._pieces.get_piece_locations_and_action_info(PieceType.PAWN, TeamColor.BLACK):
+            if (self._board_arr[coord.row - 1][coord.col] != None):
+                blocked_pawns -= 1
+
+        return column_score + blocked_pawns
+    
+    # Gets the number of doubled and isolated pawns minus the number of passed pawns (white - black)
+    #
+    # Parameters:
+    #   w_cols: The number of white pawns in each column
+    #   b_cols: The number of black pawns in each column
+    def _pawn_column_score(self, w_cols: list[int], b_cols: list[int]) -> int:
         # Count the number of doubled pawns
-        # Store an array for white and black representing how many pawns are in each column
         # Would look something like [1, 1, 1, 2, 0, 1, 0, 2]
         # Count it the number of entries that are > 1, these are doubled pawns
-        blocked_pawns = 0
-        white_pawns = self._get_pieces(PieceType.PAWN, TeamColor.WHITE)
-        black_pawns = self._get_pieces(PieceType.PAWN, TeamColor.BLACK)
-        w_cols = [0 for i in range(8)]
-        b_cols = [0 for i in range(8)]
-        for pawn in white_pawns:
-            w_cols[pawn.Coord.col] += 1
-        for pawn in black_pawns:
-            b_cols[pawn.Coord.col] += 1
-
         # Count the number of doubled pawns, which is white doubled pawns minus black doubled pawns
         doubled_pawns = 0
         for i in range(len(w_cols)):
@@ -3557,25 +3826,17 @@ class Board:
                 doubled_pawns -= (b_cols[i] - 1)
         
         # Count the number of isolated pawns, which is white isolated pawns minus black isolated pawns
-        isolated_pawns = 0
         isolated_pawns = self._find_isolated_pawns(w_cols) - self._find_isolated_pawns(b_cols)
-        
-        # Count the number of blocked pawns
-        # blocked_pawns is defined as the number of blocked white pawns minus blocked black pawns
-        # Loop through each pawn, check if there is a piece in front of it
-        # If there is, count it as a blocked pawn
-        for pawn in white_pawns:
-            if (self._board_arr[pawn.Coord.row + 1][pawn.Coord.col] != None):
-                blocked_pawns += 1
-        for pawn in black_pawns:
-            if (self._board_arr[pawn.Coord.row - 1][pawn.Coord.col] != None):
-                blocked_pawns -= 1
 
         # Get the number of passed pawns. This is the number of passed white pawns minus the 
         # number of passed black pawns. This will be subtracted from the final pawn structure score
         passed_pawns = self._passed_pawns(w_cols, b_cols)
 
-        return doubled_pawns + isolated_pawns + blocked_pawns - passed_pawns
+        return doubled_pawns + isolated_pawns - passed_pawns
+
+    # Gets the hash of the pawn structure (only changes when a pawn moves, is captured or promotes)
+    def get_pawn_hash(self) -> int:
+        return self._pieces.get_pawn_hash()
     
 
     # Count the number of isolated pawns
@@ -3624,12 +3885,21 @@ class Board:
                 passed_pawns -= self.__check_adjacent_columns_isolated(w_cols, i)
         return passed_pawns
     
-    # Get the difference in the number of legal moves between white and black
+    # Get the difference in the number of pseudo-legal moves between white and black
+    #
+    # NOTE: Uses the valid moves kept in the piece tracker, which doesn't check whether a move leaves the king in check.
+    # This is much cheaper than generating the legal moves for both teams and is close enough for an evaluation term
     #
-    # Returns the difference in the number of legal moves between white and black
+    # Returns the difference in the number of pseudo-legal moves between white and black
     def _get_mobility(self):
+        mobility = 0
+        for piece_type in PieceType:
+            for action_info in self._pieces.get_piece_locations_and_action_info(piece_type, TeamColor.WHITE).values():
+                mobility += len(action_info.valid_move_coords)
+            for action_info in self._pieces.get_piece_locations_and_action_info(piece_type, TeamColor.BLACK).values():
+                mobility -= len(action_info.valid_move_coords)
         # Subtract the moves for black from the moves for white
-        return len(self.get_all_legal_moves(TeamColor.WHITE)) - len(self.get_all_legal_moves(TeamColor.BLACK))
+        return mobility
     
     # Gets the combined values for the pieces under attack and not protected. This is the value of white pieces unprotected minus the 
     # value of black pieces unprotected
@@ -3765,35 +4035,33 @@ class Board:
         return eval
     
     # Create the values for zobrist to use when hasing
-    # NOTE: This should only be called once - when the board is created
-    # NOTE: Calling more than once will cause the zobrist hash to not line up with previous hashes (however this may not matter if called between games)
+    # NOTE: The tables are only generated once (from ZOBRIST_SEED) and shared by every board, so the same position always 
+    # has the same hash. This lets hashes be used as keys for caches shared between boards
     def _create_zobrist_tables(self):
         # Zobrist hash is a 64 bit integer, representing the current position. It is generated
         # from random numbers, and updated every time a move is made
-        # Generate a 12*64 list of random numbers, one for each piece type in each square
-        # Create a list for each piece, 0-5 for black, 6-11 for white
-        # The order is pawn, bishop, knight, rook, queen, king. 
-        # Each piece's list has 64 random numbers, one for each square. The index 0 is for A1, 1 for B1, 9 for A2, etc
-
-        # Create a list of random numbers for each piece type
-        self._zobrist_table = []
-        curr_squares = [0 for i in range(64)]
-        for color in TeamColor:
-            for piece_type in PieceType:
-                for i in range(64):
-                    curr_squares[i] = random.randint(0, pow(2, len(curr_squares)))
-                self._zobrist_table.append(curr_squares)
-        
-        # Set the rest of the random numbers for zobrist hashing (turn, castling rights, en passant)
-        # Set the turn random number as the first element of the misc list
-        self._zobrist_misc = [random.randint(0, pow(2, 64))]
-        curr_list = []
-        for i in range(1, 3):
-            curr_list = []
-            # Turn has 1 value, castling has 4, and en passant has 8, so use power of 2 for each
-            for j in range(4 * i):
-                curr_list.append(random.randint(0, pow(2, 64)))
-            self._zobrist_misc.append(curr_list)
+        if (Board._shared_zobrist_tables == None):
+            zobrist_random = random.Random(self.ZOBRIST_SEED)
+            # Generate a 12*64 list of random numbers, one for each piece type in each square
+            # Create a list for each piece, 0-5 for black, 6-11 for white
+            # The order is pawn, bishop, knight, rook, queen, king. 
+            # Each piece's list has 64 random numbers, one for each square. The index 0 is for A1, 1 for B1, 8 for A2, etc
+            # NOTE: A new list is created for each piece so each piece type has different random numbers
+            zobrist_table = []
+            for color in TeamColor:
+                for piece_type in PieceType:
+                    zobrist_table.append([zobrist_random.getrandbits(64) for i in range(64)])
+            
+            # Set the rest of the random numbers for zobrist hashing (turn, castling rights, en passant)
+            # Set the turn random number as the first element of the misc list
+            zobrist_misc = [zobrist_random.getrandbits(64)]
+            for i in range(1, 3):
+                # Turn has 1 value, castling has 4, and en passant has 8, so use power of 2 for each
+                zobrist_misc.append([zobrist_random.getrandbits(64) for j in range(4 * i)])
+
+            Board._shared_zobrist_tables = (zobrist_table, zobrist_misc)
+
+        self._zobrist_table, self._zobrist_misc = Board._shared_zobrist_tables
 
     # Sets the initial Zobrist hash for the board. This should only be done once per game, as soon as the board is reset
     def _set_zobrist_hash(self):
@@ -3804,9 +4072,12 @@ class Board:
             for j in range(len(self._board_arr)):
                 if self._board_arr[i][j] is not None:
                     piece_index = self._board_arr[i][j].Color.value * 6 + self._board_arr[i][j].Type.value
-                    self._zobrist_hash ^= self._zobrist_table[piece_index][j]
+                    self._zobrist_hash ^= self._zobrist_table[piece_index][i * 8 + j]
 
-        # NOTE: XOR the turn random number on each turn not at the start of the game (doesn't really matter, but more efficient this way)
+        # The turn random number is XORed on every move, so it's included when it's black's turn
+        # This makes the hash the same whether the position was set from a FEN or reached by making moves
+        if (self._turn == TeamColor.BLACK):
+            self._zobrist_hash ^= self._zobrist_misc[0]
 
         # XOR by the castling rights random number, for each castling right there is
         if (self._castling_rights.black_kingside):
@@ -3861,7 +4132,18 @@ class Board:
 
         curr_hash ^= self._zobrist_table[piece_index][square1]
 
-        curr_hash ^= self._zobrist_table[piece_index][square2]
+        # A promoted pawn is replaced by the promotion piece on the square it's moving to
+        if (move.promotion is not None):
+            curr_hash ^= self._zobrist_table[piece.Color.value * 6 + move.promotion.value][square2]
+        else:
+            curr_hash ^= self._zobrist_table[piece_index][square2]
+
+        # If castling, XOR by the rook's random number in the square it's moving from and to
+        if (piece.Type == PieceType.KING and abs(col1 - col2) == 2):
+            rook_index = piece.Color.value * 6 + PieceType.ROOK.value
+            rook_col1, rook_col2 = (7, 5) if col2 > col1 else (0, 3)
+            curr_hash ^= self._zobrist_table[rook_index][row1 * 8 + rook_col1]
+            curr_hash ^= self._zobrist_table[rook_index][row1 * 8 + rook_col2]
 
         # XOR by the current turn's random number (alternates between being added and removed, so one team has it added and the other removed)
         curr_hash ^= self._zobrist_misc[0]
@@ -3909,8 +4191,9 @@ class Board:
             curr_hash ^= self._zobrist_table[piece_index][square2]
         # Check for en passant capture
         elif (piece_type == PieceType.PAWN and col1 != col2):
-            # XOR by the en passant random number, if there is an en passant square
-            curr_hash ^= self._zobrist_misc[2][col2]
+            # XOR by the captured pawn's random number (the captured pawn is beside the pawn, not on the square it moves to)
+            piece_index = (1 - piece.Color.value) * 6 + PieceType.PAWN.value
+            curr_hash ^= self._zobrist_table[piece_index][row1 * 8 + col2]
 
         return curr_hash
 
@@ -3950,10 +4233,23 @@ class Board:
         # print('Move Info: ', move_info.move, move_info.castling_rights, move_info.en_passant_avail)
         # print(piece_index, square1, square2)
 
+        # The captured piece is always on the other team
+        other_color_val = (1 - piece.Color.value) * 6
+
         curr_hash = self._zobrist_hash
-        curr_hash ^= self._zobrist_table[piece_index][square1]
+        # A promoted pawn was a pawn on the square it moved from (the promotion piece is on the square it moved to)
+        if (move_info.move.promotion is not None):
+            curr_hash ^= self._zobrist_table[color_val + PieceType.PAWN.value][square1]
+        else:
+            curr_hash ^= self._zobrist_table[piece_index][square1]
         curr_hash ^= self._zobrist_table[piece_index][square2]
 
+        # If castling, XOR by the rook's random number in the square it moved from and to
+        if (piece.Type == PieceType.KING and abs(col1 - col2) == 2):
+            rook_col1, rook_col2 = (7, 5) if col2 > col1 else (0, 3)
+            curr_hash ^= self._zobrist_table[color_val + PieceType.ROOK.value][row1 * 8 + rook_col1]
+            curr_hash ^= self._zobrist_table[color_val + PieceType.ROOK.value][row1 * 8 + rook_col2]
+
         # XOR by the turn random number (alternates between being added and removed, so one team has it added and the other removed)
         curr_hash ^= self._zobrist_misc[0]
 
@@ -3985,11 +4281,11 @@ class Board:
         if (move_info.en_passant):
             # print('en passant capture')
             en_passant_square = move_info.en_passant_avail.row * 8 + move_info.en_passant_avail.col
-            curr_hash ^= self._zobrist_table[color_val + PieceType.PAWN.value][en_passant_square]
+            curr_hash ^= self._zobrist_table[other_color_val + PieceType.PAWN.value][en_passant_square]
         # Then check if capture is normal
         elif captured_piece is not None:
             # print('capture')
-            piece_index = color_val + captured_piece.value
+            piece_index = other_color_val + captured_piece.value
             curr_hash ^= self._zobrist_table[piece_index][square2]
 
         return curr_hash
@@ -3998,158 +4294,106 @@ class Board:
     def get_zobrist_hash(self) -> int:
         return self._zobrist_hash
 
-    # Checks if a move causes check by checking if the king is in check after the move
+    # Checks if a move causes check to the king of the team whose turn it isn't
     # This should be used for move ordering
     #
-    # Returns True if the move causes check, False otherwise 
+    # Parameters:
+    #   move: A move of the team whose turn it is
+    #
+    # NOTE: Looks the move up in the check squares of the position (computed once per position by _get_check_info()).
+    #       Checks given by the rook when castling and discovered checks from removing the pawn captured en passant are
+    #       not found
+    #
+    # Returns True if the move causes check, False otherwise
     def move_causes_check(self, move: Move) -> bool:
-        # Get the piece which is moving, and the location of the king
-        piece: Piece = self._board_arr[move.from_coord.row][move.from_coord.col]
-        other_team = TeamColor.WHITE if piece.Color == TeamColor.BLACK else TeamColor.BLACK
-        king_coord = self._pieces.get_king_coord(other_team)
+        check_info = self._get_check_info()
+        from_square = move.from_coord.row * 8 + move.from_coord.col
+        to_square = move.to_coord.row * 8 + move.to_coord.col
 
-        if piece.Type == PieceType.KING:
-            return False
-
-        # Pawn - Check if the move is diagonal and if the piece is attacking the king
-        if piece.Type == PieceType.PAWN:
-            # Check if the king is diagonal to the pawn
-            if abs(move.to_coord.row - king_coord.row) == 1 and abs(move.to_coord.col - king_coord.col) == 1:
-                capture_row = move.to_coord.row + 1 if piece.Color == TeamColor.WHITE else move.to_coord.row - 1
-                if capture_row == king_coord.row and (move.to_coord.col - 1 == king_coord.col or move.to_coord.col + 1 == king_coord.col):
-                    return True
-        
-        # Knight - Check all knight spots
-        elif piece.Type == PieceType.KNIGHT:
-            # Check if the knight moves to a spot where they are within reach of the king
-            if (abs(move.to_coord.row - king_coord.row) == 2 and abs(move.to_coord.col - king_coord.col) == 1) or \
-                (abs(move.to_coord.row - king_coord.row) == 1 and abs(move.to_coord.col - king_coord.col) == 2):
-                # If the knight can reach the king, get the distance between the knight and the king and call
-                # the helper function to check if the move results in check
-                row_diff = king_coord.row - move.to_coord.row
-                col_diff = king_coord.col - move.to_coord.col 
-                return self.__knight_move_causes_check(move, row_diff, col_diff)
-        
-        # Others - Diagonal or orthogonal, get 
-        elif piece.Type == PieceType.BISHOP:
-            # Check if the king is directly diagonal to the bishop
-            if (abs(move.to_coord.row - king_coord.row) == abs(move.to_coord.col - king_coord.col)):
-                # If it is, get the direction to move in for the possible check and call the helper function
-                # to check if the move results in a check
-                row_diff = king_coord.row - move.to_coord.row
-                col_diff = king_coord.col - move.to_coord.col
-                row_dir = SignDirection.POSITIVE if row_diff > 0 else SignDirection.NEGATIVE
-                col_dir = SignDirection.POSITIVE if col_diff > 0 else SignDirection.NEGATIVE
-                return self.__bishop_move_causes_check(move, row_dir, col_dir)
-        
-        # Check the squares in between, if it can see a king then it is check
-        elif piece.Type == PieceType.ROOK:
-            # Check if the row is the same and the column isn't, or vice versa
-            if (move.to_coord.row == king_coord.row ^ move.to_coord.col == king_coord.col):
-                # If it is, get the direction to move in for the possible check and call the helper function
-                # to check if the move results in a check
-                row_diff = move.to_coord.row - king_coord.row
-                col_diff = move.to_coord.col - king_coord.col
-                row_dir = SignDirection.POSITIVE if row_diff > 0 else SignDirection.NEGATIVE
-                col_dir = SignDirection.POSITIVE if col_diff > 0 else SignDirection.NEGATIVE
-                if row_diff == 0:
-                    row_dir = SignDirection.ZERO
-                if col_diff == 0:
-                    col_dir = SignDirection.ZERO
-
-                return self.__rook_move_causes_check(move, row_dir, col_dir)
-        
-        # If the piece is a queen
-        # Check if the piece is moving diagonally or orthogonally
-        if (abs(move.to_coord.row - king_coord.row) == abs(move.to_coord.col - king_coord.col)) or \
-            (move.to_coord.row == king_coord.row ^ move.to_coord.col == king_coord.col):
-            # If it is, get the direction to move in for the possible check and call the helper function
-            # for both the bishop and the rook piece, as queen has the same legal moves as both
-            row_diff = king_coord.row - move.to_coord.row 
-            col_diff = king_coord.col - move.to_coord.col
-            row_dir = SignDirection.POSITIVE if row_diff > 0 else SignDirection.NEGATIVE
-            col_dir = SignDirection.POSITIVE if col_diff > 0 else SignDirection.NEGATIVE
-            if row_diff == 0:
-                row_dir = SignDirection.ZERO
-            if col_diff == 0:
-                col_dir = SignDirection.ZERO
-            if self.__bishop_move_causes_check(move, row_dir, col_dir):
-                return True
-            else:
-                return self.__rook_move_causes_check(move, row_dir, col_dir)
-                
-        return False
-    
-    # Checks which squares the knight can see, and if the king is in one of those squares
-    # Returns true if the king is in check, false otherwise
-    def __knight_move_causes_check(self, move: Move, row_dir: int, col_dir: int) -> bool:
-        # Check if there is a piece where the knight could potentially move to, if there is and it is a king,
-        # return True. Otherwise, return False
-        piece: Piece = self._board_arr[move.to_coord.row + row_dir][move.to_coord.col + col_dir]
-        if piece is None:
-            return False
-        # print(piece.Type)
-        return piece.Type == PieceType.KING and piece.Color != self._turn
-
-    # Checks which squares the bishop can see, and if the king is in one of those squares
-    # Returns true if the king is in check, false otherwise
-    def __bishop_move_causes_check(self, move: Move, row_dir: SignDirection, col_dir: SignDirection) -> bool:
-        # Check if the piece is moving up or down
-        if row_dir  == SignDirection.POSITIVE:
-            row_dir = 1
-        else:
-            row_dir = -1
+        # Direct check (a promoted pawn gives check as the piece it's promoted to)
+        piece_type = move.promotion if move.promotion != None else self._board_arr[move.from_coord.row][move.from_coord.col].Type
+        if (to_square in check_info.check_squares[piece_type.value]):
+            return True
 
-        # Check if the piece is moving left or right
-        if col_dir == SignDirection.POSITIVE:
-            col_dir = 1
-        else:
-            col_dir = -1
-
-        # Loop through the squares in between the piece's current position and the square it's moving to
-        # Check if the square is occupied by a piece, if so return false
-        # If the square is occupied by the king, return true
-        curr_row = move.to_coord.row
-        curr_col = move.to_coord.col
-        # Check the diagonal until the edge of the board is reached or a piece is hit
-        while (curr_row < 8 and curr_row > 0) and (curr_col < 8 and curr_col > 0):
-            piece: Piece = self._board_arr[curr_row][curr_col] 
-            # If a piece is hit, return True if it is a king of the opposite color, False otherwise
-            if piece is not None:
-                return piece.Type == PieceType.KING and piece.Color != self._turn
-            # Continue checking the diagonal if no piece is hit
-            curr_row += row_dir
-            curr_col += col_dir
-        return False
-
-    # Checks which squares the rook can see, and if the king is in one of those squares
-    # Returns true if the king is in check after the move, false otherwise
-    def __rook_move_causes_check(self, move: Move, row_dir: SignDirection, col_dir: SignDirection) -> bool:
-        # Check if the piece is moving up or down
-        if row_dir  == SignDirection.POSITIVE:
-            row_dir = 1
-        elif row_dir == SignDirection.NEGATIVE:
-            row_dir = -1
-        else:
-            row_dir = 0
+        # A piece moving further along a line from the king which it was blocking itself
+        line_extension = check_info.line_extensions.get(from_square)
+        if (line_extension != None and (piece_type == line_extension[0] or piece_type == PieceType.QUEEN) and 
+            to_square in line_extension[1]):
+            return True
 
-        # Check if the piece is moving left or right
-        if col_dir == SignDirection.POSITIVE:
-            col_dir = 1
-        elif col_dir == SignDirection.NEGATIVE:
-            col_dir = -1
-        else:
-            col_dir = 0
-
-        # Loop through the squares in between the piece's current position and the square it's moving to
-        # Check if the square is occupied by a piece, if so return false
-        # If the square is occupied by the king, return true
-        curr_row = move.to_coord.row
-        curr_col = move.to_coord.col
-        while (curr_row < 8 and curr_row > 0) and (curr_col < 8 and curr_col > 0):
-            piece: Piece = self._board_arr[curr_row][curr_col] 
-            if piece is not None:
-                return piece.Type == PieceType.KING and piece.Color != self._turn
-            curr_row += row_dir
-            curr_col += col_dir
-        return False
\ No newline at end of file
+        # Discovered check (a piece blocking a line to the king moves off the line)
+        discovered_line = check_info.discovered_lines.get(from_square)
+        return discovered_line != None and to_square not in discovered_line
+
+    # Private method that gets the moves giving check to the king of the team whose turn it isn't
+    # Computed once per position and cached until the next move or undo
+    #
+    # Returns the CheckInfo of the position
+    def _get_check_info(self) -> CheckInfo:
+        if (self._check_info != None):
+            return self._check_info
+
+        team_color = self._turn
+        king_coord = self._pieces.get_king_coord(TeamColor.BLACK if team_color == TeamColor.WHITE else TeamColor.WHITE)
+        king_row = king_coord.row
+        king_col = king_coord.col
+        board_arr = self._board_arr
+
+        # Pawns give check from the spaces diagonally behind the king (in the direction the pawns move)
+        pawn_squares: set[int] = set()
+        row = king_row - self._get_pawn_direction(team_color)
+        if (0 <= row < 8):
+            for col in (king_col - 1, king_col + 1):
+                if (0 <= col < 8):
+                    pawn_squares.add(row * 8 + col)
+
+        # Knights give check from the spaces a knight on the king's space would attack
+        knight_squares: set[int] = set()
+        for row_offset, col_offset in self._KNIGHT_OFFSETS:
+            row = king_row + row_offset
+            col = king_col + col_offset
+            if (0 <= row < 8 and 0 <= col < 8):
+                knight_squares.add(row * 8 + col)
+
+        # Walk every line from the king. Every space up to the first piece gives check for the pieces moving along the
+        # line. If the first piece is on the team moving, keep walking up to the next piece for the discovered checks
+        bishop_squares: set[int] = set()
+        rook_squares: set[int] = set()
+        line_extensions: dict[int, tuple[PieceType, set[int]]] = dict()
+        discovered_lines: dict[int, set[int]] = dict()
+        for row_dir, col_dir in self._KING_RAY_DIRECTIONS:
+            diagonal = row_dir != 0 and col_dir != 0
+            slider_type = PieceType.BISHOP if diagonal else PieceType.ROOK
+            check_squares = bishop_squares if diagonal else rook_squares
+            line: list[int] = []
+            blocker: Piece = None
+            blocker_index = -1
+            row = king_row + row_dir
+            col = king_col + col_dir
+            while (0 <= row < 8 and 0 <= col < 8):
+                square = row * 8 + col
+                line.append(square)
+                if (blocker == None):
+                    check_squares.add(square)
+                piece: Piece = board_arr[row][col]
+                if (piece != None):
+                    if (blocker != None):
+                        # The blocker gives a discovered check if this piece is on its team and moves along the line
+                        if (piece.Color == team_color and (piece.Type == slider_type or piece.Type == PieceType.QUEEN)):
+                            discovered_lines[line[blocker_index]] = set(line)
+                        break
+                    # A piece of the other team can't move, so the line ends here
+                    if (piece.Color != team_color):
+                        break
+                    blocker = piece
+                    blocker_index = len(line) - 1
+                row += row_dir
+                col += col_dir
+
+            if (blocker != None):
+                line_extensions[line[blocker_index]] = (slider_type, set(line[blocker_index + 1:]))
+
+        # Indexed by the piece type's value (a king can't give check)
+        self._check_info = CheckInfo([pawn_squares, bishop_squares, knight_squares, rook_squares,
+                                      bishop_squares | rook_squares, set()], line_extensions, discovered_lines)
+        return self._check_info
\ No newline at end of file
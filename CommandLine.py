@@ -1,8 +1,11 @@
 from Board import Board, Move
 from MiniMax import MiniMax
-from generateTree import Node
+from generateTree import Node, SearchState
 from Connect2DB import Connect2DB
 from OpeningBook import OpeningBook
+from Tablebase import Tablebase
+from Bench import run_bench, DEFAULT_BENCH_DEPTH
+from Instrumentation import Instrumentation
 
 # The CommandLine class is used as a GUI to communicate with the chess engine. The CommandLine class will process 
 # the commands and send them to the engine for the appropriate action.
@@ -24,6 +27,14 @@ class CommandLine:
         self.__code = None
         self.__name = None
         self.__id_opening_book = -1
+        # The startpos or fen and the moves of the last position command (used to only play the new moves)
+        self.__position_base: str = None
+        self.__position_moves: list[str] = []
+        # Search statistics options (setoption name SearchStats value true, setoption name SearchStatsFile value <path>)
+        self.__search_stats: bool = False
+        self.__search_stats_file: str = None
+        # Transposition table, killer moves and PV kept from one search to the next (cleared by ucinewgame)
+        self.__search_state: SearchState = SearchState()
 
     # Executes the main command loop, which goes until the user types "quit" 
     def run_command_loop(self):
@@ -54,17 +65,26 @@ class CommandLine:
         # 5 as the default depth for now, can always change later.
         self._board = Board() 
         self._OpenBook = OpeningBook(self._board)
-        self._minimax = MiniMax(self._board, self.__depth)
+        self._minimax = MiniMax(self._board, self.__depth, search_state=self.__search_state)
         self.MYSQLDB = Connect2DB()
+        # Open the tablebase once and start reading the 3-4-5 piece tables into memory before the first search
+        Tablebase.get_instance(prefetch=True)
         print('id name 4Pawns')
         print('id author 4Pawns')
         print('uciok')
 
     # Switches the debug mode for the engine on or off. While debugging, the engine sends additional 
     # info to the GUI to help debugging. This mode is off by default, but can be turned on at any time.
+    #
+    # NOTE: While debugging, the hot path methods of the search are timed (see Instrumentation) and a summary is printed
+    #       at the end of every search. Turning debug off removes the timers
     def debug(self, turn_on):
-        # Don't know what to do here, maybe output some info? Like PV, evaluation, etc
         print('debug - ' + str(turn_on))
+        if (turn_on):
+            Instrumentation.reset()
+            Instrumentation.enable()
+        else:
+            Instrumentation.disable()
         return 0
     
     # Synchronizes the engine and the GUI.
@@ -78,8 +98,16 @@ class CommandLine:
     # Parameters:
     #   name: specifies the option to be changed
     #   value: specifies the new value of the option
+    #
+    # Options:
+    #   SearchStats: true to collect per-ply search statistics, shown as info string after every search
+    #   SearchStatsFile: the JSON file to write the search statistics to after every search
     def setoption(self, name, value):
         print(name, value)
+        if (name == 'SearchStats'):
+            self.__search_stats = value.lower() == 'true'
+        elif (name == 'SearchStatsFile'):
+            self.__search_stats_file = value if value != '' else None
         return 0
     
     # Registers the engine's name nad code with the GUI or tells the GUI that the engine will be
@@ -101,28 +129,10 @@ class CommandLine:
             print('register - later')
         # else if user choose to register the engine now, then register the engine
         else:
-            try:
-                # run sql statement
-                SQLStmt = "INSERT INTO engine(EngineCode, Username) VALUES (%s, %s)"
-
-                # execute, commit, and close connection to sql db
-                self.MYSQLDB.cursor.execute(SQLStmt, (code, name))
-
-                self.__code = code
-                self.__name = name
-
-                # print number of rows affected
-                print(f"{self.MYSQLDB.cursor.rowcount} row(s) affected.")
-
-                # get primary key (for access to this row)
-                # pk = self.MYSQLDB.cursor.lastrowid
-
-            # catch exception
-            except Exception as e:
-                print(f"Error: {e}")
-
-            # commit and close connection
-            self.MYSQLDB.conn.commit()
+            # the insert is done in the background so the GUI doesn't wait for the DB
+            self.MYSQLDB.register_engine(code, name)
+            self.__code = code
+            self.__name = name
 
             # print registration complete
             print(f"register name: {name} engine code: {code}")
@@ -138,6 +148,9 @@ class CommandLine:
             self.MYSQLDB.set_History(move_history, fen, self.__name, self.__code, self.__id_opening_book)
         self._Bool_OpeningBook = True
         self._board.reset_board()
+        self.__search_state.clear()
+        self.__position_base = None
+        self.__position_moves = []
         self.isready()
 
     # Set up the position described in fenstring on the internal board and play the given moves on the 
@@ -148,29 +161,34 @@ class CommandLine:
     #   startpos: the position is set up from the start position
     #   moves: a list of moves to play on the internal chess board
     def position(self, startpos: bool=False, moves: str=None, fen: str=None):
-        if startpos:
-            self._board = Board()
+        base = 'startpos' if startpos else fen
+        move_list = moves.split() if moves else []
+
+        # GUIs send every move of the game each ply, so if the new position only adds moves to the last position, 
+        # only the new moves are played instead of setting up the board again
+        if (base != None and base == self.__position_base and self._board != None
+            and move_list[:len(self.__position_moves)] == self.__position_moves):
+            new_moves = move_list[len(self.__position_moves):]
+        else:
+            if startpos:
+                self._board = Board()
+            elif fen:
+                self._board = Board(fen)
+            new_moves = move_list
+        
+        for move in new_moves:
+            self._board.move(Move.from_uci_str(move))
+        # Without startpos or fen the moves are played on the current board, so it can't be compared to later positions
+        self.__position_base = base
+        self.__position_moves = move_list
+        
+        # Only the position after the moves needs to be looked up in the opening book
+        opening_res = self._OpenBook.probe(self._board)
+        if (opening_res == None):
+            self._Bool_OpeningBook = False
+        else:
             self._Bool_OpeningBook = True
-        elif fen:
-            self._board = Board(fen)
-            opening_res = self._OpenBook.compare_Fen(self._board.get_fen())
-            if opening_res == None:
-                self._Bool_OpeningBook = False
-            else:
-                self._Bool_OpeningBook = True
-                self.__id_opening_book = opening_res[0][0]
-        if moves:
-            opening_res = self._OpenBook.compare_Fen(self._board.get_fen())
-            for move in moves.split(' '):
-                self._board.move(Move.from_uci_str(move))
-                opening_res = self._OpenBook.compare_Fen(self._board.get_fen())
-                if opening_res != None and opening_res[0] != None:
-                    self.__id_opening_book = opening_res[0][0]
-            
-            if (opening_res == None):
-                self._Bool_OpeningBook = False
-            else:
-                self._Bool_OpeningBook = True
+            self.__id_opening_book = opening_res[0]
 
     # Start calculating the best move in the current positon given with the "position" command. There are
     # many commands which can be used with this command, all of which will be sent in the same line.
@@ -185,15 +203,21 @@ class CommandLine:
     #   binc: black increment per move in ms if btime is used
     #   movestogo: there are movestogo moves to the next time control, only sent if movestogo > 0.
     #              Otherwise, white and black are in sudden death
-    #   depth: search x plies only
+    #   depth: search x plies only (if not given, searches limited by time use MiniMax.MAX_TIMED_DEPTH)
     #   nodes: search x nodes only
     #   mate: search for a mate in x moves
     #   movetime: search exactly x ms
     #   infinite: search until the "stop" command. Do not exit the search without being told so in this mode
     def go(self, searchmoves: [Move] = None, ponder=False, wtime: float = None, btime: float = None, winc: float = None,
-           binc: float = None, movestogo: int = None, depth: int = 3, nodes: float = float('inf'), mate: int = 0, movetime: float = 0,
+           binc: float = None, movestogo: int = None, depth: int = None, nodes: float = float('inf'), mate: int = 0, movetime: float = 0,
             infinite=False):  
         
+        # Let the time manager decide how deep to search when the search is limited by time
+        if depth is None:
+            # Ponder and infinite searches already deepen every iteration starting from the given depth
+            timed = wtime is not None or btime is not None or (movetime is not None and movetime > 0)
+            depth = MiniMax.MAX_TIMED_DEPTH if timed and not ponder and not infinite else self.__depth
+
         print(f"BoolOP: {self._Bool_OpeningBook}")
         
         if self._Bool_OpeningBook:
@@ -205,20 +229,20 @@ class CommandLine:
                 # print('book id', id_opening_book)
                 print('bestmove', open_move)
         if not self._Bool_OpeningBook:
+            # Convert the string of moves to Move objects
+            if searchmoves is not None:
+                searchmoves = [Move.from_uci_str(move) for move in searchmoves]
+
+            # The search state is kept from the last search, so a ponder search on the position after the ponder move 
+            # (sent by the GUI) starts with the PV of the last search
+            self._minimax = MiniMax(self._board, depth, movetime=movetime, searchmoves=searchmoves, node_limit=nodes,
+                                    wtime=wtime, btime=btime, winc=winc, binc=binc, movestogo=movestogo, mate=mate,
+                                    stats=self.__search_stats, search_state=self.__search_state)
             if ponder:
-                self._minimax = MiniMax(self._board, depth, movetime=movetime, searchmoves=searchmoves, node_limit=nodes,
-                                        wtime=wtime, btime=btime, winc=winc, binc=binc, movestogo=movestogo, mate=mate,)
-                self._minimax.ponder(self.minimax_callback)
+                self.__event = self._minimax.ponder(self.minimax_callback)
             elif infinite:
-                self._minimax.run_infinite(self.minimax_callback)
+                self.__event = self._minimax.run_infinite(self.minimax_callback)
             else:
-                # Convert the string of moves to Move objects
-                if searchmoves is not None:
-                    searchmoves = [Move.from_uci_str(move) for move in searchmoves]
-                    
-                self._minimax = MiniMax(self._board, depth, movetime=movetime, searchmoves=searchmoves, node_limit=nodes,
-                                        wtime=wtime, btime=btime, winc=winc, binc=binc, movestogo=movestogo, mate=mate,)
-
                 self.__event = self._minimax.run(self.minimax_callback)
 
     # Stops the engine calculating as soon as possible
@@ -227,13 +251,25 @@ class CommandLine:
         # self._minimax.print_best_line()
 
     # This is used to find the best move the engine has found so far.  
+    # The best reply to the best move is sent as the ponder move, the GUI then sends the position after it with go ponder
     def minimax_callback(self, stopped, best_child: Node, depth_to_mate: int):
+        # The search was stopped before a move was searched
+        if (best_child == None):
+            print('bestmove 0000')
+            return
         self.best_score = best_child.score
         self.best_move = best_child.previous_move
         self.depth_to_mate = depth_to_mate
-        print('bestmove', self.best_move)
+        self.ponder_move = best_child.best_child.previous_move if best_child.best_child != None else None
+        if (self.ponder_move != None):
+            print('bestmove', self.best_move, 'ponder', self.ponder_move)
+        else:
+            print('bestmove', self.best_move)
 
         self.show_info()
+        if (Instrumentation.is_enabled()):
+            Instrumentation.print_summary()
+            Instrumentation.reset()
 
     # This is executed when the user has played the expected move. This will be sent if the engine was told
     # to ponder on the same move the user has played. The engine should continue searching but switch from
@@ -246,6 +282,22 @@ class CommandLine:
         info = self._minimax.info()
         print("depth", info['depth'], "score cp", info['cp'], "time", info['time'], "nodes", info['nodes'], 
               "nps", info['nps'], "currmove", info['currmove'], "currmovenumber", info['currmovenumber'], "currline", info['currline'], "pv", info['pv'])
+        if (info['stats'] is not None):
+            stats = info['stats']
+            print("info string stats nodes", stats['totals']['nodes'], "qnodes", stats['totals']['q_nodes'],
+                  "firstmovecutoffs", f"{stats['first_move_cutoff_rate']:.3f}", "tthits", f"{stats['tt_hit_rate']:.3f}",
+                  "branching", ' '.join(f"{factor:.2f}" for factor in stats['branching_factors']))
+            if (self.__search_stats_file is not None):
+                self._minimax.get_stats().dump(self.__search_stats_file)
+
+    # Runs the engine benchmark on the bench positions and prints the nodes, NPS, and signature (not a UCI command)
+    #
+    # Parameters:
+    #   depth: the depth to search every position to
+    #
+    # Returns the results of the bench as a dict
+    def bench(self, depth: int = DEFAULT_BENCH_DEPTH):
+        return run_bench(depth)
 
     # Takes in a command and executes the correct function based on the command.
 
@@ -304,7 +356,7 @@ class CommandLine:
 
             case 'go':
                 cmd_dict = {'searchmoves':None, 'ponder':False, 'wtime':None, 'btime':None, 'winc':None, 'binc':None, 
-                                'movestogo':None, 'depth':3, 'nodes':float('inf'), 'mate':None, 'movetime':None, 'infinite':False}
+                                'movestogo':None, 'depth':None, 'nodes':float('inf'), 'mate':None, 'movetime':None, 'infinite':False}
                 for i in range(1, len(command_list)):
                     # Run through each command and check for any of the keywords found in the dictionary
                     if (command_list[i] in cmd_dict.keys()):
@@ -341,6 +393,12 @@ class CommandLine:
             case 'ponderhit':
                 self.ponderhit()
 
+            case 'bench':
+                if (len(command_list) > 1 and command_list[1].isdigit()):
+                    self.bench(int(command_list[1]))
+                else:
+                    self.bench()
+
             case 'quit':
                 if self._minimax.is_generating():
                     self._minimax.stop()
@@ -1,97 +1,401 @@
-import mysql.connector
-from dotenv import load_dotenv # for local use
+import atexit
 import os
+import queue
+import sqlite3
+import sys
+import threading
 import Board
 
-# Class SQLDatabase is used to connect to MySQL DB
+# mysql and dotenv are only needed for the MySQL backend
+try:
+    import mysql.connector
+    import mysql.connector.pooling
+except ImportError:
+    mysql = None
+try:
+    from dotenv import load_dotenv # for local use
+except ImportError:
+    load_dotenv = None
+
+# Constants:
+# Backend used by Connect2DB, "mysql" or "sqlite" (default is mysql if it is installed)
+BACKEND_ENV = "CHESS_DB_BACKEND"
+# Path of the SQLite DB file used by the sqlite backend
+SQLITE_PATH_ENV = "CHESS_DB_PATH"
+DEFAULT_SQLITE_PATH = os.path.dirname(os.path.realpath(__file__)) + os.sep + "chess.db"
+# Number of connections kept open by the pool
+POOL_SIZE = 4
+# Max number of queued writes executed in one transaction by the write-behind thread
+BATCH_SIZE = 64
+# Seconds the write-behind thread waits for more writes before executing a batch
+BATCH_WAIT = 0.05
+
+# SQL statements used by Connect2DB. Statements are written with %s placeholders (MySQL) and converted for SQLite
+SQL_GET_USERNAME = "SELECT username FROM users WHERE idEngine = %s"
+SQL_INSERT_ENGINE = "INSERT INTO engine (EngineCode, Username) VALUES (%s, %s)"
+# The engine id is found in the insert so the history doesn't need a SELECT first and can be batched
+SQL_INSERT_HISTORY = "INSERT INTO history (FenString, moveHistory, idEngine, idOpeningBook) \
+                      SELECT %s, %s, idEngine, %s FROM engine WHERE EngineCode = %s AND Username = %s"
+
+# Schema of the tables used by the engine, created when the sqlite backend is used
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS engine (idEngine INTEGER PRIMARY KEY AUTOINCREMENT, EngineCode TEXT NOT NULL, Username TEXT);
+CREATE TABLE IF NOT EXISTS users (idEngine INTEGER, username TEXT);
+CREATE TABLE IF NOT EXISTS history (idHistory INTEGER PRIMARY KEY AUTOINCREMENT, FenString TEXT, moveHistory TEXT NOT NULL,
+                                    idEngine INTEGER, idOpeningBook INTEGER);
+CREATE TABLE IF NOT EXISTS openingbook (idOpeningBook INTEGER PRIMARY KEY AUTOINCREMENT, Moves TEXT NOT NULL, WinRate REAL);
+CREATE TABLE IF NOT EXISTS openingbookfen (idOpeningBook INTEGER, MoveNumber INTEGER, Fen TEXT);
+CREATE INDEX IF NOT EXISTS openingbookfen_fen ON openingbookfen (Fen);
+"""
+
+# Returns the backend to use from the CHESS_DB_BACKEND environment variable
+def get_backend():
+    return os.environ.get(BACKEND_ENV, "mysql" if mysql != None else "sqlite").lower()
+
+# Converts a statement with %s placeholders to the placeholders of the backend
+def convert_sql(sql, backend):
+    return sql.replace("%s", "?") if backend == "sqlite" else sql
+
+# Cursor for the sqlite backend that accepts %s placeholders so the same SQL works with both backends
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self.__cursor = cursor
+
+    def execute(self, sql, params=()):
+        return self.__cursor.execute(convert_sql(sql, "sqlite"), params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.__cursor.executemany(convert_sql(sql, "sqlite"), seq_of_params)
+
+    # fetchone, fetchall, rowcount, lastrowid, etc are the same as the sqlite cursor
+    def __getattr__(self, name):
+        return getattr(self.__cursor, name)
+
+# Pool of open connections so a new connection isn't made for every statement
+#
+# NOTE: MySQL uses the pool of mysql.connector, SQLite keeps a queue of connections. SQLite statements are prepared
+#       once and reused by the statement cache of each connection
+# NOTE: Connections are only checked out for one statement (PooledCursor) or one batch of writes (WriteBehindQueue),
+#       so the number of Connect2DB objects doesn't matter, only the number of statements running at the same time
+class ConnectionPool:
+    # Creates the pool for the backend
+    #
+    # @PARMS:
+    #   backend: "mysql" or "sqlite"
+    #   size: the number of connections kept open
+    def __init__(self, backend, size=POOL_SIZE):
+        self.backend = backend
+        self.__size = size
+        self.__connections = queue.Queue()
+        self.__mysql_pool = None
+        # Number of connections checked out and not given back yet
+        self.__in_use = 0
+        self.__in_use_lock = threading.Lock()
+
+        if backend == "mysql":
+            if mysql == None:
+                raise ImportError("mysql-connector-python is needed for the mysql backend")
+            # This is for local .env file (not in GitLab)
+            if load_dotenv != None:
+                load_dotenv()
+            # We will be using port 33306 on our machine to connect to the DB port 3306 on the VM
+            # (which is already configured when we SSH)
+            # NOTE: password should be in CI/CD pipeline in GitLab (same var. name)
+            self.__mysql_pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name="chess",
+                pool_size=size,
+                host="localhost",
+                user="root",
+                password=os.environ.get("MYSQL_PASSWORD"),
+                database="chess",
+                port="33306"
+            )
+        else:
+            self.__sqlite_path = os.environ.get(SQLITE_PATH_ENV, DEFAULT_SQLITE_PATH)
+            conn = self.get_connection()
+            conn.executescript(SQLITE_SCHEMA)
+            conn.commit()
+            self.release(conn)
+
+    # Gets a connection from the pool. Must be given back using release()
+    def get_connection(self):
+        if self.__mysql_pool != None:
+            conn = self.__mysql_pool.get_connection()
+        else:
+            try:
+                conn = self.__connections.get_nowait()
+            except queue.Empty:
+                # The connection is shared between threads (by the write-behind thread), but only used by one at a time
+                conn = sqlite3.connect(self.__sqlite_path, check_same_thread=False)
+        with self.__in_use_lock:
+            self.__in_use += 1
+        return conn
+
+    # Gives a connection back to the pool
+    def release(self, conn):
+        with self.__in_use_lock:
+            self.__in_use -= 1
+        if self.__mysql_pool != None:
+            # Closing a pooled MySQL connection gives it back to the pool
+            conn.close()
+        elif self.__connections.qsize() < self.__size:
+            self.__connections.put(conn)
+        else:
+            conn.close()
+
+    # Returns a cursor for a connection of the pool
+    #
+    # @PARMS:
+    #   prepared: use prepared statements (MySQL only, SQLite always caches its statements)
+    def cursor(self, conn, prepared=False):
+        if self.backend == "sqlite":
+            return SQLiteCursor(conn.cursor())
+        return conn.cursor(prepared=True) if prepared else conn.cursor(buffered=True)
+
+    # Returns the number of connections checked out and not given back yet
+    def in_use(self):
+        return self.__in_use
+
+    # Closes every connection in the pool
+    def close(self):
+        while not self.__connections.empty():
+            self.__connections.get_nowait().close()
+
+# Cursor which gets a connection from the pool for every statement and gives it back right after, so a Connect2DB
+# doesn't keep a connection for as long as it exists. The rows of the last query are kept until they are fetched
+class PooledCursor:
+    # Creates the cursor
+    #
+    # @PARMS:
+    #   pool: the ConnectionPool to get the connections from
+    def __init__(self, pool):
+        self.__pool = pool
+        self.__rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+
+    # Executes a statement (with %s placeholders) and commits it
+    def execute(self, sql, params=()):
+        conn = self.__pool.get_connection()
+        try:
+            cursor = self.__pool.cursor(conn)
+            cursor.execute(sql, params)
+            # Only queries have rows to fetch
+            self.__rows = list(cursor.fetchall()) if cursor.description != None else []
+            self.rowcount = cursor.rowcount
+            self.lastrowid = cursor.lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.__pool.release(conn)
+
+    # Returns the next row of the last query, None if there are no more rows
+    def fetchone(self):
+        return self.__rows.pop(0) if len(self.__rows) > 0 else None
+
+    # Returns the remaining rows of the last query
+    def fetchall(self):
+        rows = self.__rows
+        self.__rows = []
+        return rows
+
+# Thread that executes queued writes in the background so game bookkeeping never waits for the DB.
+# Consecutive writes with the same SQL are executed together with executemany() in one transaction, using a connection
+# of the pool which is given back after every batch
+#
+# NOTE: Each group of writes is committed on its own, so a failing statement only drops the writes of its group
+class WriteBehindQueue:
+    # Starts the write-behind thread
+    #
+    # @PARMS:
+    #   pool: the ConnectionPool to get the connection from
+    def __init__(self, pool):
+        self.__pool = pool
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    # Queues a write
+    #
+    # @PARMS:
+    #   sql: the statement to execute (with %s placeholders)
+    #   params: the parameters of the statement
+    def put(self, sql, params):
+        self.__queue.put((sql, params))
+
+    # Waits until every queued write was executed
+    def flush(self):
+        self.__queue.join()
+
+    # Executes the remaining writes and stops the thread
+    def close(self):
+        self.__queue.put(None)
+        self.__thread.join()
+
+    # Runs the write-behind loop until close() is called
+    def __run(self):
+        running = True
+        while running:
+            # Wait for a write, then take the writes queued soon after it as the same batch
+            batch = [self.__queue.get()]
+            while len(batch) < BATCH_SIZE and batch[-1] != None:
+                try:
+                    batch.append(self.__queue.get(timeout=BATCH_WAIT))
+                except queue.Empty:
+                    break
+            if batch[-1] == None:
+                running = False
+
+            writes = [write for write in batch if write != None]
+            conn = None
+            try:
+                conn = self.__pool.get_connection()
+                cursor = self.__pool.cursor(conn, prepared=True)
+                # Keep the order of the writes (Ex: an engine is registered before its history is inserted)
+                start = 0
+                while start < len(writes):
+                    end = start
+                    while end < len(writes) and writes[end][0] == writes[start][0]:
+                        end += 1
+                    self.__execute_group(conn, cursor, writes[start][0], [write[1] for write in writes[start:end]])
+                    start = end
+            except Exception as e:
+                # stdout is used by UCI, so errors go to stderr
+                print(f"Error connecting to database: {e}", file=sys.stderr)
+            finally:
+                if conn != None:
+                    self.__pool.release(conn)
+
+            for _ in batch:
+                self.__queue.task_done()
+
+    # Executes a group of writes with the same SQL and commits them, the group is rolled back if a write fails
+    #
+    # @PARMS:
+    #   conn: the connection of the batch
+    #   cursor: a cursor of conn
+    #   sql: the statement of the group (with %s placeholders)
+    #   params: the parameters of each write of the group
+    def __execute_group(self, conn, cursor, sql, params):
+        try:
+            cursor.executemany(convert_sql(sql, self.__pool.backend), params)
+            conn.commit()
+        except Exception as e:
+            print(f"Error writing to database: {e}", file=sys.stderr)
+            conn.rollback()
+
+# Class SQLDatabase is used to connect to MySQL DB (or SQLite when MySQL isn't available)
 # to create, read, update, and delete data from the DB
+#
+# NOTE: Every Connect2DB shares the same connection pool and write-behind queue. Reads use self.cursor (which only
+#       holds a connection while a statement runs), writes that don't need a result are queued and done in the background
 class Connect2DB:
+    _pool: ConnectionPool = None
+    _writer: WriteBehindQueue = None
+    _lock = threading.Lock()
 
-    # Constructor: set up connection to MySQL DB
-    #
-    # @PARMS
-    #  db: variable use to connect to MySQL DB
+    # Constructor: set up the cursor to execute SQL queries
     #
     # return: None
     def __init__(self):
-        
-        # set up connection to MySQL DB
-        self.conn = self.set_Connection()
-        
-        # set up cursor to execute SQL queries
-        self.cursor = self.conn.cursor(buffered=True)
-
-    # Destructor: close connection to MySQL DB
-    def __del__(self):
-        self.conn.close()
-
-    # Set up the connection to MySQL DB. We will be using port 33306
-    # on our machine to connect to the DB port 3306 on the VM 
-    # (which is already configured when we SSH)
+
+        # set up cursor to execute SQL queries, it gets a connection from the pool for every query
+        self.cursor = self.set_Connection()
+
+    # Creates the connection pool and write-behind queue the first time it's called
     #
-    # @PARMS
-    #   conn: variable use to connect to MySQL DB
+    # return: the ConnectionPool
+    @classmethod
+    def get_pool(cls):
+        with cls._lock:
+            if cls._pool == None:
+                cls._pool = ConnectionPool(get_backend())
+                cls._writer = WriteBehindQueue(cls._pool)
+                # Don't lose queued writes when the engine quits
+                atexit.register(cls.shutdown)
+        return cls._pool
+
+    # Executes the queued writes, then closes the write-behind queue and the pool
+    @classmethod
+    def shutdown(cls):
+        with cls._lock:
+            if cls._writer != None:
+                cls._writer.close()
+            if cls._pool != None:
+                cls._pool.close()
+            cls._pool = None
+            cls._writer = None
+
+    # Waits until every queued write is in the DB
+    def flush(self):
+        if Connect2DB._writer != None:
+            Connect2DB._writer.flush()
+
+    # Set up the connection pool
     #
-    # NOTE: password should be in CI/CD pipeline in GitLab (same var. name)
+    # return: a PooledCursor of the pool, None if the DB can't be connected to
     def set_Connection(self):
-        
-        # This is for local .env file (not in GitLab)
-        load_dotenv() 
-        
         try:
-            # Process "conn" to connect to MySQL DB with these options
-            conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password=os.environ.get("MYSQL_PASSWORD"),
-                database="chess",
-                port="33306"
-            )
-
-            if conn.is_connected():
-                # return conn for further processing
-                return conn
-            
+            return PooledCursor(Connect2DB.get_pool())
         except Exception as e:
-            print(f"Error connecting to MySQL database: {e}")
+            print(f"Error connecting to database: {e}")
             return None
-    
-        
+
+
     # engine Table: get username from DB using engine_Code
-    # 
+    #
     # @PARMS:
     #   idEngine: engine Primary Key use to retireved username
     def get_username(self, idEngine):
-        # SQL query to get username from DB
-        sql = "SELECT username FROM users WHERE idEngine = %s"
         # execute query
-        self.cursor.execute(sql, (idEngine))
+        self.cursor.execute(SQL_GET_USERNAME, (idEngine,))
         # get result from query
         result = self.cursor.fetchone()
         # return result
         return result
-    
-    # Set history table in SQL DB with the following parameters
+
+    # Register an engine in the engine table. The insert is done in the background
+    #
+    # @PARMS:
+    #   code: the engine code
+    #   name: the username of the engine
+    def register_engine(self, code, name):
+        self.__queue_write(SQL_INSERT_ENGINE, (code, name))
+
+    # Set history table in SQL DB with the following parameters. The insert is done in the background unless wait is True
     #
     # @PARMS:
     #   FenString: FEN string of the board
     #   moveHistory: move history of the board
-    #   idEngine: engine Primary Key
+    #   name: engine username
+    #   code: engine code
     #   idOpeningBook: opening book Primary Key
-    #   idEndGame: end game Primary Key
-    def set_History(self, moveHistory: str, FenString: str, name: str, code: str, idOpeningBook: int = -1):        
-        sql = "SELECT idEngine FROM engine WHERE EngineCode = %s and Username = %s"
-        self.cursor.execute(sql, (code, name))
-        idEngine = self.cursor.fetchone()[0]
-        
-        # idOpeningBook is get from SQL DB
-        # TODO: get idOpeningBook from SQL DB
-        
-        # SQL query to insert into history table
-        sql = "INSERT INTO history (FenString, moveHistory, idEngine, idOpeningBook) VALUES (%s, %s, %s, %s)"
-        # execute query
-        self.cursor.execute(sql, (FenString, moveHistory, idEngine, idOpeningBook))
-        # commit changes to DB
-        self.conn.commit()
-        # return result
-        return self.cursor.lastrowid
\ No newline at end of file
+    #   wait: insert the row now and return its id
+    #
+    # return: the id of the inserted row if wait is True (None if the engine isn't registered), otherwise None
+    #
+    # NOTE: By default returns None (used to always return the id of the inserted row) as the row is only inserted later
+    #       by the write-behind thread. Callers that need the id must pass wait=True
+    def set_History(self, moveHistory: str, FenString: str, name: str, code: str, idOpeningBook: int = -1, wait: bool = False):
+        params = (FenString, moveHistory, idOpeningBook, code, name)
+        if not wait:
+            self.__queue_write(SQL_INSERT_HISTORY, params)
+            return None
+
+        if self.cursor == None:
+            return None
+        # The queued writes go first (Ex: the engine may still be waiting to be registered)
+        self.flush()
+        self.cursor.execute(SQL_INSERT_HISTORY, params)
+        return self.cursor.lastrowid if self.cursor.rowcount > 0 else None
+
+    # Queues a write for the write-behind thread
+    def __queue_write(self, sql, params):
+        try:
+            Connect2DB.get_pool()
+        except Exception as e:
+            print(f"Error connecting to database: {e}", file=sys.stderr)
+            return
+        Connect2DB._writer.put(sql, params)
@@ -0,0 +1,106 @@
+from Board import Board
+from generateTree import Tree, MovePicker
+import functools
+import threading
+import time
+
+# Switchable timers for the hot path of the search
+#
+# When enabled, the methods in HOOKS are replaced on their class by wrappers that add the time spent in the method
+# (perf_counter_ns) and the number of calls to cumulative counters. When disabled, the original methods are put back,
+# so the search doesn't pay anything for the instrumentation while it is off.
+#
+# Use with the UCI command: debug on / debug off (a summary is printed at the end of every search)
+#
+# NOTE: Times are inclusive, a method calling another instrumented method (Ex: order_captures calling update_zobrist_hash)
+#       also counts the time of the inner call. The wrappers add some overhead of their own, so compare times with each
+#       other rather than with an uninstrumented search
+
+# Constants:
+# The (class, method name) of every instrumented method
+HOOKS = [(Board, 'move'),
+         (Board, 'undo_move'),
+         (Board, 'get_all_legal_moves'),
+         (Board, 'evaluate'),
+         (Board, 'update_zobrist_hash'),
+         # The moves of a node are scored stage by stage when they are picked, so this is the time of move ordering
+         (MovePicker, 'next'),
+         (Tree, 'order_captures')]
+
+class Instrumentation:
+    # The original method of every hook while enabled, by hook name (Ex: 'Board.move')
+    _originals: dict = dict()
+    # [calls, total ns] of every hook, by hook name
+    _counters: dict = dict()
+    _lock = threading.Lock()
+
+    # Returns true if the hooks are installed
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return len(cls._originals) > 0
+
+    # Installs the hooks. Does nothing if already enabled
+    @classmethod
+    def enable(cls):
+        with cls._lock:
+            if (cls._originals):
+                return
+            for owner, name in HOOKS:
+                hook_name = owner.__name__ + '.' + name
+                original = getattr(owner, name)
+                cls._originals[hook_name] = (owner, name, original)
+                cls._counters.setdefault(hook_name, [0, 0])
+                setattr(owner, name, cls.__wrap(original, cls._counters[hook_name]))
+
+    # Removes the hooks and puts the original methods back. The counters are kept until reset() is called
+    @classmethod
+    def disable(cls):
+        with cls._lock:
+            for owner, name, original in cls._originals.values():
+                setattr(owner, name, original)
+            cls._originals.clear()
+
+    # Sets every counter back to 0
+    @classmethod
+    def reset(cls):
+        for counter in cls._counters.values():
+            counter[0] = 0
+            counter[1] = 0
+
+    # Returns a dict of hook name -> {'calls', 'total_ms', 'avg_ns'}, sorted by highest total time
+    @classmethod
+    def get_summary(cls) -> dict:
+        summary = dict()
+        for hook_name, (calls, total_ns) in sorted(cls._counters.items(), key=lambda item: -item[1][1]):
+            summary[hook_name] = {'calls': calls,
+                                  'total_ms': total_ns / 1e6,
+                                  'avg_ns': total_ns / calls if calls > 0 else 0}
+        return summary
+
+    # Prints the summary as UCI info strings
+    @classmethod
+    def print_summary(cls):
+        for hook_name, hook in cls.get_summary().items():
+            print(f"info string {hook_name} calls {hook['calls']} total_ms {hook['total_ms']:.1f} avg_ns {hook['avg_ns']:.0f}")
+
+    # Returns a wrapper of a method that adds its calls and time to a counter
+    #
+    # Parameters:
+    #   method: the method to wrap
+    #   counter: the [calls, total ns] list of the method
+    #
+    # NOTE: The counter is updated without a lock. The search runs on one thread at a time, and a lost update while
+    #       two searches overlap only makes the numbers slightly off
+    @staticmethod
+    def __wrap(method, counter: list):
+        perf_counter_ns = time.perf_counter_ns
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += perf_counter_ns() - start
+        return wrapper
@@ -1,18 +1,22 @@
-from generateTree import Tree
+from generateTree import Tree, EvalCache, SearchStats, SearchState
 from Board import *
-from threading import Thread, Event, Timer
+from TimeManager import TimeManager
+from Tablebase import Tablebase
+from threading import Thread, Event, Timer, current_thread
 import time
+import copy
 from typing import Callable
 
 # Author: Alex Arovas
 
 # UCI COMMANDLINE INTEGRATION:
 #   - go: Call run() to generate MiniMax in its normal search mode. Will stop search when max_depth reached
-#   - go ponder: Call ponder() to generate MiniMax in ponder mode. 
-#       - Call ponderhit() to initiate a ponderhit
-#       - Call stop() to stop search (Pondermiss)
-#       - NOTE: Best to call ponder with some time constraints when testing. Upon ponderhit, will run until the current tree 
-#           is done generating, or time constraint reached. If the current tree has a high depth, might take a long time.
+#   - go ponder: Call ponder() to generate MiniMax in ponder mode on the board after the ponder move (the GUI sends the
+#       position with the ponder move played). Searches deeper every iteration like go infinite
+#       - Call ponderhit() to initiate a ponderhit. The search keeps every iteration done while pondering and becomes a
+#           timed search: the clock starts and the time manager decides whether to start the next iteration
+#       - Call stop() to stop search (Pondermiss). The tree being generated stops at the next node
+#       - NOTE: If ponder was called without time constraints, the search stops after the current iteration on ponderhit
 #   - go infinite: Call run_infinite() to generate Minimax in infinite mode. Will only stop when stop() is called
 #
 #   - go searchmoves: Initialize MiniMax with the searchmoves argument, or set searchmoves with the setter and generate
@@ -23,11 +27,20 @@ from typing import Callable
 #   - go movestogo: Initialize MiniMax with movestogo argument, or set movestogo with setter and generate
 #   - go mate: Initialize MiniMax with mate argument, or set mate with setter and generate
 #   - go movetime: Initialize MiniMax with movetime argument, or set movetime with setter (set_time_limit()) and generate
+#   - NOTE: When a search is limited by time, run() uses iterative deepening up to max_depth. The TimeManager decides
+#       whether another iteration can finish in time
+#
+#   - NOTE: When the root has less than 6 pieces, run() probes the tablebase first. If the tablebase has a best move it is
+#       played without a search, otherwise only the moves keeping the best WDL are searched
 #
 #   - go depth: Initialize MiniMax with the desired depth, or call change_board_or_max_depth() with depth argument to change depth
 #   - go nodes: Initialize MiniMax with the desired nodes, or call change_board_or_max_depth() with node argument to change nodes
 #   - NOTE: change_board_or_max_depth() will call run() immediately after completing
 #
+#   - NOTE: Every tree generated shares the SearchState (hash moves, killer moves and PV). Pass the same
+#       SearchState to the MiniMax of the next move so the search continues from the last one when the new board is
+#       two plies down from the last board searched (See SearchState)
+#
 #   ENGINE TO GUI
 #   - info: call info(). Will return a dict with every possible parameter with the exception of stuff that doesn't apply. 
 #       Simply select which ones we want to show. Example info()['depth']
@@ -43,8 +56,10 @@ class MiniMax:
     __start_time: float
     __event: Event # Used to wait for the tree to finish if necessary
     __timer: Timer = None # Used to stop generating after a certain time limit
-    ESTIMATED_MOVES_UNTIL_GAME_END = 40
+    __time_manager: TimeManager = None # Used to decide how long to search for
+    ESTIMATED_MOVES_UNTIL_GAME_END = TimeManager.ESTIMATED_MOVES_UNTIL_GAME_END
     TIME_PADDING = 0.05 # Used to make sure timer is stopped <= to the time specified instead of being a few milliseconds over.
+    MAX_TIMED_DEPTH = 30 # The max depth used when the search is only limited by time
 
     # Creates a new MiniMax object
     #
@@ -56,9 +71,12 @@ class MiniMax:
     # board: the root to generate the minimax tree from
     # max_depth: limit the depth of the minimax tree
     # searchmoves: a list of moves to search for (default value is None - search all moves)
+    # stats: collect per-ply search statistics (see SearchStats) in every tree generated (default value is False)
+    # search_state: the SearchState of the last search (default value is None - start from nothing)
     def __init__(self, board: Board, max_depth: int, movetime: float = None, q_depth: int = 5, searchmoves: [Move] = None, 
                  node_limit: float = float('inf'), wtime: float = None, btime: float = None, movestogo: int = None,
-                 winc: float = 0, binc: float = 0, mate: int = None) -> None:
+                 winc: float = 0, binc: float = 0, mate: int = None, stats: bool = False,
+                 search_state: SearchState = None) -> None:
         # Set stop to false so the tree will generate
         self.__stop: bool = False
         self.__stoploop: bool = False
@@ -67,12 +85,24 @@ class MiniMax:
         # Set to false as the tree is not generating infinitely or pondering yet
         self.__generating_infinite: bool = False
         self.__pondering: bool = False
+        # Static evaluation cache shared by every tree generated by this object
+        self.__eval_cache: EvalCache = EvalCache()
+        # Search statistics shared by every tree generated by this object (None if not collected)
+        self.__stats: SearchStats = SearchStats() if stats else None
+        # Transposition table, killer moves and PV shared by every tree generated by this object
+        self.__search_state: SearchState = search_state if search_state != None else SearchState()
+        self.__search_state.set_root(board)
         # Create the minimax tree object (not generating the tree yet)
-        self.__tree: Tree = Tree(root=board, depth=max_depth, q_depth=q_depth, searchmoves=searchmoves, nodes=node_limit)
+        self.__tree: Tree = Tree(root=board, depth=max_depth, q_depth=q_depth, searchmoves=searchmoves, nodes=node_limit,
+                                 eval_cache=self.__eval_cache, stats=self.__stats, search_state=self.__search_state)
         # Set the searchmoves of the tree
         self.__searchmoves = searchmoves
+        # The moves searched at the root by run(). Same as searchmoves unless the tablebase removed some moves
+        self.__root_moves = searchmoves
         # Set the q_depth of the tree
         self.__q_depth = q_depth
+        # Nodes searched by trees of earlier iterations (used for info)
+        self.__nodes_offset: int = 0
 
         # Other uci related fields
         self.__movestogo: int = movestogo
@@ -119,9 +149,21 @@ class MiniMax:
     def get_time_elapsed(self):
         return (time.time() - self.__start_time) * 1000
     
+    # Returns the nodes searched by every tree generated by the current search
+    def get_nodes_searched(self):
+        return self.__nodes_offset + self.__tree.get_nodes_searched()
+
+    # Getter for the search statistics (None if MiniMax was created without stats)
+    def get_stats(self) -> SearchStats:
+        return self.__stats
+
+    # Getter for the SearchState shared by every tree generated
+    def get_search_state(self) -> SearchState:
+        return self.__search_state
+
     # Returns the average nodes searched per second
     def get_nps(self):
-        return self.__tree.get_nodes_searched() / self.get_time_elapsed()
+        return self.get_nodes_searched() / (self.get_time_elapsed() / 1000)
 
     # Used for Engine to UCI info output
     def info(self):
@@ -132,9 +174,13 @@ class MiniMax:
                 'mate': self.__tree.get_depth_to_mate(),
                 'currmove': self.__tree.get_currmove(),
                 'currmovenumber': self.__tree.get_currmovenumber(),
-                'nodes': self.__tree.get_nodes_searched(),
+                'nodes': self.get_nodes_searched(),
                 'nps': self.get_nps(),
                 'tbhits': self.__tree.get_tbhits(),
+                'tbcachehits': self.__tree.get_tb_cache_hits(),
+                'evalhits': self.__eval_cache.hits,
+                'evalmisses': self.__eval_cache.misses,
+                'stats': self.__stats.to_dict() if self.__stats is not None else None,
                 'pv': self.__tree.get_best_line(ucimode=True),
                 'currline': self.__tree.get_current_line(ucimode=True)}
 
@@ -152,9 +198,18 @@ class MiniMax:
     #               ponder
     # 
     # NOTE: Callback is used even if stopped
+    # NOTE: If the search is limited by time, iterative deepening is used and the tree will be replaced every iteration
     def run(self, callback: Callable[[bool, str, int], None]|None = None) -> Event:
-        # Create the thread that will run __generate_tree() to generate the minimax tree
-        thread = Thread(target=self.__generate_tree)
+        self.__nodes_offset = 0
+        tablebase_move = self.__probe_root()
+        self.__time_manager = self.__create_time_manager()
+        # Create the thread that will generate the minimax tree
+        # A search limited by time uses iterative deepening so the time manager can decide when to stop
+        # The tablebase move only needs a tree of depth 1 to be scored, so it doesn't need iterative deepening
+        if (tablebase_move != None):
+            thread = Thread(target=self.__generate_tree)
+        else:
+            thread = Thread(target=self.__generate_iterative if self.__time_manager.is_limited() else self.__generate_tree)
         # Assign the thread to the __generate_thread field so it can be joined later
         self.__generate_thread = thread
         # Assign the callback function to the __callback_function field so it can be called later
@@ -162,103 +217,220 @@ class MiniMax:
         # Create the event that will be returned so program can wait for the tree to finish generating if necessary
         self.__event = Event()
         self.__stop = False
-        # Start the thread and timer
+        # Start the thread and timer (start time is set first since a short search can call the callback right away)
+        self.__start_time = time.time()
         thread.start()
         self.__set_time()
-        self.__start_time = time.time()
         # Return the event
         return self.__event
     
     # Used for UCI go infinite
     # Should not be called with any time limit
-    def run_infinite(self, callback: Callable[[bool, str, int], None]|None = None):
+    #
+    # Returns an Event which is set when the search is done
+    def run_infinite(self, callback: Callable[[bool, str, int], None]|None = None) -> Event:
         thread = Thread(target=self.run_loop)
         self.__inf_generate_thread = thread
         self.__stop = False
         self.__stoploop = False
         self.__callback_function_inf = callback
-        thread.start()
+        self.__event = Event()
         self.__start_time = time.time()
+        thread.start()
+        return self.__event
 
     # Runs a loop of minimax searches
     # Will increase the max_depth with every iteration
-    # Will only be stopped when stop() is called
+    # Will only be stopped when stop() is called, or after a ponderhit when the time manager doesn't start another iteration
+    #
+    # NOTE: Every iteration shares the SearchState, so the next iteration starts with the PV of the last one.
+    #       If an iteration is stopped before it is done, the last finished iteration is used
     def run_loop(self):
         self.__generating_infinite = True
+        self.__generating = True
+        self.__nodes_offset = 0
+        start_time = time.time()
+        board = self.__tree.board()
         max_depth = self.__tree.max_depth()
-        best_child = None
-        old_best_child = None
+        max_nodes = self.__tree.max_nodes()
+        completed_tree = None
+        print("Generating tree...")
 
-        while (not self.__stoploop):
-            old_best_child = best_child
-            if not self.__stop: self.__tree = Tree(self.__tree.board(), max_depth)
-            thread = Thread(target=self.__generate_tree)
-            self.__generate_thread = thread
-            self.__event = Event()
-            thread.start()
-            thread.join()
+        while (True):
+            # The first iteration searches the tree created with MiniMax
+            if (completed_tree != None):
+                self.__nodes_offset += self.__tree.get_nodes_searched()
+                self.__tree = Tree(root=board, depth=max_depth, q_depth=self.__q_depth, searchmoves=self.__searchmoves,
+                                   nodes=max_nodes, eval_cache=self.__eval_cache, stats=self.__stats,
+                                   search_state=self.__search_state)
+            iteration_start = time.time()
 
-            best_child = self.__tree.root().best_child if self.__tree.root().best_child != None else self.__tree.root().child
+            if (not self.__search_tree()):
+                break
+            completed_tree = self.__tree
+            self.__search_state.update(board, self.__tree.get_pv())
+            if (self.__stoploop or self.__mate_found() or self.__tree.get_nodes_searched() >= max_nodes):
+                break
+
+            # After a ponderhit, the time manager decides whether the next iteration can finish in time
+            # NOTE: Read once since ponderhit() sets it from another thread
+            time_manager = self.__time_manager
+            if (not self.__pondering and time_manager != None):
+                root = self.__tree.root()
+                best_child = root.best_child if root.best_child != None else root.child
+                time_manager.record_iteration(self.__tree.get_nodes_searched(), time.time() - iteration_start,
+                                              best_child.previous_move if best_child != None else None, root.score)
+                if (not time_manager.should_start_next_iteration()):
+                    break
             max_depth += 1
 
-        if (old_best_child.score > best_child.score):
-            best_child = old_best_child
-        
+        if (completed_tree != None and completed_tree is not self.__tree):
+            self.__nodes_offset += self.__tree.get_nodes_searched() - completed_tree.get_nodes_searched()
+            self.__tree = completed_tree
+        if (self.__timer != None): self.__timer.cancel()
+
+        self.__generating = False
+        self.__generating_infinite = False
+        self.__pondering = False
+
+        best_child = self.__tree.root().best_child if self.__tree.root().best_child != None else self.__tree.root().child
         if (self.__callback_function_inf != None):
-            self.__callback_function_inf(self.__stoploop and self.__stop, best_child, self.__tree.get_depth_to_mate())
+            self.__callback_function_inf(self.__stop, best_child, self.__tree.get_depth_to_mate())
+        self.__event.set()
+
+        print("Done generating tree")
+        print("Tree generated in " + str(time.time() - start_time) + " seconds")
 
     # UCI ponder command
-    # Just calls run_infinite but can be terminated with the unique function ponderhit()
-    def ponder(self, callback: Callable[[bool, str, int], None]|None = None):
+    # Just calls run_infinite but can be turned into a timed search with the unique function ponderhit()
+    #
+    # Returns an Event which is set when the search is done
+    def ponder(self, callback: Callable[[bool, str, int], None]|None = None) -> Event:
         self.__pondering = True
-        self.run_infinite(callback)
+        self.__time_manager = None
+        return self.run_infinite(callback)
+
+    # Creates the time manager for the side to move depending on user defined parameters
+    def __create_time_manager(self) -> TimeManager:
+        board = self.__tree.board()
+        if (board.get_turn_color() == TeamColor.WHITE):
+            time_left, increment = self.__wtime, self.__winc
+        else:
+            time_left, increment = self.__btime, self.__binc
+        legal_move_count = len(self.__root_moves) if self.__root_moves != None else len(board.get_all_legal_moves())
 
-    # Sets the timer from which to stop running depending on user defined parameters
-    def __set_time(self):
-        # Set the time limit to the user defined time limit
-        time_limit = self.__time_limit
-        # If user did not provide a time limit, compute other conditions
-        if (time_limit == None):
-            divider = self.__movestogo if self.__movestogo is not None else self.ESTIMATED_MOVES_UNTIL_GAME_END
-
-            if (self.__tree.board().get_turn_color() == TeamColor.WHITE):
-                if (self.__wtime == None): return
-                total_incr = self.__winc * divider if self.__winc != None else 0
-                time_limit = (self.__wtime + total_incr) / divider
-            else:
-                if (self.__btime == None): return
-                total_incr = self.__binc * divider if self.__binc != None else 0
-                time_limit = (self.__btime + total_incr) / divider
-                
-        # Subtract time limit by set amount of padding to account for threads closing slightly later than the set time
-        # Ensure a lower bound for the time limit to ensure no negative time limits
-        time_limit /= 1000
-        time_limit = time_limit - self.TIME_PADDING if time_limit - self.TIME_PADDING >= 0.1 else 0.1
+        return TimeManager(self.TIME_PADDING, time_left=time_left, increment=increment, movestogo=self.__movestogo,
+                           movetime=self.__time_limit, legal_move_count=legal_move_count)
+
+    # Probes the tablebase for the root position when it has less than 6 pieces and sets the moves to search
+    #   - If the tablebase has a best move, the tree is replaced by a depth 1 tree only searching that move
+    #   - If only WDL could be probed, the tree is replaced by a tree only searching the moves keeping the best WDL
+    #
+    # Returns the best move from the tablebase, None if there is no best move
+    def __probe_root(self) -> Move:
+        self.__root_moves = self.__searchmoves
+        board = self.__tree.board()
+        tablebase = Tablebase.get_instance()
+        if (board.get_piece_count() >= 6 or not tablebase.available()):
+            return None
         
-        timer = Timer(time_limit, self.stop)
+        # Copy the board so the probe doesn't make moves on a board used by another thread
+        result = tablebase.probeRoot(copy.deepcopy(board), self.__searchmoves)
+        if (result == None or len(result[1]) == 0):
+            return None
+        best_move, self.__root_moves = result
+
+        if (best_move != None):
+            self.__root_moves = [best_move]
+            self.__tree = Tree(root=board, depth=1, q_depth=0, searchmoves=self.__root_moves, nodes=self.__tree.max_nodes(),
+                               eval_cache=self.__eval_cache, stats=self.__stats, search_state=self.__search_state)
+        else:
+            self.__tree = Tree(root=board, depth=self.__tree.max_depth(), q_depth=self.__q_depth, searchmoves=self.__root_moves,
+                               nodes=self.__tree.max_nodes(), eval_cache=self.__eval_cache, stats=self.__stats,
+                               search_state=self.__search_state)
+        return best_move
+
+    # Sets the timer from which to stop running to the hard limit of the time manager
+    # NOTE: The time manager already subtracts TIME_PADDING from its limits
+    def __set_time(self):
+        if (self.__time_manager == None or not self.__time_manager.is_limited()): return
+
+        timer = Timer(self.__time_manager.hard_limit(), self.stop)
         self.__timer = timer
         timer.start()
-    
+
+    # Returns true if a mate within the number of plies being searched for was found
+    def __mate_found(self) -> bool:
+        return (not self.__pondering and self.__mate != None and self.__tree.get_depth_to_mate() != None 
+                and self.__tree.get_depth_to_mate() <= self.__mate)
+
+    # Private method that scores the nodes of the current tree until the tree is done, the search is stopped, or the 
+    # mate being searched for is found
+    #
+    # Returns true if the search was not stopped
+    def __search_tree(self) -> bool:
+        # Get the first node to score (so while loop works as intended)
+        nodes_left = self.__tree.next()
+        # If not stopped and another node is available then score the node
+        while (not self.__stop and nodes_left):
+            nodes_left = self.__tree.next()
+            if (self.__mate_found()):
+                break
+        return not self.__stop
+
     # Private method that starts generating the minimax tree and scoring nodes on a separate thread. This method is 
     # called by the run() method. To stop use the stop() method or the program will stop when max depth is reached.
     def __generate_tree(self) -> None:
-        # Set the stop flag to false so the tree can start generating and scoring
-        #self.__stop = False
         # Starting generating tree to set __generating to true
         self.__generating = True
-        # Get the first node to score (so while loop works as intended)
-        nodes_left = self.__tree.next()
-
         start_time = time.time()
         # Print to show that the tree is generating
         print("Generating tree...")
-        # If not stopped and another node is available then score the node
-        while (not self.__stop and nodes_left):
-            nodes_left = self.__tree.next()
-            if (not self.__pondering and self.__mate != None and self.__tree.get_depth_to_mate() != None 
-                and self.__tree.get_depth_to_mate() <= self.__mate):
+        if (self.__search_tree()):
+            self.__search_state.update(self.__tree.board(), self.__tree.get_pv())
+        self.__finish_generation(start_time)
+
+    # Private method that generates minimax trees of increasing depth on a separate thread (iterative deepening). This
+    # method is called by the run() method when the search is limited by time. After every iteration the time manager
+    # decides whether the next iteration can finish in time. 
+    #
+    # NOTE: If an iteration is stopped before it is done, the last finished iteration is used as it is the only one 
+    # that has searched every root move
+    def __generate_iterative(self) -> None:
+        self.__generating = True
+        start_time = time.time()
+        board = self.__tree.board()
+        max_depth = self.__tree.max_depth()
+        max_nodes = self.__tree.max_nodes()
+        completed_tree = None
+        print("Generating tree...")
+
+        for depth in range(1, max_depth + 1):
+            self.__nodes_offset += self.__tree.get_nodes_searched()
+            self.__tree = Tree(root=board, depth=depth, q_depth=self.__q_depth, searchmoves=self.__root_moves, nodes=max_nodes,
+                               eval_cache=self.__eval_cache, stats=self.__stats, search_state=self.__search_state)
+            iteration_start = time.time()
+
+            if (not self.__search_tree()):
                 break
-        
+            completed_tree = self.__tree
+            self.__search_state.update(board, self.__tree.get_pv())
+
+            root = self.__tree.root()
+            best_child = root.best_child if root.best_child != None else root.child
+            self.__time_manager.record_iteration(self.__tree.get_nodes_searched(), time.time() - iteration_start,
+                                                 best_child.previous_move if best_child != None else None, root.score)
+            if (self.__mate_found() or self.__tree.get_nodes_searched() >= max_nodes 
+                or not self.__time_manager.should_start_next_iteration()):
+                break
+
+        if (completed_tree != None and completed_tree is not self.__tree):
+            self.__nodes_offset += self.__tree.get_nodes_searched() - completed_tree.get_nodes_searched()
+            self.__tree = completed_tree
+        self.__finish_generation(start_time)
+
+    # Private method called when a search is done. Calls the callback and stops the timer
+    def __finish_generation(self, start_time: float) -> None:
         # Call the callback function
         best_child = self.__tree.root().best_child
         if (self.__callback_function != None):
@@ -269,12 +441,6 @@ class MiniMax:
         # Stop the timer if still running
         if (self.__timer != None): self.__timer.cancel()
 
-        # self.print_tree()
-        # print()
-        # self.print_best_line()
-        # print()
-        # self.__tree.board().get_fen()
-
         # Print to show that the tree is done generating
         print("Done generating tree")
         print("Tree generated in " + str(time.time() - start_time) + " seconds")
@@ -298,23 +464,25 @@ class MiniMax:
             self.__stop = True
             self.__stoploop = True
 
-            self.__generate_thread.join()
-            self.__inf_generate_thread.join()
-
-            self.__generating = False
-            self.__generating_infinite = False
-            self.__pondering = False
+            # The loop stops the tree at the next node, then uses the last finished iteration
+            # NOTE: Not joined when called from the loop itself
+            if (self.__inf_generate_thread is not current_thread()):
+                self.__inf_generate_thread.join()
 
             return self.__tree.best_move()
         else:
             return None
         
-    # Upon ponderhit, stop the infinite loop but not the normal tree generation so that minimax won't search at another max_depth
-    # Also call set_time() since we are now entering normal search and time constraints must be considered
+    # Upon ponderhit, the ponder search becomes a normal search of the same position, keeping the iterations already done
+    # The clock starts now: the hard limit of the time manager is armed and after every iteration the time manager decides
+    # whether to start the next one. Without time constraints, the search stops after the current iteration
     def ponderhit(self):
         if (not self.__pondering): return
+        time_manager = self.__create_time_manager()
+        if (not time_manager.is_limited()):
+            self.__stoploop = True
+        self.__time_manager = time_manager
         self.__pondering = False
-        self.__stoploop = True
         self.__set_time()
         
     # Change the board and/or max_depth to generate the minimax tree from
@@ -342,7 +510,9 @@ class MiniMax:
             return
         else:
             # Sets the tree to a new tree with the new board
-            self.__tree = Tree(root=board, depth=max_depth, nodes=max_nodes, q_depth=self.__q_depth, searchmoves=self.__searchmoves)
+            self.__search_state.set_root(board)
+            self.__tree = Tree(root=board, depth=max_depth, nodes=max_nodes, q_depth=self.__q_depth, searchmoves=self.__searchmoves,
+                               eval_cache=self.__eval_cache, stats=self.__stats, search_state=self.__search_state)
             # restart the tree generation and scoring if generating
             self.__restart_generation()
 
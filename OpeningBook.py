@@ -1,18 +1,26 @@
 import Connect2DB
 from Board import Board, Move
-from mysql.connector import Error # use for checking errors
+from OpeningBookFile import OpeningBookFile, DEFAULT_BOOK_PATH
+import os
 import random # use to randomly choose opening book when WinRate tied
 
 # openingBook need to input all in long notation
 
 class OpeningBook:
     
-    # Constructor: set up connection to MySQL DB
+    # Constructor: open the local book file, or set up connection to MySQL DB if there is no book file
+    #
+    # @PARMS
+    #   board: the board of the game
+    #   book_path: path of the book file compiled by OpeningBookFile.compile_book()
     #
     # return None
-    def __init__(self, board: Board) -> None:
+    def __init__(self, board: Board, book_path: str = DEFAULT_BOOK_PATH) -> None:
+        self.board = board
+        # The book file is used when it exists so there are no DB queries during a game
+        self.book = OpeningBookFile(book_path) if os.path.isfile(book_path) else None
         # set up connection to MySQL DB
-        self.conn = Connect2DB.Connect2DB()
+        self.conn = Connect2DB.Connect2DB() if self.book == None else None
     
     # This function will get the best opening book variation from DB
     #
@@ -27,22 +35,17 @@ class OpeningBook:
         # get idOpeningBook from tuple
         idOpeningBook = [x[0] for x in Id_Num]
         
-        # convert list to tuple
-        idOB_Tuple = tuple(idOpeningBook)
-        
-        # convert tuple to string
-        idOB_String = ', '.join(map(str, idOB_Tuple))
-        
-        # set up query to get opening book from DB
+        # set up query to get opening book from DB (one placeholder per id)
+        placeholders = ', '.join(['%s'] * len(idOpeningBook))
         sql = f"SELECT idOpeningBook, Moves \
                 FROM openingbook \
                 WHERE WinRate = \
                     (SELECT MAX(WinRate) \
                     FROM openingbook) \
-                AND idOpeningBook IN ({idOB_String})"
+                AND idOpeningBook IN ({placeholders})"
 
         # execute query
-        self.conn.cursor.execute(sql)
+        self.conn.cursor.execute(sql, tuple(idOpeningBook))
         
         # get result from query
         results = self.conn.cursor.fetchall()
@@ -93,23 +96,44 @@ class OpeningBook:
         else:
             return None
     
-    # This function is called to get the next best move from opening book in DB
+    # This function is called to find the next best move of a position, using the book file if there is one
     #
-    # return a string of the move
-    def play_Opening_book(self, board: Board):
-        # get board state
-        board_state = board.get_fen()
+    # @PARMS
+    #   board: the board of the position
+    #
+    # return a tuple (idOpeningBook, move string), None if the position isn't in the opening book
+    def probe(self, board: Board):
+        if self.book is not None:
+            result = self.book.probe(board)
+            if result is None:
+                return None
+            move, id_opening_book = result
+            return (id_opening_book, str(move))
         
         # call to function to compare board's fen with DB Fen
         # compare_Fen will return result(move_String, move_Number)
-        result, move_Num = self.compare_Fen(board_state)
+        result = self.compare_Fen(board.get_fen())
+        if result is None:
+            return None
+        
+        best_OB, move_Num = result
+        moves = best_OB[1].split()
+        # the position is at the end of the opening line
+        if move_Num >= len(moves):
+            return None
+        # get best move from string using move_Num as index
+        return (best_OB[0], moves[move_Num])
+
+    # This function is called to get the next best move from opening book
+    #
+    # return a tuple (idOpeningBook, move string), (None, None) if the position isn't in the opening book
+    def play_Opening_book(self, board: Board):
+        result = self.probe(board)
         
         if result is None:
             return (None, None)
         else:
-            # get best move from string using move_Num as index
-            best_Move = result[1].split()[move_Num]
-            return (result[0], best_Move)
+            return result
             
     
     # # TODO: need to update win rate at the end of the game
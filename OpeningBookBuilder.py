@@ -0,0 +1,267 @@
+import argparse
+import os
+import pickle
+import tempfile
+from functools import partial
+from multiprocessing import Pool
+from Board import Board, Move
+from OpeningBookFile import write_book, WEIGHT_SCALE, DEFAULT_BOOK_PATH
+from pgn_to_uci_converter import read_games, convert_game, CHUNK_SIZE
+
+# Builds the opening book from PGN archives
+#
+# Every game is replayed (by the pgn_to_uci_converter worker processes) and the first plies are counted:
+#   - (position hash, move) -> [wins, draws, losses] for the side that played the move, used for the binary book
+#   - opening line (the first plies of the game) -> [white wins, draws, black wins], used for the openingbook and
+#       openingbookfen tables
+#
+# The counts are kept in ShardedCounters, which write their shards to disk when there are too many entries in memory,
+# so archives of any size can be used.
+
+# Constants:
+DEFAULT_SQL_PATH = os.path.dirname(os.path.realpath(__file__)) + os.sep + "openingbook.sql"
+# Plies of every game added to the book
+DEFAULT_MAX_PLY = 16
+# Moves and lines played in less games than this are not added to the book
+DEFAULT_MIN_GAMES = 5
+DEFAULT_SHARDS = 16
+# Max number of entries kept in memory by a ShardedCounter before its shards are written to disk
+DEFAULT_MAX_ENTRIES = 1 << 20
+# Number of rows in each INSERT statement of the SQL file
+SQL_ROWS_PER_INSERT = 500
+# Results of the PGN format as [white wins, draws, black wins]
+RESULTS = {"1-0": (1, 0, 0), "1/2-1/2": (0, 1, 0), "0-1": (0, 0, 1)}
+
+# Counts win/draw/loss results for keys using bounded memory.
+# Keys are split into shards by hash. When the number of entries in memory goes over max_entries, every shard is
+# appended to its own spill file and cleared. items() merges one shard at a time, so only one shard has to fit in memory
+#
+# NOTE: Keys must be picklable. The spill files are only read by the process that wrote them
+class ShardedCounter:
+    # Creates a new ShardedCounter
+    #
+    # Parameters:
+    #   spill_dir: the directory of the spill files
+    #   shards: the number of shards
+    #   max_entries: the max number of entries kept in memory
+    def __init__(self, spill_dir: str, shards: int = DEFAULT_SHARDS, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.__shards: list[dict] = [dict() for _ in range(shards)]
+        self.__spill_paths: list[str] = [os.path.join(spill_dir, f"shard{i}.pkl") for i in range(shards)]
+        self.__max_entries: int = max_entries
+        self.__entries: int = 0
+        self.spills: int = 0
+        # Create the spill directory and make sure there are no spill files left from another run
+        os.makedirs(spill_dir, exist_ok=True)
+        for path in self.__spill_paths:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    # Adds results to the counts of a key
+    #
+    # Parameters:
+    #   key: the key to add to
+    #   results: a tuple of the counts to add (Ex: (1, 0, 0) for a win)
+    def add(self, key, results: tuple) -> None:
+        shard = self.__shards[hash(key) % len(self.__shards)]
+        counts = shard.get(key)
+        if counts is None:
+            shard[key] = list(results)
+            self.__entries += 1
+            if self.__entries > self.__max_entries:
+                self.__spill()
+        else:
+            for i in range(len(results)):
+                counts[i] += results[i]
+
+    # Appends every shard to its spill file and clears the shards
+    def __spill(self) -> None:
+        for shard, path in zip(self.__shards, self.__spill_paths):
+            if shard:
+                with open(path, "ab") as f:
+                    pickle.dump(shard, f, pickle.HIGHEST_PROTOCOL)
+                shard.clear()
+        self.__entries = 0
+        self.spills += 1
+
+    # Returns a generator of (key, counts) with the counts of every key summed over the spill files
+    def items(self):
+        for shard, path in zip(self.__shards, self.__spill_paths):
+            merged = dict()
+            if os.path.isfile(path):
+                with open(path, "rb") as f:
+                    while True:
+                        try:
+                            spilled = pickle.load(f)
+                        except EOFError:
+                            break
+                        self.__merge(merged, spilled)
+            self.__merge(merged, shard)
+            yield from merged.items()
+
+    # Adds the counts of source to the counts of destination
+    @staticmethod
+    def __merge(destination: dict, source: dict) -> None:
+        for key, counts in source.items():
+            if key in destination:
+                destination[key] = [a + b for a, b in zip(destination[key], counts)]
+            else:
+                destination[key] = list(counts)
+
+# Returns the score (wins + half the draws) of the counts
+def get_win_rate(counts) -> float:
+    return (counts[0] + counts[1] / 2) / sum(counts)
+
+# Class for building the opening book
+class OpeningBookBuilder:
+    # Creates a new OpeningBookBuilder
+    #
+    # Parameters:
+    #   spill_dir: the directory for the spill files of the counters
+    #   max_ply: the number of plies of every game added to the book
+    #   min_games: moves and lines played in less games are not added to the book
+    #   shards: the number of shards of the counters
+    #   max_entries: the max number of entries in memory for each counter
+    def __init__(self, spill_dir: str, max_ply: int = DEFAULT_MAX_PLY, min_games: int = DEFAULT_MIN_GAMES,
+                 shards: int = DEFAULT_SHARDS, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.__max_ply: int = max_ply
+        self.__min_games: int = min_games
+        self.__moves = ShardedCounter(os.path.join(spill_dir, "moves"), shards, max_entries)
+        self.__lines = ShardedCounter(os.path.join(spill_dir, "lines"), shards, max_entries)
+        self.games: int = 0
+        self.skipped: int = 0
+
+    # Adds a game converted by pgn_to_uci_converter.convert_game()
+    #
+    # Parameters:
+    #   game: a tuple (uci moves, hashes, result)
+    def add_game(self, game) -> None:
+        if game is None or game[2] not in RESULTS:
+            self.skipped += 1
+            return
+        uci_moves, hashes, result = game
+        white_results = RESULTS[result]
+        black_results = white_results[::-1]
+        plies = min(len(uci_moves), self.__max_ply)
+
+        for ply in range(plies):
+            # White plays the even plies
+            self.__moves.add((hashes[ply], uci_moves[ply]), white_results if ply % 2 == 0 else black_results)
+        if plies > 0:
+            self.__lines.add(" ".join(uci_moves[:plies]), white_results)
+        self.games += 1
+
+    # Adds every game of PGN files, converting the games with a pool of worker processes
+    #
+    # Parameters:
+    #   pgn_files: the paths of the PGN files
+    #   processes: the number of worker processes (default value is None - one per CPU)
+    def add_pgn_files(self, pgn_files: list[str], processes: int = None) -> None:
+        with Pool(processes) as pool:
+            for pgn_file in pgn_files:
+                for game in pool.imap_unordered(partial(convert_game, hashes=True), read_games(pgn_file), CHUNK_SIZE):
+                    self.add_game(game)
+
+    # Writes the binary book. The weight of a move is the score of the side playing it
+    #
+    # Parameters:
+    #   path: the path of the book file
+    #
+    # NOTE: The learn value of a move is the idOpeningBook (in the SQL file written by write_sql()) of the line with the
+    #       move which scored best for the side playing it, the same as OpeningBookFile.compile_book(). It is 0 if no line
+    #       of the SQL file has the move (Ex: the move was played in enough games but every line was played in less)
+    #
+    # Returns the number of entries written
+    def write_book(self, path: str = DEFAULT_BOOK_PATH) -> int:
+        learn_values = self.__get_learn_values()
+        return write_book(path, ((key, Move.from_uci_str(move), round(get_win_rate(counts) * WEIGHT_SCALE),
+                                  learn_values.get((key, move), 0))
+                                 for (key, move), counts in self.__moves.items() if sum(counts) >= self.__min_games))
+
+    # Returns a generator of (idOpeningBook, line, counts) of every line added to the SQL file, the ids are given in the
+    # same order every time
+    def __get_lines(self):
+        id_opening_book = 0
+        for line, counts in self.__lines.items():
+            if sum(counts) < self.__min_games:
+                continue
+            id_opening_book += 1
+            yield id_opening_book, line, counts
+
+    # Gets the idOpeningBook of every (position hash, move) of the lines of the SQL file
+    #
+    # Returns a dict of (position hash, uci move) -> idOpeningBook of the line which scored best for the side playing
+    # the move
+    def __get_learn_values(self) -> dict[tuple[int, str], int]:
+        # (position hash, uci move) -> (score, idOpeningBook)
+        best_lines: dict[tuple[int, str], tuple[float, int]] = dict()
+        for id_opening_book, line, counts in self.__get_lines():
+            white_score = get_win_rate(counts)
+            board = Board()
+            for ply, move in enumerate(line.split()):
+                key = (board.get_zobrist_hash(), move)
+                # White plays the even plies
+                score = white_score if ply % 2 == 0 else 1 - white_score
+                if key not in best_lines or best_lines[key][0] < score:
+                    best_lines[key] = (score, id_opening_book)
+                board.move(Move.from_uci_str(move))
+        return {key: id_opening_book for key, (score, id_opening_book) in best_lines.items()}
+
+    # Writes the SQL file that bulk loads the openingbook and openingbookfen tables
+    #
+    # Parameters:
+    #   path: the path of the SQL file
+    #
+    # NOTE: WinRate is the score of white for the line. openingbookfen has the FEN before every move of the line with
+    #       the index of the move as MoveNumber (the same as OpeningBook.play_Opening_book() uses)
+    #
+    # Returns the number of lines written
+    def write_sql(self, path: str = DEFAULT_SQL_PATH) -> int:
+        id_opening_book = 0
+        book_rows = []
+        fen_rows = []
+        with open(path, "w") as f:
+            for id_opening_book, line, counts in self.__get_lines():
+                book_rows.append(f"({id_opening_book}, '{line}', {get_win_rate(counts):.4f})")
+
+                board = Board()
+                for move_number, move in enumerate(line.split()):
+                    fen_rows.append(f"({id_opening_book}, {move_number}, '{board.get_fen()}')")
+                    board.move(Move.from_uci_str(move))
+
+                if len(book_rows) >= SQL_ROWS_PER_INSERT:
+                    self.__write_inserts(f, book_rows, fen_rows)
+            self.__write_inserts(f, book_rows, fen_rows)
+        return id_opening_book
+
+    # Writes the rows as INSERT statements and clears them
+    @staticmethod
+    def __write_inserts(f, book_rows: list[str], fen_rows: list[str]) -> None:
+        if book_rows:
+            f.write("INSERT INTO openingbook (idOpeningBook, Moves, WinRate) VALUES\n" + ",\n".join(book_rows) + ";\n")
+        for i in range(0, len(fen_rows), SQL_ROWS_PER_INSERT):
+            f.write("INSERT INTO openingbookfen (idOpeningBook, MoveNumber, Fen) VALUES\n"
+                    + ",\n".join(fen_rows[i:i + SQL_ROWS_PER_INSERT]) + ";\n")
+        book_rows.clear()
+        fen_rows.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book from PGN files")
+    parser.add_argument("pgn_files", nargs="+", help="the PGN files to build the book from")
+    parser.add_argument("--book", default=DEFAULT_BOOK_PATH, help="the binary book file to write")
+    parser.add_argument("--sql", default=DEFAULT_SQL_PATH, help="the SQL file to write")
+    parser.add_argument("--max-ply", type=int, default=DEFAULT_MAX_PLY, help="plies of every game added to the book")
+    parser.add_argument("--min-games", type=int, default=DEFAULT_MIN_GAMES, help="min number of games of a move or line")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="number of shards of the counters")
+    parser.add_argument("--max-entries", type=int, default=DEFAULT_MAX_ENTRIES, help="max counter entries kept in memory")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        builder = OpeningBookBuilder(spill_dir, args.max_ply, args.min_games, args.shards, args.max_entries)
+        builder.add_pgn_files(args.pgn_files, args.processes)
+        print(f"Read {builder.games} games ({builder.skipped} skipped)")
+        print(f"Wrote {builder.write_book(args.book)} entries to {args.book}")
+        print(f"Wrote {builder.write_sql(args.sql)} opening lines to {args.sql}")
+
+if __name__ == "__main__":
+    main()
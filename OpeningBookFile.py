@@ -0,0 +1,175 @@
+from Board import Board, Move, Coordinate, PieceType
+import mmap
+import os
+import random
+import struct
+
+# The opening book file is a local binary file that replaces the opening book queries to the DB during a game.
+#
+# The file layout is the same as a Polyglot book: a list of 16 byte big endian entries sorted by key
+#   - key (8 bytes): the zobrist hash of the position (Board.get_zobrist_hash())
+#   - move (2 bytes): the move to play, encoded the same way as Polyglot (see encode_move())
+#   - weight (2 bytes): how good the move is, the move with the highest weight is played
+#   - learn (4 bytes): the idOpeningBook of the opening line in the DB the move came from
+#
+# NOTE: The keys are the hashes of our Board, not the Polyglot keys, so Polyglot books can't be used directly.
+#       Castling is stored as the king's move (e1g1) instead of Polyglot's king takes rook (e1h1)
+
+# Constants:
+DEFAULT_BOOK_PATH = os.path.dirname(os.path.realpath(__file__)) + os.sep + "openingbook.bin"
+ENTRY_FORMAT = ">QHHI"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+KEY_FORMAT = ">Q"
+MAX_WEIGHT = 0xFFFF
+# The WinRate of an opening line is multiplied by this to get the weight of its moves
+WEIGHT_SCALE = 100
+# Promotion pieces in the order used by the move encoding (0 is no promotion)
+PROMOTION_PIECES = [None, PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK, PieceType.QUEEN]
+
+# Encodes a move into 16 bits
+#   bits 0-2: to column, bits 3-5: to row, bits 6-8: from column, bits 9-11: from row, bits 12-14: promotion piece
+#
+# Parameters:
+#   move: the Move to encode
+#
+# Returns the encoded move
+def encode_move(move: Move) -> int:
+    return (move.to_coord.col | move.to_coord.row << 3 | move.from_coord.col << 6 | move.from_coord.row << 9
+            | PROMOTION_PIECES.index(move.promotion) << 12)
+
+# Decodes a move encoded by encode_move()
+#
+# Parameters:
+#   raw_move: the encoded move
+#
+# Returns the decoded Move
+def decode_move(raw_move: int) -> Move:
+    return Move(Coordinate((raw_move >> 9) & 7, (raw_move >> 6) & 7), Coordinate((raw_move >> 3) & 7, raw_move & 7),
+                PROMOTION_PIECES[(raw_move >> 12) & 7])
+
+# Writes a book file
+#
+# Parameters:
+#   path: the path of the book file to write
+#   entries: an iterable of (key, Move, weight, learn) tuples
+#
+# NOTE: Entries are sorted by key and then by highest weight before being written
+#
+# Returns the number of entries written
+def write_book(path: str, entries) -> int:
+    entries = sorted(((key, encode_move(move), min(max(int(weight), 0), MAX_WEIGHT), learn)
+                      for key, move, weight, learn in entries), key=lambda entry: (entry[0], -entry[2]))
+    with open(path, 'wb') as book_file:
+        for entry in entries:
+            book_file.write(struct.pack(ENTRY_FORMAT, *entry))
+    return len(entries)
+
+# Compiles the opening lines in the DB into a book file
+# Every line is replayed from the starting position, so the keys are the same as the hashes of the Board during a game
+#
+# Parameters:
+#   conn: a Connect2DB object connected to the DB
+#   path: the path of the book file to write (default value is DEFAULT_BOOK_PATH)
+#
+# NOTE: openingbookfen isn't needed since it only stores the positions of the lines in openingbook, which are replayed.
+#       When lines share a move, the weight and idOpeningBook of the line with the highest WinRate are kept
+#
+# Returns the number of entries written
+def compile_book(conn, path: str = DEFAULT_BOOK_PATH) -> int:
+    conn.cursor.execute("SELECT idOpeningBook, Moves, WinRate FROM openingbook")
+
+    # (key, move) -> (weight, idOpeningBook)
+    book: dict[tuple[int, Move], tuple[int, int]] = dict()
+    for id_opening_book, moves, win_rate in conn.cursor.fetchall():
+        weight = round(float(win_rate if win_rate != None else 0) * WEIGHT_SCALE)
+        board = Board()
+        for move_str in moves.split():
+            move = Move.from_uci_str(move_str)
+            key = board.get_zobrist_hash()
+            # Stop replaying the line if the DB has an invalid move
+            if (move == None or board.move(move) == False):
+                print(f"Invalid move {move_str} in opening line {id_opening_book}")
+                break
+            if ((key, move) not in book or book[(key, move)][0] < weight):
+                book[(key, move)] = (weight, id_opening_book)
+
+    return write_book(path, ((key, move, weight, learn) for (key, move), (weight, learn) in book.items()))
+
+# Class for reading a book file. The file is memory mapped and searched using binary search, so opening the book and
+# probing a position doesn't read the whole file
+class OpeningBookFile:
+    # Opens a book file
+    #
+    # Parameters:
+    #   path: the path of the book file (default value is DEFAULT_BOOK_PATH)
+    def __init__(self, path: str = DEFAULT_BOOK_PATH) -> None:
+        self.__file = open(path, 'rb')
+        size = os.fstat(self.__file.fileno()).st_size
+        # mmap can't map an empty file
+        self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+        self.__length: int = size // ENTRY_SIZE
+
+    # Returns the number of entries in the book
+    def __len__(self) -> int:
+        return self.__length
+
+    # Closes the book file
+    def close(self) -> None:
+        if (isinstance(self.__data, mmap.mmap)):
+            self.__data.close()
+        self.__file.close()
+
+    # Returns the key of the entry at the index
+    def __key_at(self, index: int) -> int:
+        return struct.unpack_from(KEY_FORMAT, self.__data, index * ENTRY_SIZE)[0]
+
+    # Returns the index of the first entry with a key >= key
+    def __lower_bound(self, key: int) -> int:
+        low, high = 0, self.__length
+        while (low < high):
+            middle = (low + high) // 2
+            if (self.__key_at(middle) < key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    # Gets every entry of a position
+    #
+    # Parameters:
+    #   key: the zobrist hash of the position
+    #
+    # Returns a list of (Move, weight, learn) tuples sorted by highest weight
+    def get_entries(self, key: int) -> list[tuple[Move, int, int]]:
+        entries = []
+        index = self.__lower_bound(key)
+        while (index < self.__length):
+            entry_key, raw_move, weight, learn = struct.unpack_from(ENTRY_FORMAT, self.__data, index * ENTRY_SIZE)
+            if (entry_key != key):
+                break
+            entries.append((decode_move(raw_move), weight, learn))
+            index += 1
+        return entries
+
+    # Gets the book move of a position. The move with the highest weight is chosen, ties are chosen randomly
+    #
+    # Parameters:
+    #   board: the Board of the position
+    #
+    # Returns a tuple of the Move and its learn value (idOpeningBook), None if the position isn't in the book
+    def probe(self, board: Board) -> tuple[Move, int] | None:
+        entries = self.get_entries(board.get_zobrist_hash())
+        # Make sure the moves are legal in case two positions have the same hash
+        legal_moves = board.get_all_legal_moves()
+        entries = [entry for entry in entries if entry[0] in legal_moves]
+        if (len(entries) == 0):
+            return None
+
+        best_entries = [entry for entry in entries if entry[1] == entries[0][1]]
+        move, weight, learn = random.choice(best_entries)
+        return move, learn
+
+# Compiles the opening book in the DB into the default book file
+if __name__ == "__main__":
+    import Connect2DB
+    print(f"Wrote {compile_book(Connect2DB.Connect2DB())} entries to {DEFAULT_BOOK_PATH}")
@@ -1,18 +1,203 @@
-import subprocess
+import argparse
+import cProfile
+import json
 import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
 from datetime import datetime
+from Bench import run_bench, get_commit, POSITIONS, DEFAULT_BENCH_DEPTH, DEFAULT_Q_DEPTH
 
-def main():
+# Profiles the engine and writes the results to the profiles directory
+#
+# Modes:
+#   bench (default): runs the bench positions under cProfile while a sampling thread records the call stack of the
+#       search. Writes:
+#           <name>.json - the hotspots sorted by own time (tottime), with calls and cumulative time
+#               (functions are labeled as file:qualified name:line, Ex: Board.py:Board.move:1234, in both files)
+#           <name>.folded - the sampled call stacks in collapsed format, one "caller;callee;... count" per line, which can
+#               be given to flamegraph.pl or speedscope
+#   line: runs kernprof on ProfileTest.py (needs the @profile decorators uncommented in Board.py and generateTree.py)
+#
+# Hotspot files of two commits can be compared with: python Profiler.py --compare old.json new.json
+#
+# Use from the command line: python Profiler.py [--mode bench] [--depth 3] [--suite demo]
+
+# Constants:
+PROFILES_DIR = "profiles"
+# Seconds between two samples of the call stack
+DEFAULT_SAMPLE_INTERVAL = 0.001
+# Number of hotspots printed
+DEFAULT_TOP = 20
+
+# Thread that samples the call stack of another thread at a fixed interval
+#
+# NOTE: Python only switches threads between bytecodes, so the samples are taken where the GIL was released. This is
+#       good enough to see where most of the time goes, but a function called less than the interval can be missed
+class StackSampler:
+    # Creates a new StackSampler
+    #
+    # Parameters:
+    #   thread_id: the id of the thread to sample (default value is None - the thread creating the sampler)
+    #   interval: the seconds between two samples
+    def __init__(self, thread_id: int = None, interval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        self.__thread_id: int = thread_id if thread_id != None else threading.get_ident()
+        self.__interval: float = interval
+        self.__stop: threading.Event = threading.Event()
+        self.__thread: threading.Thread = threading.Thread(target=self.__run, daemon=True)
+        # Collapsed stack -> number of samples
+        self.stacks: Counter = Counter()
+        self.samples: int = 0
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stop.set()
+        self.__thread.join()
+
+    # Samples the stack until stop() is called
+    def __run(self) -> None:
+        while not self.__stop.wait(self.__interval):
+            frame = sys._current_frames().get(self.__thread_id)
+            if frame == None:
+                continue
+            stack = []
+            while frame != None:
+                stack.append(get_label(frame.f_code))
+                frame = frame.f_back
+            # The collapsed format lists the stack from the outermost call
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    # Writes the stacks in collapsed format
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+# Returns the label of a function used in the profiles (Ex: Board.py:Board._update_pieces_blocked:1234)
+# The line makes the label unique for functions with the same qualified name (Ex: a method defined twice)
+def get_label(code) -> str:
+    return os.path.basename(code.co_filename) + ":" + getattr(code, "co_qualname", code.co_name) + ":" + str(code.co_firstlineno)
+
+# Gets the hotspots of a cProfile run
+#
+# Parameters:
+#   profiler: the cProfile.Profile that was run
+#
+# Returns a list of dicts sorted by highest own time
+def get_hotspots(profiler: cProfile.Profile) -> list[dict]:
+    # The raw entries are used instead of pstats, which only keeps the name of a function and merges functions with the
+    # same file, line and name (Ex: nested list comprehensions), so the labels are the same as in the collapsed stacks
+    functions = dict()
+    for entry in profiler.getstats():
+        # Built-in functions have no code object
+        if isinstance(entry.code, str):
+            label, line = "~:" + entry.code + ":0", 0
+        else:
+            label, line = get_label(entry.code), entry.code.co_firstlineno
+        hotspot = functions.setdefault(label, {"function": label, "line": line, "calls": 0, "tottime": 0, "cumtime": 0})
+        hotspot["calls"] += entry.callcount
+        hotspot["tottime"] += entry.inlinetime
+        hotspot["cumtime"] += entry.totaltime
+
+    total_time = sum(hotspot["tottime"] for hotspot in functions.values())
+    hotspots = list(functions.values())
+    for hotspot in hotspots:
+        hotspot["percent"] = hotspot["tottime"] / total_time * 100 if total_time > 0 else 0
+    hotspots.sort(key=lambda hotspot: -hotspot["tottime"])
+    return hotspots
+
+# Profiles the bench and writes the hotspots and collapsed stacks to the profiles directory
+#
+# Parameters:
+#   depth: the depth to search every bench position to
+#   suites: the suites of bench positions (default value is None - every suite)
+#   q_depth: the quiescence depth
+#   interval: the seconds between two samples of the call stack
+#   output_dir: the directory to write the profiles to
+#
+# Returns a tuple of the paths of the hotspot JSON and collapsed stack files
+def profile_bench(depth: int = DEFAULT_BENCH_DEPTH, suites: list[str] = None, q_depth: int = DEFAULT_Q_DEPTH,
+                  interval: float = DEFAULT_SAMPLE_INTERVAL, output_dir: str = PROFILES_DIR) -> tuple[str, str]:
+    os.makedirs(output_dir, exist_ok=True)
+    commit = get_commit()
+    name = "Profile_" + datetime.now().strftime("%m-%d-%Y_%H-%M-%S") + ("_" + commit if commit != None else "")
+
+    profiler = cProfile.Profile()
+    sampler = StackSampler(interval=interval)
+    start_time = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        results = run_bench(depth, suites, q_depth, verbose=False)
+    finally:
+        profiler.disable()
+        sampler.stop()
+    profile_time = time.perf_counter() - start_time
+
+    json_path = os.path.join(output_dir, name + ".json")
+    with open(json_path, "w") as f:
+        json.dump({"commit": commit,
+                   "depth": depth,
+                   "q_depth": q_depth,
+                   "suites": results["suites"],
+                   "signature": results["signature"],
+                   "time": profile_time,
+                   "samples": sampler.samples,
+                   "hotspots": get_hotspots(profiler)}, f, indent=2)
+
+    folded_path = os.path.join(output_dir, name + ".folded")
+    sampler.write_collapsed(folded_path)
+    return json_path, folded_path
+
+# Prints the top hotspots of a hotspot JSON file
+def print_hotspots(path: str, top: int = DEFAULT_TOP) -> None:
+    with open(path) as f:
+        profile = json.load(f)
+    print(f"{'percent':>8} {'tottime':>9} {'cumtime':>9} {'calls':>10}  function")
+    for hotspot in profile["hotspots"][:top]:
+        print(f"{hotspot['percent']:7.2f}% {hotspot['tottime']:9.3f} {hotspot['cumtime']:9.3f} {hotspot['calls']:>10}  "
+              + hotspot['function'])
+
+# Compares the hotspots of two hotspot JSON files (Ex: of two commits)
+#
+# Parameters:
+#   old_path: the hotspot JSON of the old profile
+#   new_path: the hotspot JSON of the new profile
+#   top: the number of functions printed
+#
+# Returns a list of (function, old percent, new percent) sorted by the biggest change in share of the total time
+def compare_hotspots(old_path: str, new_path: str, top: int = DEFAULT_TOP) -> list[tuple[str, float, float]]:
+    with open(old_path) as f:
+        old_profile = json.load(f)
+    with open(new_path) as f:
+        new_profile = json.load(f)
+    old = {hotspot["function"]: hotspot["percent"] for hotspot in old_profile["hotspots"]}
+    new = {hotspot["function"]: hotspot["percent"] for hotspot in new_profile["hotspots"]}
+
+    changes = [(function, old.get(function, 0), new.get(function, 0)) for function in old.keys() | new.keys()]
+    changes.sort(key=lambda change: -abs(change[2] - change[1]))
+    print(f"{old_profile['commit']} ({old_profile['time']:.2f}s) -> {new_profile['commit']} ({new_profile['time']:.2f}s)")
+    for function, old_percent, new_percent in changes[:top]:
+        print(f"{old_percent:7.2f}% -> {new_percent:7.2f}% ({new_percent - old_percent:+7.2f})  {function}")
+    return changes
+
+# Runs kernprof on ProfileTest.py and writes the line_profiler output to the profiles directory
+def profile_lines() -> None:
     now = datetime.now()
     # dd/mm/YY H:M:S
     dt_string = now.strftime("%m-%d-%Y_%H:%M:%S")
 
     # Create the directory if it doesn't exist
-    if not os.path.exists("profiles"):
-        os.makedirs("profiles")
-    
+    if not os.path.exists(PROFILES_DIR):
+        os.makedirs(PROFILES_DIR)
+
     # Write the profiles to a file
-    folder_name = "profiles"
+    folder_name = PROFILES_DIR
     file_name = "Profile_" + dt_string + ".txt"
     with open(folder_name + os.sep + file_name, "w") as file:
         ping = subprocess.run(
@@ -25,5 +210,26 @@ def main():
         print("Profile saved to: " + folder_name + os.sep + file_name)
         print()
 
+def main():
+    parser = argparse.ArgumentParser(description="Profile the engine")
+    parser.add_argument("--mode", choices=["bench", "line"], default="bench", help="profile the bench or run kernprof")
+    parser.add_argument("--depth", type=int, default=DEFAULT_BENCH_DEPTH, help="depth to search every bench position to")
+    parser.add_argument("--q-depth", type=int, default=DEFAULT_Q_DEPTH, help="quiescence depth")
+    parser.add_argument("--suite", action="append", choices=list(POSITIONS.keys()), help="bench suite to run (default: all)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_SAMPLE_INTERVAL, help="seconds between stack samples")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="number of hotspots printed")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two hotspot JSON files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_hotspots(args.compare[0], args.compare[1], args.top)
+    elif args.mode == "line":
+        profile_lines()
+    else:
+        json_path, folded_path = profile_bench(args.depth, args.suite, args.q_depth, args.interval)
+        print_hotspots(json_path, args.top)
+        print("Hotspots saved to: " + json_path)
+        print("Collapsed stacks saved to: " + folded_path)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,6 +3,9 @@ import Board
 import chess
 import chess.syzygy
 import os
+import sys
+import threading
+from collections import OrderedDict
 
 # We will be using Syzygy tablebases for this project. 
 # Syzygy tablebases will be uploaded to the VM and will be called to get the WDL and DTZ values.
@@ -11,78 +14,238 @@ import os
 
 # Constants:
 LOCAL_PATH = os.path.dirname(os.path.realpath(__file__)) + os.sep + "CETablebase"
+# Max number of WDL results kept in the cache
+WDL_CACHE_SIZE = 1 << 16
+# Tables with at most this many pieces are read into the page cache by prefetch()
+PREFETCH_MAX_PIECES = 5
+# Size of the reads done by prefetch()
+PREFETCH_CHUNK_SIZE = 1 << 20
 
 # Can't use cause of permission issues on VM
 # VM_PATH = "/u/l/a/lao/Public"
 
+# Tablebase handles are process-wide: use Tablebase.get_instance() instead of creating a new Tablebase so the directory
+# is only scanned once. The tables are opened lazily on the first probe.
+#
+# NOTE: python-chess memory maps the table files, so every process probing the same files shares the OS page cache
 class Tablebase:
+    # The process-wide tablebase returned by get_instance()
+    _instance = None
+    _instance_lock = threading.Lock()
+
     # Constructor
-    def __init__(self):
-        # Initialize the tablebase
-        self.tablebase = self.load_tablebase()
-        self.board = Board.Board()
+    #
+    # Parameters:
+    #   wdl_cache_size: the max number of WDL results to cache
+    def __init__(self, wdl_cache_size = WDL_CACHE_SIZE):
+        # The tablebase is loaded on first use by get_tablebase()
+        self.tablebase = None
+        self.__loaded = False
+        self.__load_lock = threading.Lock()
+
+        # Least recently used cache of WDL results keyed by zobrist hash (None for positions that aren't in the tablebase)
+        self.__wdl_cache: OrderedDict[int, int | None] = OrderedDict()
+        self.__wdl_cache_size = wdl_cache_size
+        self.__cache_lock = threading.Lock()
+        self.wdl_cache_hits = 0
+        # Material signatures (Ex: KRPvK) whose probe error was already printed
+        self.__logged_signatures: set[str] = set()
         
         # # Connect to the database
         # self.db = Connect2DB.Connect2DB()
         # self.db.connect()
     
+    # Returns the process-wide tablebase, creating it on the first call
+    #
+    # Parameters:
+    #   prefetch: if True, the 3-4-5 piece tables are read into the page cache in a background thread
+    #
+    # Returns the shared Tablebase object
+    @classmethod
+    def get_instance(cls, prefetch=False):
+        with cls._instance_lock:
+            if (cls._instance == None):
+                cls._instance = cls()
+        if (prefetch):
+            threading.Thread(target=cls._instance.prefetch, daemon=True).start()
+        return cls._instance
+
     # This public method will load the tablebase from VM
     #
     # Parameters:
     #   None
     #
-    # Returns the tablebase object
+    # Returns the tablebase object, None if the tablebase directory doesn't exist
     # NOTE: The VM Path is not working right now. I think it is because of permission issues
     #      I will try to fix it later when I have permission.
     def load_tablebase(self):
         # Load the tablebase
+        if (not os.path.isdir(LOCAL_PATH)):
+            return None
         
         # This is for local loading
         return chess.syzygy.open_tablebase(LOCAL_PATH)  
               
         # This is for VM loading
         # return chess.syzygy.open_tablebase(VM_PATH)
-        
     
-    # Public method to get the best move from the tablebase
+    # Returns the python-chess tablebase, loading it on the first call (None if it couldn't be loaded)
+    def get_tablebase(self):
+        if (not self.__loaded):
+            with self.__load_lock:
+                if (not self.__loaded):
+                    self.tablebase = self.load_tablebase()
+                    self.__loaded = True
+        return self.tablebase
+
+    # Returns True if there are tables to probe
+    def available(self):
+        return self.get_tablebase() != None
+
+    # Reads the table files with at most max_pieces pieces so they are in the page cache before the first probe
     #
     # Parameters:
-    #   FEN: the fen of the position
+    #   max_pieces: the max number of pieces of the tables to read
     #
-    # Returns a string of best move from the tablebase
-    def getBestMove(self, fen):
+    # Returns the number of bytes read
+    def prefetch(self, max_pieces = PREFETCH_MAX_PIECES):
+        if (not self.available()):
+            return 0
         
-        # set the board from the fen
-        self.board._set_board_from_fen(fen)
+        bytes_read = 0
+        for file_name in os.listdir(LOCAL_PATH):
+            table_name, extension = os.path.splitext(file_name)
+            # Table names are the pieces of each side seperated by a v (Ex: KRvK.rtbw is a 3 piece table)
+            if (extension not in ('.rtbw', '.rtbz') or len(table_name.replace('v', '')) > max_pieces):
+                continue
+            with open(os.path.join(LOCAL_PATH, file_name), 'rb') as table_file:
+                chunk = table_file.read(PREFETCH_CHUNK_SIZE)
+                while (chunk):
+                    bytes_read += len(chunk)
+                    chunk = table_file.read(PREFETCH_CHUNK_SIZE)
+        return bytes_read
         
-        # initialize best move and score
-        bestMove = None
-        best_wdl = 3
-        best_dtz = None
+    # Public method to get the best move from the tablebase
+    #
+    # Parameters:
+    #   board: the Board of the position (a FEN string is also accepted)
+    #
+    # Returns the best move from the tablebase (None if the position isn't in the tablebase)
+    def getBestMove(self, board):
+        if (isinstance(board, str)):
+            board = Board.Board(board)
         
-        # loop through the legal moves
-        for move in self.board.get_all_legal_moves():
-            
+        result = self.probeRoot(board)
+        if (result == None):
+            return None
+        best_move, best_moves = result
+        # Fall back to any of the moves with the best WDL if DTZ couldn't be probed
+        return best_move if best_move != None or len(best_moves) == 0 else best_moves[0]
+    
+    # Public method to probe every move of the root position
+    # WDL is used to find the moves with the best result, then DTZ is only probed for those moves to pick between them
+    #
+    # Parameters:
+    #   board: the Board of the position
+    #   moves: the moves to probe (default value is None - every legal move)
+    #
+    # NOTE: Makes and undoes moves on the board, so the board is the same after returning
+    #
+    # Returns a tuple containing the best move by DTZ (None if DTZ couldn't be probed) and the list of moves with the best 
+    # WDL, None if WDL couldn't be probed
+    def probeRoot(self, board, moves = None):
+        # Find the moves with the best WDL for the side to move
+        # The WDL after the move is for the other team, so the lowest WDL is the best
+        best_moves = []
+        best_wdl = 3
+        for move in (moves if moves != None else board.get_all_legal_moves()):
             # Make move on imaginary board
-            self.board.move(move)
+            board.move(move)
+            result = self.probeWDL(board)
+            board.undo_move()
+            if (result == None):
+                return None
             
-            # probe the tablebase in chess library with our board fen
-            wdl, dtz = self.probeTablebase(self.board.get_fen())
-            self.board.undo_move()
-            
-            # TODO: WDL > 0 other team is winning, but try force a draw by choosing higher distance to 0.
-            # TODO: WDL < 0 other team is losing, but try prevent a draw by choosing lower distance to 0.
-            
-            # if the score is better than the best score
-            if wdl < best_wdl or (wdl == best_wdl and dtz > best_dtz):
-                # set best move
-                bestMove = move
+            wdl = result[0]
+            if (wdl < best_wdl):
+                best_moves = [move]
                 best_wdl = wdl
+            elif (wdl == best_wdl):
+                best_moves.append(move)
+        
+        if (len(best_moves) <= 1):
+            return (best_moves[0] if len(best_moves) == 1 else None), best_moves
+
+        # Use DTZ to pick between the moves with the best WDL
+        # WDL < 0: other team is losing, prevent a draw by choosing the move closest to zeroing (highest negative dtz)
+        # WDL > 0: other team is winning, try to force a draw by choosing the highest distance to zeroing
+        best_move = None
+        best_dtz = None
+        for move in best_moves:
+            board.move(move)
+            dtz = self.probeDTZ(board)
+            board.undo_move()
+            if (dtz == None):
+                return None, best_moves
+            if (best_dtz == None or dtz > best_dtz):
+                best_move = move
                 best_dtz = dtz
-            
-        # return the best move
-        return bestMove
+
+        return best_move, best_moves
+    
+    # Public method to probe the WDL of a Board. Results are cached by zobrist hash as WDL is used at every leaf of the 
+    # search once there are less than 6 pieces. Positions that aren't in the tablebase (Ex: the table file is missing)
+    # are cached too, so they aren't probed again
+    #
+    # Parameters:
+    #   board: the Board of the position
+    #
+    # Returns a tuple containing the wdl value and if it came from the cache, None if the position isn't in the tablebase
+    def probeWDL(self, board):
+        zobrist_hash = board.get_zobrist_hash()
+        with self.__cache_lock:
+            if (zobrist_hash in self.__wdl_cache):
+                wdl = self.__wdl_cache[zobrist_hash]
+                self.__wdl_cache.move_to_end(zobrist_hash)
+                if (wdl == None):
+                    return None
+                self.wdl_cache_hits += 1
+                return wdl, True
+        
+        tablebase = self.get_tablebase()
+        if (tablebase == None):
+            return None
+        chess_board = self.to_chess_board(board)
+        try:
+            wdl = tablebase.probe_wdl(chess_board)
+        except (chess.syzygy.MissingTableError, KeyError) as e:
+            self.__print_error(chess_board, e)
+            wdl = None
+        
+        # Remove the least recently used result if the cache is full
+        with self.__cache_lock:
+            self.__wdl_cache[zobrist_hash] = wdl
+            if (len(self.__wdl_cache) > self.__wdl_cache_size):
+                self.__wdl_cache.popitem(last=False)
+        return (wdl, False) if wdl != None else None
     
+    # Public method to probe the DTZ of a Board (not cached, should only be used at the root)
+    #
+    # Parameters:
+    #   board: the Board of the position
+    #
+    # Returns the dtz value, None if the position isn't in the tablebase
+    def probeDTZ(self, board):
+        tablebase = self.get_tablebase()
+        if (tablebase == None):
+            return None
+        chess_board = self.to_chess_board(board)
+        try:
+            return tablebase.probe_dtz(chess_board)
+        except (chess.syzygy.MissingTableError, KeyError) as e:
+            self.__print_error(chess_board, e)
+            return None
+
     # Public method to probe the tablebase
     #
     # Parameters:
@@ -91,14 +254,87 @@ class Tablebase:
     # Returns a tuple containing the wdl and dtz values
     def probeTablebase(self, fen):
         # create a chess board from the fen
-        board = chess.Board(fen)
-        
+        return self.__probe(chess.Board(fen))
+    
+    # Public method to probe the tablebase with a Board, without converting the board to a FEN
+    #
+    # Parameters:
+    #   board: the Board of the position
+    #
+    # Returns a tuple containing the wdl and dtz values
+    def probeBoard(self, board):
+        return self.__probe(self.to_chess_board(board))
+
+    # Private method to probe the tablebase with a python-chess board
+    #
+    # Returns a tuple containing the wdl and dtz values, None if the position is not in the tablebase
+    def __probe(self, board):
+        tablebase = self.get_tablebase()
+        if (tablebase == None):
+            return None
         try:
             # probe the tablebase and get the wdl and dtz values
-            wdl = self.tablebase.probe_wdl(board)
-            dtz = self.tablebase.probe_dtz(board)
+            wdl = tablebase.probe_wdl(board)
+            dtz = tablebase.probe_dtz(board)
             return wdl, dtz
             # else there is an error
-        except chess.syzygy.TablebaseError:
-            print(f"Error: {fen}: {chess.syzygy.TablebaseError}")
+        except (chess.syzygy.MissingTableError, KeyError) as e:
+            self.__print_error(board, e)
             return None
+
+    # Private method to print a probe error to stderr (stdout is read by the GUI). The error is only printed for the
+    # first position of every material signature, so a search without the table file doesn't print it at every leaf
+    #
+    # Parameters:
+    #   board: the python-chess board that was probed
+    #   error: the error raised by the probe
+    def __print_error(self, board, error):
+        signature = chess.syzygy.calc_key(board)
+        with self.__cache_lock:
+            if (signature in self.__logged_signatures):
+                return
+            self.__logged_signatures.add(signature)
+        print(f"Error: {board.fen()}: {error}", file=sys.stderr)
+
+    # Builds a python-chess board directly from a Board's piece lists by setting the python-chess bitboards
+    #
+    # Parameters:
+    #   board: the Board to convert
+    #
+    # NOTE: Castling rights are not copied as Syzygy tablebases don't contain positions with castling rights
+    #
+    # Returns the python-chess board
+    @staticmethod
+    def to_chess_board(board):
+        chess_board = chess.Board(None)
+        piece_masks = [0, 0, 0, 0, 0, 0]
+        # Board.TeamColor values are the same as python-chess colors (black = 0, white = 1)
+        color_masks = [0, 0]
+
+        for piece_type in Board.PieceType:
+            for team_color in Board.TeamColor:
+                mask = 0
+                # Square index is row * 8 + col for both boards (0 is A1, 1 is B1, 8 is A2, etc)
+                for coord in board._pieces.get_piece_locations_and_action_info(piece_type, team_color):
+                    mask |= 1 << (coord.row * 8 + coord.col)
+                piece_masks[piece_type.value] |= mask
+                color_masks[team_color.value] |= mask
+
+        chess_board.pawns = piece_masks[Board.PieceType.PAWN.value]
+        chess_board.bishops = piece_masks[Board.PieceType.BISHOP.value]
+        chess_board.knights = piece_masks[Board.PieceType.KNIGHT.value]
+        chess_board.rooks = piece_masks[Board.PieceType.ROOK.value]
+        chess_board.queens = piece_masks[Board.PieceType.QUEEN.value]
+        chess_board.kings = piece_masks[Board.PieceType.KING.value]
+        chess_board.occupied_co[chess.BLACK] = color_masks[Board.TeamColor.BLACK.value]
+        chess_board.occupied_co[chess.WHITE] = color_masks[Board.TeamColor.WHITE.value]
+        chess_board.occupied = color_masks[0] | color_masks[1]
+        chess_board.turn = board.get_turn_color() == Board.TeamColor.WHITE
+
+        # The Board stores the pawn that can be captured en passant, python-chess stores the square behind it
+        en_passant_avail = board._en_passant_avail
+        if (en_passant_avail != None):
+            en_passant_row = 2 if en_passant_avail.row == 3 else 5
+            chess_board.ep_square = en_passant_row * 8 + en_passant_avail.col
+        
+        return chess_board
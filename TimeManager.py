@@ -0,0 +1,162 @@
+import time
+
+# Class for deciding how long the engine should think about a move
+#
+# The time manager has two limits:
+#   - soft limit: the target time for the move. No new iteration of iterative deepening is started after it has passed
+#   - hard limit: the absolute maximum for the move. The search is stopped when it is reached (used to arm the Timer)
+#
+# After every completed iteration record_iteration() should be called. The nodes searched and time taken are used to
+# measure the nodes per second (NPS) and effective branching factor (EBF), which are used to predict how long the next
+# iteration will take. should_start_next_iteration() will not start an iteration that can not finish in time.
+#
+# NOTE: All times given to the time manager are in milliseconds (same as UCI), all times returned are in seconds
+class TimeManager:
+    ESTIMATED_MOVES_UNTIL_GAME_END = 40
+    # The hard limit is at most this many times the soft limit
+    HARD_LIMIT_FACTOR = 3
+    # The hard limit will never use more than this fraction of the remaining clock
+    MAX_CLOCK_FRACTION = 0.5
+    # Effective branching factor assumed until two iterations have been completed
+    DEFAULT_BRANCHING_FACTOR = 6
+    # The soft limit is extended by this fraction every time the best move changes between iterations
+    INSTABILITY_EXTENSION = 0.5
+    # The soft limit is extended by this fraction when the score drops by more than SCORE_DROP_THRESHOLD (in pawns)
+    SCORE_DROP_EXTENSION = 0.5
+    SCORE_DROP_THRESHOLD = 0.3
+    # The soft limit can be extended to at most this many times its original value
+    MAX_EXTENSION = 2.5
+    # Time limit used when there is only one legal move
+    FORCED_MOVE_TIME = 0.05
+    # Lowest time limit that will be given so there are no negative or zero time limits
+    MIN_TIME_LIMIT = 0.1
+
+    # Creates a new TimeManager object
+    #
+    # Parameters:
+    # time_padding: the time in seconds lost to closing threads after the time limit is reached
+    # time_left: the time left on the clock of the side to move in ms (default value is None - no clock)
+    # increment: the increment per move of the side to move in ms (default value is 0)
+    # movestogo: the moves left until the next time control (default value is None - sudden death)
+    # movetime: the exact time to search for in ms (default value is None - use the clock)
+    # legal_move_count: the number of moves that can be searched at the root (default value is None - unknown)
+    def __init__(self, time_padding: float, time_left: float = None, increment: float = 0, movestogo: int = None,
+                 movetime: float = None, legal_move_count: int = None) -> None:
+        self.__time_padding: float = time_padding
+        self.__start_time: float = time.time()
+
+        # Values measured by the iterations
+        self.__iterations: int = 0
+        self.__last_nodes: int = 0
+        self.__last_iteration_time: float = 0
+        self.__nps: float = 0
+        self.__branching_factor: float = self.DEFAULT_BRANCHING_FACTOR
+        self.__best_move = None
+        self.__score: float = None
+        self.__extension: float = 1
+
+        # Compute the limits
+        if (movetime != None and movetime > 0):
+            # The user asked for an exact time, so both limits are the same
+            soft_limit = movetime / 1000
+            hard_limit = soft_limit
+        elif (time_left != None):
+            divider = movestogo if movestogo != None and movestogo > 0 else self.ESTIMATED_MOVES_UNTIL_GAME_END
+            increment = increment if increment != None else 0
+            soft_limit = (time_left + increment * divider) / divider / 1000
+            hard_limit = min(soft_limit * self.HARD_LIMIT_FACTOR, time_left / 1000 * self.MAX_CLOCK_FRACTION)
+            # Make sure the soft limit is never above the hard limit when the clock is almost empty
+            soft_limit = min(soft_limit, hard_limit)
+        else:
+            soft_limit = float('inf')
+            hard_limit = float('inf')
+
+        # Subtract the padding so the timer is stopped <= to the time given instead of being a few milliseconds over
+        self.__soft_limit: float = self.__pad(soft_limit)
+        self.__hard_limit: float = self.__pad(hard_limit)
+
+        # No need to think when there is only one move to play
+        if (legal_move_count == 1):
+            self.__soft_limit = 0
+            self.__hard_limit = min(self.__hard_limit, self.FORCED_MOVE_TIME)
+
+    # Subtracts the time padding from a time limit while keeping a lower bound
+    def __pad(self, time_limit: float) -> float:
+        if (time_limit == float('inf')):
+            return time_limit
+        return time_limit - self.__time_padding if time_limit - self.__time_padding >= self.MIN_TIME_LIMIT else self.MIN_TIME_LIMIT
+
+    # Restarts the clock of the time manager. Used when a ponder search turns into a normal search
+    def start(self) -> None:
+        self.__start_time = time.time()
+
+    # Returns the time in seconds since the time manager was started
+    def get_time_elapsed(self) -> float:
+        return time.time() - self.__start_time
+
+    # Returns the soft limit in seconds, including any extension from an unstable search
+    def soft_limit(self) -> float:
+        return self.__soft_limit * self.__extension
+
+    # Returns the hard limit in seconds
+    def hard_limit(self) -> float:
+        return self.__hard_limit
+
+    # Returns true if the search is limited by time
+    def is_limited(self) -> bool:
+        return self.__hard_limit != float('inf')
+
+    # Returns the nodes per second measured by the last iteration
+    def get_nps(self) -> float:
+        return self.__nps
+
+    # Returns the effective branching factor measured between the last two iterations
+    def get_branching_factor(self) -> float:
+        return self.__branching_factor
+
+    # Records the result of a completed iteration
+    #
+    # Parameters:
+    # nodes: the nodes searched by the iteration
+    # iteration_time: the time in seconds the iteration took
+    # best_move: the best move found by the iteration
+    # score: the score of the best move from the point of view of the side to move
+    def record_iteration(self, nodes: int, iteration_time: float, best_move, score: float) -> None:
+        if (iteration_time > 0):
+            self.__nps = nodes / iteration_time
+        if (self.__iterations > 0 and self.__last_nodes > 0 and nodes > self.__last_nodes):
+            self.__branching_factor = nodes / self.__last_nodes
+
+        # Extend the time if the search has not settled on a move yet
+        if (self.__best_move != None and best_move != self.__best_move):
+            self.__extend(self.INSTABILITY_EXTENSION)
+        # Extend the time if the score dropped
+        if (self.__score != None and score != None and abs(score) != float('inf') and abs(self.__score) != float('inf')
+            and self.__score - score > self.SCORE_DROP_THRESHOLD):
+            self.__extend(self.SCORE_DROP_EXTENSION)
+
+        self.__iterations += 1
+        self.__last_nodes = nodes
+        self.__last_iteration_time = iteration_time
+        self.__best_move = best_move
+        self.__score = score
+
+    # Extends the soft limit by a fraction, up to MAX_EXTENSION
+    def __extend(self, fraction: float) -> None:
+        self.__extension = min(self.__extension * (1 + fraction), self.MAX_EXTENSION)
+
+    # Returns the predicted time in seconds the next iteration will take
+    def predict_next_iteration(self) -> float:
+        if (self.__nps > 0):
+            return self.__last_nodes * self.__branching_factor / self.__nps
+        return self.__last_iteration_time * self.__branching_factor
+
+    # Returns true if there is enough time left to start and finish another iteration
+    def should_start_next_iteration(self) -> bool:
+        elapsed = self.get_time_elapsed()
+        # Never start a new iteration after the soft limit
+        if (elapsed >= self.soft_limit()):
+            return False
+        # Don't start an iteration that would be stopped by the hard limit before finishing
+        # Padding is added since the thread join after the hard limit costs time as well
+        return elapsed + self.predict_next_iteration() + self.__time_padding <= self.__hard_limit
@@ -5,9 +5,9 @@ Created on Mon Oct 24 10:47:31 2023
 @author: Ethan Geoffrey Wijaya
 """
 import copy
+import json
 import random
-from Board import Board, TeamColor, Move
-from collections import deque
+from Board import Board, TeamColor, Move, PieceType
 from Board import Piece
 from Tablebase import Tablebase
 
@@ -24,6 +24,148 @@ from Tablebase import Tablebase
 # NOTE: Minimax now extremely fast at depth 3. It can run our slowest MinimaxDemo test position (1k1q2b1/1pp1r3/p4r2/3n4/5N2/P7/BPPQ4/1KR5 w - - 0 1) in 
 #           less than 2 seconds for depth 3. For depth 5, it runs on average 61 seconds. Depth 5 might be viable after transposition table fixes.
 
+# Picks the moves of a Node in stages, in the order they should be searched:
+#   0. PV move - the move of the principal variation of the last search, if the Node is on it
+#   1. Hash move - the best move found from this position by an earlier tree (only this position's hash is probed)
+#   2. Good captures - captures (MVV/LVA) where the victim is worth at least the attacker or which give check, and
+#       promotions
+#   3. Killer moves - quiet moves which caused a beta cutoff in another node on the same level
+#   4. Quiet moves - moves giving check first
+#   5. Bad captures - captures where the victim is worth less than the attacker (MVV/LVA)
+#
+# A stage is only scored when it is reached, so no time is spent ordering the later stages when one of the first moves
+#   causes a beta cutoff (which is the common case).
+#
+# Parameters:
+#   board - The Board the moves are played on. Must be in the Node's position whenever next() is called
+#   moves - The legal moves of the Node
+#   hash_moves - The best move found from every position searched by the Tree, zobrist hash -> move
+#   killer_moves - The killer moves of the Node's level, most recent first
+#   pv_move - The move of the principal variation from the Node. Default is None (the Node isn't on the PV)
+class MovePicker:
+    # Stages
+    PV_MOVE = 0
+    HASH_MOVE = 1
+    GOOD_CAPTURES = 2
+    KILLER_MOVES = 3
+    QUIET_MOVES = 4
+    BAD_CAPTURES = 5
+    DONE = 6
+
+    def __init__(self, board: Board, moves: list[Move], hash_moves: dict[int, Move], killer_moves: list[Move],
+                 pv_move: Move = None):
+        self.__board: Board = board
+        self.__moves: list[Move] = moves
+        self.__hash_moves: dict[int, Move] = hash_moves
+        self.__killer_moves: list[Move] = killer_moves
+        self.__stage: int = MovePicker.PV_MOVE
+        # Moves of the current stage, in order, and the index of the next one
+        self.__stage_moves: list[Move] = []
+        self.__index: int = 0
+        # The PV move is only searched if it is legal in this position
+        if (pv_move != None and pv_move in moves):
+            self.__stage_moves = [pv_move]
+            self.__moves = [move for move in moves if move != pv_move]
+        # Filled when the good captures are scored
+        self.__quiet_moves: list[Move] = None
+        self.__bad_captures: list[tuple[Move, int]] = None
+
+    # Returns the current stage
+    def stage(self) -> int:
+        return self.__stage
+
+    # Returns the next move to search, None if every move was picked
+    def next(self) -> Move:
+        while (self.__index >= len(self.__stage_moves)):
+            if (self.__stage == MovePicker.DONE):
+                return None
+            self.__stage += 1
+            self.__index = 0
+            if (self.__stage == MovePicker.HASH_MOVE):
+                self.__stage_moves = self.__pick_hash_move()
+            elif (self.__stage == MovePicker.GOOD_CAPTURES):
+                self.__stage_moves = self.__pick_good_captures()
+            elif (self.__stage == MovePicker.KILLER_MOVES):
+                self.__stage_moves = self.__pick_killer_moves()
+            elif (self.__stage == MovePicker.QUIET_MOVES):
+                self.__stage_moves = self.__pick_quiet_moves()
+            elif (self.__stage == MovePicker.BAD_CAPTURES):
+                self.__stage_moves = [move for move, score in self.__bad_captures]
+            else:
+                self.__stage_moves = []
+        self.__index += 1
+        return self.__stage_moves[self.__index - 1]
+
+    # Takes the hash move of the position out of the moves
+    #
+    # Returns a list with the hash move, empty if there is none or it isn't legal in this position (Ex: it was the PV move
+    # or the hash is from another position)
+    def __pick_hash_move(self) -> list[Move]:
+        hash_move = self.__hash_moves.get(self.__board.get_zobrist_hash())
+        if (hash_move == None or hash_move not in self.__moves):
+            return []
+        self.__moves = [move for move in self.__moves if move != hash_move]
+        return [hash_move]
+
+    # Splits the remaining moves into captures and quiet moves and scores the captures with MVV/LVA
+    #
+    # Returns the good captures and promotions sorted by their score. The bad captures are kept for the last stage
+    def __pick_good_captures(self) -> list[Move]:
+        board_arr = self.__board._board_arr
+        good_captures = []
+        bad_captures = []
+        quiet_moves = []
+        for move in self.__moves:
+            if (not self.__board._is_capture_or_promotion(move)):
+                quiet_moves.append(move)
+                continue
+            attacker: Piece = board_arr[move.from_coord.row][move.from_coord.col]
+            victim: Piece = board_arr[move.to_coord.row][move.to_coord.col]
+            attacker_value = Board.get_piece_value(attacker.Type)
+            # No victim on the to square for en passant (captures a pawn) and promotions without a capture
+            if victim is not None:
+                victim_value = Board.get_piece_value(victim.Type)
+            elif move.from_coord.col != move.to_coord.col:
+                victim_value = Board.get_piece_value(PieceType.PAWN)
+            else:
+                victim_value = 0
+            score = victim_value * 10 - attacker_value
+            if move.promotion is not None:
+                score += Board.get_piece_value(move.promotion)
+                good_captures.append((move, score))
+            # A capture losing material which gives check is still searched with the good captures
+            elif victim_value >= attacker_value or self.__board.move_causes_check(move):
+                good_captures.append((move, score))
+            else:
+                bad_captures.append((move, score))
+        self.__quiet_moves = quiet_moves
+        bad_captures.sort(key=lambda x: x[1], reverse=True)
+        self.__bad_captures = bad_captures
+        good_captures.sort(key=lambda x: x[1], reverse=True)
+        return [move[0] for move in good_captures]
+
+    # Takes the killer moves which are legal quiet moves in this position out of the quiet moves
+    #
+    # Returns the killer moves
+    def __pick_killer_moves(self) -> list[Move]:
+        killer_moves = []
+        for move in self.__killer_moves:
+            if (move in self.__quiet_moves):
+                self.__quiet_moves.remove(move)
+                killer_moves.append(move)
+        return killer_moves
+
+    # Returns the remaining quiet moves, moves giving check first
+    def __pick_quiet_moves(self) -> list[Move]:
+        checks = []
+        other_moves = []
+        for move in self.__quiet_moves:
+            if self.__board.move_causes_check(move):
+                checks.append(move)
+            else:
+                other_moves.append(move)
+        return checks + other_moves
+
 # The Node class which makes up the tree.
 # Important public fields:
 #   position - A Board object representing the Node's board position
@@ -37,20 +179,41 @@ from Tablebase import Tablebase
 #   position - A Board object representing this Node's board position
 #   parent - A Node object representing this node's parent
 class Node:
+    # Fixed fields so every Node is small and fast to create (Nodes are created for every position searched)
+    __slots__ = ('parent', 'child', 'previous_move', 'best_child', 'alpha', 'beta', 'level', 'score', 'moves_searched',
+                 '__legal_moves', '__move_index', '__legal_captures', '__capture_index', '__move_picker')
+
+    # Shared by every Node until its legal moves are loaded
+    _NO_MOVES: tuple = ()
+
     def __init__(self, parent):
+        self._reset(parent)
+
+    # Sets every field as if the Node was just created. Used to reuse a Node that was removed from the tree
+    #
+    # Parameters:
+    #   parent - A Node object representing this node's parent
+    def _reset(self, parent):
         self.parent: Node = parent
-        self.__legalMoves: deque[Move] = deque()
-        self.__legalCaptures: deque[Move] = deque()
+        # The legal moves and captures are a list and the index of the next one (instead of removing picked moves)
+        self.__legal_moves: list[Move] = Node._NO_MOVES
+        self.__move_index: int = 0
+        self.__legal_captures: list[Move] = Node._NO_MOVES
+        self.__capture_index: int = 0
+        self.__move_picker: MovePicker = None
         self.child: Node = None
         self.previous_move: Move = None
         self.best_child: Node = None
-
-        self.alpha: float = float('-inf') if parent == None else parent.alpha
-        self.beta: float = float('inf') if parent == None else parent.beta
+        # Number of children created from this node. Only counted when search statistics are enabled
+        self.moves_searched: int = 0
 
         if (parent != None):
+            self.alpha: float = parent.alpha
+            self.beta: float = parent.beta
             self.level: int = parent.level + 1
         else:
+            self.alpha: float = float('-inf')
+            self.beta: float = float('inf')
             self.level: int = 0
 
         self.score: float = float('-inf') if self.level % 2 == 0 else float('inf')
@@ -60,58 +223,67 @@ class Node:
     # Returns true if legal moves exist
     # @profile
     def _load_legal_moves(self, board: Board) -> bool:
-        self.__legalMoves.extend(board.get_all_legal_moves())
+        self.__legal_moves = board.get_all_legal_moves()
+        self.__move_index = 0
         # x = self.parent
         # s = "None" if self.previous_move == None else self.previous_move
         # while x != None: s = ("Root" if x.previous_move == None else x.previous_move) + " -> " + s; x = x.parent
-        # print("Known Moves (" + s + "): " + str(self.__legalMoves))
-        return len(self.__legalMoves) > 0
+        # print("Known Moves (" + s + "): " + str(self.__legal_moves))
+        return len(self.__legal_moves) > 0
     
-    # Uses the Board class to generate all possible legal captures from this position and store it in the Node
+    # Uses the Board class to generate all possible legal captures (including en passant) and promotions from this 
+    # position and store it in the Node
     #
     # Returns true if legal captures exist
     # @profile
     def _load_legal_captures(self, board: Board) -> bool:
-        if (len(self.__legalMoves) == 0):
-            self._load_legal_moves(board)
-        for move in self.__legalMoves:
-            x1, y1 = move.from_coord.row, move.from_coord.col
-            x2, y2 = move.to_coord.row, move.to_coord.col
-            piece1: Piece = board._board_arr[x1][y1]
-            piece2: Piece = board._board_arr[x2][y2]
-            if ((piece1 is not None and piece2 is not None) and piece1.Color != piece2.Color):
-                # TODO: Potential optimiziation: Move ordering might be useful
-                self.__legalCaptures.append(move)
-        return len(self.__legalCaptures) > 0
+        self.__legal_captures = board.get_legal_captures()
+        self.__capture_index = 0
+        return len(self.__legal_captures) > 0
     
-    # Get the legal moves for the position, this is to be called from move ordering
+    # Get the legal moves left for the position, this is to be called from move ordering
+    #
+    # NOTE: Not a copy when no move was picked yet, the list must not be modified
     def _get_legal_moves(self) -> list[Move]:
-        return list(self.__legalMoves)
+        return self.__legal_moves if self.__move_index == 0 else self.__legal_moves[self.__move_index:]
     
-    # Set the legal moves for this position, this will be set from the move ordering function
+    # Set the legal moves for this position
     # @profile
     def _set_legal_moves(self, moves: list[Move]):
-        self.__legalMoves = deque(moves)
+        self.__legal_moves = moves
+        self.__move_index = 0
+        self.__move_picker = None
 
-    # Getter for legalCaptures list
+    # Set the MovePicker picking the legal moves for this position, this will be set from the move ordering function
+    def _set_move_picker(self, move_picker: MovePicker):
+        self.__move_picker = move_picker
+
+    # Getter for the legal captures left for the position
+    #
+    # NOTE: Not a copy when no capture was picked yet, the list must not be modified
     def _get_legal_captures(self):
-        return list(self.__legalCaptures)
+        return self.__legal_captures if self.__capture_index == 0 else self.__legal_captures[self.__capture_index:]
 
     # Set the legal captures for this position, this will be set from the move ordering function
     def _set_legal_captures(self, moves: list[Move]):
-        self.__legalCaptures = deque(moves)
+        self.__legal_captures = moves
+        self.__capture_index = 0
     
-    # Returns the next available move in the __legalMoves private field.
+    # Returns the next available move from the MovePicker if set, otherwise from the __legal_moves private field.
     def _next_move(self) -> Move:
-        if (len(self.__legalMoves) > 0):
-            return self.__legalMoves.popleft()
+        if (self.__move_picker != None):
+            return self.__move_picker.next()
+        if (self.__move_index < len(self.__legal_moves)):
+            self.__move_index += 1
+            return self.__legal_moves[self.__move_index - 1]
         else:
             return None
     
-    # Returns the next available capture move in the __legalCaptures private field.
+    # Returns the next available capture move in the __legal_captures private field.
     def _next_capture(self) -> str:
-        if (len(self.__legalCaptures) > 0):
-            return self.__legalCaptures.popleft()
+        if (self.__capture_index < len(self.__legal_captures)):
+            self.__capture_index += 1
+            return self.__legal_captures[self.__capture_index - 1]
         else:
             return None
         
@@ -160,6 +332,169 @@ class Node:
             if (self.beta > score):
                 self.beta = score
 
+# Bounded cache of static evaluations (Board.evaluate()) keyed by zobrist hash
+#
+# The same position is often evaluated more than once in a search through transpositions (especially in quiescence, 
+#   where captures can be made in different orders). Entries are stored in a fixed size list indexed by the hash, 
+#   a new entry replaces the entry in the same slot.
+#
+# Parameters:
+#   size - The number of entries in the cache (rounded up to a power of 2)
+class EvalCache:
+    DEFAULT_SIZE = 1 << 16
+
+    def __init__(self, size: int = DEFAULT_SIZE):
+        size = 1 << max(size - 1, 0).bit_length()
+        self.__mask: int = size - 1
+        # Each entry is a tuple of (zobrist hash, score) or None if empty
+        self.__entries: list[tuple[int, float]] = [None] * size
+        self.hits: int = 0
+        self.misses: int = 0
+
+    # Returns the cached score of a position, None if the position is not cached
+    def get(self, zobrist_hash: int) -> float:
+        entry = self.__entries[zobrist_hash & self.__mask]
+        if (entry is not None and entry[0] == zobrist_hash):
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    # Stores the score of a position
+    def store(self, zobrist_hash: int, score: float):
+        self.__entries[zobrist_hash & self.__mask] = (zobrist_hash, score)
+
+# Per-ply search statistics of a Tree (or of every Tree of an iterative deepening search when the same object is used)
+#
+# Every counter is a list indexed by ply (the level of the node in the tree). Statistics are only collected when a
+#   SearchStats object is given to the Tree, so a search without statistics doesn't pay for them.
+#
+# Counters:
+#   nodes - Nodes searched by the main search
+#   q_nodes - Nodes searched by quiescence
+#   beta_cutoffs - Nodes where alpha >= beta stopped the remaining moves from being searched
+#   first_move_cutoffs - Beta cutoffs caused by the first move searched (a measure of how good move ordering is)
+#   tt_probes - Transposition table lookups
+#   tt_hits - Transposition table lookups that found the position
+#   eval_calls - Static evaluations (including evaluations answered by the EvalCache)
+class SearchStats:
+    MAX_PLY = 128
+    COUNTERS = ['nodes', 'q_nodes', 'beta_cutoffs', 'first_move_cutoffs', 'tt_probes', 'tt_hits', 'eval_calls']
+
+    def __init__(self):
+        self.nodes: list[int] = [0] * self.MAX_PLY
+        self.q_nodes: list[int] = [0] * self.MAX_PLY
+        self.beta_cutoffs: list[int] = [0] * self.MAX_PLY
+        self.first_move_cutoffs: list[int] = [0] * self.MAX_PLY
+        self.tt_probes: list[int] = [0] * self.MAX_PLY
+        self.tt_hits: list[int] = [0] * self.MAX_PLY
+        self.eval_calls: list[int] = [0] * self.MAX_PLY
+
+    # Returns the number of plies with any statistics
+    def max_ply(self) -> int:
+        for ply in range(self.MAX_PLY - 1, -1, -1):
+            if (self.nodes[ply] or self.q_nodes[ply] or self.eval_calls[ply]):
+                return ply + 1
+        return 0
+
+    # Returns the effective branching factor between every ply of the main search (nodes[ply + 1] / nodes[ply])
+    def branching_factors(self) -> list[float]:
+        return [self.nodes[ply + 1] / self.nodes[ply] for ply in range(self.max_ply() - 1) if self.nodes[ply] > 0]
+
+    # Returns the statistics as a dict of totals and per-ply lists (Used for info and JSON)
+    def to_dict(self) -> dict:
+        plies = self.max_ply()
+        stats = {counter: getattr(self, counter)[:plies] for counter in self.COUNTERS}
+        stats['totals'] = {counter: sum(getattr(self, counter)) for counter in self.COUNTERS}
+        totals = stats['totals']
+        stats['q_node_ratio'] = totals['q_nodes'] / (totals['nodes'] + totals['q_nodes']) if totals['nodes'] + totals['q_nodes'] > 0 else 0
+        stats['first_move_cutoff_rate'] = totals['first_move_cutoffs'] / totals['beta_cutoffs'] if totals['beta_cutoffs'] > 0 else 0
+        stats['tt_hit_rate'] = totals['tt_hits'] / totals['tt_probes'] if totals['tt_probes'] > 0 else 0
+        stats['branching_factors'] = self.branching_factors()
+        return stats
+
+    # Writes the statistics to a JSON file
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+# Search information kept from one search to the next, so a search doesn't start from nothing:
+#   hash_moves - The best move found from every position of the trees searched, zobrist hash -> move
+#   killer_moves - The killer moves of the trees searched, by level
+#   pv - The principal variation (best line) of the last tree searched, searched first by the next tree
+#
+# MiniMax shares its SearchState between the iterations of iterative deepening, and CommandLine keeps the same
+#   SearchState between searches. When the new root is two plies down from the last root searched (our move and the 
+#   opponent's reply), set_root() moves the killer moves and the PV two plies up, so the search of the next move starts
+#   with the move ordering of the last search. Otherwise (or when there are more than MAX_TT_SIZE hash moves) the state
+#   is cleared.
+#
+# NOTE: Only move ordering information is kept, so another search only changes the order the moves are searched in, not
+#       the score of the search. The transposition table isn't kept as its scores are used as the minimax values of
+#       the nodes, and they don't store the depth they were searched to (every tree starts with a new one)
+class SearchState:
+    # The hash moves are cleared when a new root is set and there are more than this
+    MAX_TT_SIZE = 1000000
+
+    def __init__(self):
+        self.hash_moves: dict[int, Move] = dict()
+        self.killer_moves: list[list[Move]] = []
+        self.pv: list[Move] = []
+        # The zobrist hash and the moves played to reach the last root searched
+        self.__root_hash: int = None
+        self.__root_history: list[str] = None
+
+    # Clears the state
+    def clear(self):
+        self.hash_moves = dict()
+        self.killer_moves = []
+        self.pv = []
+        self.__root_hash = None
+        self.__root_history = None
+
+    # Sets the root of the next search. The state is kept if the root is the last root searched (Ex: the next iteration 
+    # of iterative deepening) or two plies down from it. Otherwise the state is cleared.
+    #
+    # Parameters:
+    #   board - The Board the next search starts from
+    #
+    # Returns the number of plies the root moved down (0 or 2), None if the state was cleared
+    def set_root(self, board: Board) -> int | None:
+        history = board.get_previous_moves_as_str().split()
+        plies = None
+        if (self.__root_hash != None and history[:len(self.__root_history)] == self.__root_history
+            and self.__root_hash in board._repeated_positions):
+            plies = len(history) - len(self.__root_history)
+
+        if (plies == 0):
+            return 0
+        if (plies == 2 and len(self.hash_moves) <= SearchState.MAX_TT_SIZE):
+            # The PV is only kept if both moves played were the moves of the PV
+            self.pv = self.pv[2:] if self.pv[:2] == [Move.from_uci_str(move) for move in history[-2:]] else []
+            self.killer_moves = self.killer_moves[2:]
+        else:
+            self.clear()
+            plies = None
+        self.__root_hash = board.get_zobrist_hash()
+        self.__root_history = history
+        return plies
+
+    # Returns the killer moves by level for a tree of the given depth (the lists are shared with the tree)
+    def get_killer_moves(self, depth: int) -> list[list[Move]]:
+        while (len(self.killer_moves) < depth + 1):
+            self.killer_moves.append([])
+        return self.killer_moves
+
+    # Saves the PV of a tree which was searched. Should only be called with the PV of a tree which was searched until
+    # the end, as the best line of a stopped tree might not be the best
+    #
+    # Parameters:
+    #   board - The root of the tree
+    #   pv - The best line of the tree (Tree.get_pv())
+    def update(self, board: Board, pv: list[Move]):
+        self.set_root(board)
+        self.pv = pv
+
 # The main Tree class to be accessed by the user.
 #
 # Creates the Tree iteratively. This basically means the Tree will start as only the root node
@@ -172,16 +507,24 @@ class Node:
 # Parameters:
 #   root - A Board object meant to serve as the starting position from which to create the tree
 #   depth - An int representing how deep the user wants the tree to be
+#   eval_cache - An EvalCache to use for static evaluations. Pass the same cache to trees searching from the same root
+#       (Ex: every iteration of iterative deepening) to share evaluations between them. Default creates a new cache
+#   stats - A SearchStats to collect search statistics in. Default is None (no statistics are collected)
+#   search_state - A SearchState whose hash moves, killer moves and PV are used by the tree. Pass the same
+#       state to trees searching from the same root (Ex: every iteration of iterative deepening) to order the moves with
+#       what was learned in earlier trees. Default is None (the tree starts from nothing)
 #
 # NOTE: The Tree can still be traversed by accessing the root node and its children. Only creating
 #   the tree works like an iterable.
 class Tree:
-    def __init__(self, root: Board, depth: int, q_depth: int = 5, searchmoves: [Move] = None, nodes: float = float('inf')):
+    def __init__(self, root: Board, depth: int, q_depth: int = 5, searchmoves: [Move] = None, nodes: float = float('inf'),
+                 eval_cache: EvalCache = None, stats: SearchStats = None, search_state: SearchState = None):
         self.__root: Node = Node(None)
         self.__root._load_legal_moves(root)
         self.__current: Node = self.__root
         self.__board: Board = root
-        self.__TB: Tablebase = Tablebase()
+        self.__TB: Tablebase = Tablebase.get_instance()
+        self.__tb_available: bool = self.__TB.available()
 
         # UCI related fields
         if searchmoves is not None:
@@ -189,6 +532,7 @@ class Tree:
         self.__node_limit = nodes
         self.__nodes_searched = 0 # Incremented in Tree.__move()
         self.__tbhits = 0 # Incremented in score upon tablebase hit
+        self.__tb_cache_hits = 0 # Incremented in score when the tablebase result was already cached
 
         
         # Traversal board this board is meant to be used for tree traversal, utilizing move and undo_move
@@ -199,10 +543,25 @@ class Tree:
         self.__q_depth: int = q_depth
         self.__starting_turn: TeamColor = root.get_turn_color()
 
+        # Nodes removed from the tree, reused for the next Nodes created
+        self.__free_nodes: list[Node] = []
         self.__transposition_table: dict[int, float] = dict()
+        if (search_state != None):
+            self.__hash_moves: dict[int, Move] = search_state.hash_moves
+            self.__killer_moves: list[list[Move]] = search_state.get_killer_moves(depth)
+            self.__pv: list[Move] = list(search_state.pv)
+        else:
+            # The best move found from every position searched
+            self.__hash_moves: dict[int, Move] = dict()
+            # Quiet moves which caused a beta cutoff, by level (most recent first)
+            self.__killer_moves: list[list[Move]] = [[] for i in range(depth + 1)]
+            # The principal variation to search first
+            self.__pv: list[Move] = []
+        self.__eval_cache: EvalCache = eval_cache if eval_cache is not None else EvalCache()
+        self.__stats: SearchStats = stats
 
         # Order the moves
-        self.__root._set_legal_moves(self.move_ordering(self.__root))
+        self.__root._set_move_picker(self.move_ordering(self.__root))
     
     # Returns the next leaf node needed to be searched by the alpha beta pruning algorithm (Basically follows
     #   depth-first-search). Will create all Nodes necessary to reach the leaf node, extending the tree.
@@ -216,10 +575,16 @@ class Tree:
         while (self.__current != None):
             if (self.__nodes_searched >= self.__node_limit): return False
             #print('Level: ', self.__current.level)
-            nextMove = self.__current._next_move()
+            # Don't pick the next move on a beta cutoff, the MovePicker would score its next stage for nothing
+            cutoff = self.__current.beta <= self.__current.alpha
+            nextMove = self.__current._next_move() if not cutoff else None
             #print('Next Move: ', nextMove)
 
-            if (nextMove == None or self.__current.beta <= self.__current.alpha):
+            if (nextMove == None):
+                if (cutoff):
+                    self.__store_killer_move(self.__current)
+                    if (self.__stats is not None):
+                        self.__record_cutoff(self.__current)
                 # [MOVEUP] There are no more children to create so move up to the parent to look for more
                 # Must set minimax values for the parent, and undo the latest move to the traversal board
                 # Don't update transposition table if there is a half move draw or repetition draw (not based on position)
@@ -227,8 +592,11 @@ class Tree:
                     self.__current._set_minimax_values(0)
                 else:
                     self.__current._set_minimax_values(self.__current.score)
-                    # Add the score the the transposition table
-                    self.__transposition_table[self.__tboard.get_zobrist_hash()] = self.__current.score
+                    # Add the score the the transposition table and the best move to the hash moves
+                    zobrist_hash = self.__tboard.get_zobrist_hash()
+                    self.__transposition_table[zobrist_hash] = self.__current.score
+                    if (self.__current.best_child != None):
+                        self.__hash_moves[zobrist_hash] = self.__current.best_child.previous_move
                 #print(nextMove, self.__current.score)
                 self.__current = self.__current.parent
                 if (self.__current != None):
@@ -237,12 +605,17 @@ class Tree:
                 continue
             
             # Create a new node and set the necessary fields
-            self.__current.child = Node(self.__current)
+            self.__current.child = self.__new_node(self.__current)
             self.__current.child.previous_move = nextMove
+            if (self.__stats is not None):
+                self.__current.moves_searched += 1
 
             # Skip node if found in transposition table
             if (self.__current.level == self.__depth):
                 next_board_hash = self.__tboard.update_zobrist_hash(nextMove)
+                if (self.__stats is not None):
+                    self.__stats.tt_probes[self.__current.child.level] += 1
+                    self.__stats.tt_hits[self.__current.child.level] += next_board_hash in self.__transposition_table
                 if (next_board_hash in self.__transposition_table):
                     # If half move draw or repitition draw, set minimax values to 0 (draw)
                     # This will likely be different than transposition table value
@@ -256,14 +629,16 @@ class Tree:
 
             # Make the move
             self.__move(nextMove)
+            if (self.__stats is not None):
+                self.__stats.nodes[self.__current.child.level] += 1
             
             hasLegalMoves = self.__current.child._load_legal_moves(self.__tboard)
-            useTB = self.__tboard.get_piece_count() < 6
+            useTB = self.__tb_available and self.__tboard.get_piece_count() < 6
             # If we are not at the specified depth and there exist more legal moves, go to a lower level
             if (self.__current.child.level < self.__depth and hasLegalMoves and not useTB):
                 self.__current = self.__current.child
                 # Order the moves
-                self.__current._set_legal_moves(self.move_ordering(self.__current))
+                self.__current._set_move_picker(self.move_ordering(self.__current))
             else:
                 # If we are at the specified depth or there are no legal moves available,
                 #   consider newNode a leaf node then score and return True since one was found
@@ -303,6 +678,8 @@ class Tree:
         
             # If there is no move or if the alpha exceeds the beta value, move up in the tree
             if (next_move == None or self.__current.beta <= self.__current.alpha or self.__check_delta_cutoff(self.__current)):
+                if (self.__stats is not None and self.__current.beta <= self.__current.alpha):
+                    self.__record_cutoff(self.__current)
                 # [MOVEUP] There are no more children to create so move up to the parent to look for more
                 # Must set minimax values for the parent, and undo the latest move to the traversal board
                 # Don't need to check for halfmoves or repititions because quiescence is only called on captures
@@ -318,8 +695,10 @@ class Tree:
             # cap_value = self.__tboard.get_piece_value(self.__tboard._board_arr[x1][y1].Type)
             
             # Create a new node and set the necessary fields
-            self.__current.child = Node(self.__current)
+            self.__current.child = self.__new_node(self.__current)
             self.__current.child.previous_move = next_move
+            if (self.__stats is not None):
+                self.__current.moves_searched += 1
 
             # Skip node if found in transposition table
             # if (self.__current.level == self.__depth):
@@ -331,8 +710,10 @@ class Tree:
 
             # Make the move
             self.__move(next_move)
+            if (self.__stats is not None):
+                self.__stats.q_nodes[self.__current.child.level] += 1
 
-            useTB = self.__tboard.get_piece_count() < 6
+            useTB = self.__tb_available and self.__tboard.get_piece_count() < 6
             # If we are not at the specified depth and there exist more legal moves, go to a lower level
             if (self.__current.child.level < self.__depth + self.__q_depth 
                 and self.__current.child._load_legal_captures(self.__tboard) and not useTB):
@@ -349,6 +730,61 @@ class Tree:
                 self.__transposition_table[self.__tboard.get_zobrist_hash()] = self.__current.child.score
                 self.__undo_move()
 
+    # Creates the next child of a node, reusing a Node removed from the tree if there is one
+    # The previous child of the parent is removed from the tree unless it is the parent's best child
+    #
+    # Parameters:
+    #   - parent: The Node to create the child of
+    #
+    # Returns the new Node
+    def __new_node(self, parent: Node) -> Node:
+        if (parent.child != None and parent.child is not parent.best_child):
+            self.__free_node(parent.child)
+        if (len(self.__free_nodes) > 0):
+            node = self.__free_nodes.pop()
+            node._reset(parent)
+            return node
+        return Node(parent)
+
+    # Adds a Node which is no longer in the tree and the Nodes below it to the free list
+    #
+    # NOTE: Must not be called on the best child of a Node in the tree, the best line and the best move are read from them
+    def __free_node(self, node: Node):
+        nodes = [node]
+        while (len(nodes) > 0):
+            node = nodes.pop()
+            if (node.child != None):
+                nodes.append(node.child)
+            if (node.best_child != None and node.best_child is not node.child):
+                nodes.append(node.best_child)
+            node.parent = None
+            node.child = None
+            node.best_child = None
+            self.__free_nodes.append(node)
+
+    # Stores the move which caused a beta cutoff of a node as a killer move of its level if it is a quiet move
+    #
+    # Parameters:
+    #   - node: The Node with the beta cutoff. self.__tboard must be in the node's position
+    def __store_killer_move(self, node: Node):
+        if (node.best_child == None):
+            return
+        move = node.best_child.previous_move
+        if (self.__tboard._is_capture_or_promotion(move)):
+            return
+        killer_moves = self.__killer_moves[node.level]
+        if (move in killer_moves):
+            killer_moves.remove(move)
+        killer_moves.insert(0, move)
+        # Keep the two most recent killer moves
+        del killer_moves[2:]
+
+    # Records a beta cutoff of a node in the search statistics
+    def __record_cutoff(self, node: Node):
+        self.__stats.beta_cutoffs[node.level] += 1
+        if (node.moves_searched == 1):
+            self.__stats.first_move_cutoffs[node.level] += 1
+
     # Checks if any captures can possibly improve the position for a given node
     #
     # Parameters:
@@ -376,19 +812,23 @@ class Tree:
         # Used at end of method to adjust score for color of the starting position
         turn_adjuster = 1 if self.__starting_turn == TeamColor.WHITE else -1
 
+        # Get the WDL of the current position. DTZ is only probed at the root since it is much slower
+        # Score normally if the position could not be found in the tablebase
+        result = self.__TB.probeWDL(self.__tboard) if tb else None
+
         # If board has >5 pieces, we are not in tablebase territory so score normally, else use tablebase to score
-        if tb:
+        if result != None:
             self.__tbhits += 1
             # Reset turn_adjuster since tablebase scoring works differently
             turn_adjuster = -1 if self.__starting_turn != self.__tboard.get_turn_color() else 1
-            # Get tablebase values for current position
-            wdl, dtz = self.__TB.probeTablebase(self.__tboard.get_fen())
-            dtz = dtz + self.__tboard.get_half_moves() if dtz > 0 else dtz - self.__tboard.get_half_moves()
+            wdl, cache_hit = result
+            if (cache_hit):
+                self.__tb_cache_hits += 1
+            sign = 1 if wdl > 0 else -1
             # Get the repeated times (must be at least 1 as the current position is currently on the board)
-            # Negate it to be the correct sign for the score
-            repeated_times = self.__tboard.get_repeated_times() if dtz > 0 else -self.__tboard.get_repeated_times()
             # Magnify the repeated times to be more significant
-            repeated_times *= 30
+            repeated_times = self.__tboard.get_repeated_times() * 30
+            level = self.__current.child.level if self.__current.child != None else self.__current.level
 
             # On scoring, TB values must be translated to board evaluation scores for the case where we must 
             #   compare <6 piece positions to >=6 piece positions in minimax
@@ -401,35 +841,36 @@ class Tree:
             #           to incentivize regarding it as a winning/losing option:
             #       Board evaluation can only exist in range -103 >= score <= 103 purely based on material count 
             #           (One side has 9 queens and all other pieces, enemy side has only king)
-            #       Under this condition, the winning side wants to minimize dtz to reduce chances of a draw. 
-            #           The losing side wants to maximize dtz to increase draw chances
-            #       thus, 99900 is divided by dtz and added to the score (abs(dtz) > 100 for wdl == 1 so score will always be in range 1000 > score < 2000). 
-            #       This incentivizes choosing lower dtz for the winning side, higher dtz for the losing side
             #
             #       TODO: Consider if this case should just be considered a draw (Just set score to 0), since we assume this is a draw with optimal play
             #
             #   For abs(wdl) == 2, win/loss is guaranteed
             #       wdl value is multiplied by 1000, making it 2000 or -2000, outside the range of score for wdl==1. 
             #       This incentivizes minimax to view the position as a stronger win/loss over wdl==1 positions.
-            #       Since for wdl==2, 1 >= abs(dtz) <= 100. 990 is divided by dtz to incentivize lower dtz for winning side, 
-            #           higher dtz for losing side(same reasoning as above).
-            #       This doesn't help find the fastest mate, since syzgy doesn't include that as a feature anyway, 
-            #           but considers the best scoring move to be the one that reduces the most risk of drawing under the 50 move rule.
+            #
+            #   Without dtz, the winning side prefers reaching the position sooner (lower level) and without repetitions,
+            #       the losing side prefers the opposite. The level and repeated times are subtracted from the magnitude
+            #       of the score, which keeps the score in range 1000 > score < 2000 for wdl==1 and > 1000 for wdl==2.
+            #       Picking the move with the best dtz is done at the root by Tablebase.getBestMove.
             if (wdl == 0):
                 # Reset the turn adjuster (Won't affect tablebase score of 0)
                 turn_adjuster = 1 if self.__starting_turn == TeamColor.WHITE else -1
                 # Use normal evaluate if it is better than 0. This incentivizes choosing best move even if it's a tablebase draw
                 score = max(0, self.__tboard.evaluate()) if self.__tboard.get_turn_color() == self.__starting_turn else min(0, self.__tboard.evaluate())
-            elif (abs(wdl) == 1):
-                score = wdl * 1000 + 99900 / (dtz + repeated_times)
-            elif (abs(wdl) == 2):
-                score = wdl * 1000 + 990 / (dtz + repeated_times)
+            else:
+                score = wdl * 1000 - sign * (level + repeated_times)
         elif q:
              # Experimental scoring specifically for quiescence. Not used as it doesn't seem to boost performance
              score = self.__tboard._count_material()
         else:
-            # Score normally
-            score = self.__tboard.evaluate()
+            if (self.__stats is not None):
+                self.__stats.eval_calls[self.__current.child.level if self.__current.child != None else self.__current.level] += 1
+            # Score normally, using the cached evaluation if this position was already evaluated
+            zobrist_hash = self.__tboard.get_zobrist_hash()
+            score = self.__eval_cache.get(zobrist_hash)
+            if (score is None):
+                score = self.__tboard.evaluate()
+                self.__eval_cache.store(zobrist_hash, score)
             if abs(score) == self.__board.CHECKMATE_SCORE:
                 # If checkmate is found, add large number divided by the current depth being searched
                 # This will allow minimax to find the quickest checkmate available
@@ -457,7 +898,7 @@ class Tree:
             print("Turn: " + str(self.__tboard.get_turn_color()))
             print("Previous Moves: " + str(self.__tboard._previous_moves))
             print("Legal Moves: " + str(self.__tboard.get_all_legal_moves()))
-            print("Known Moves: " + str(self.__current._Node__legalMoves))
+            print("Known Moves: " + str(self.__current._get_legal_moves()))
             print("Current Line: " + self.get_current_line())
             print("Board: ")
             self.__tboard.print_board()
@@ -498,9 +939,21 @@ class Tree:
     def get_nodes_searched(self) -> int:
         return self.__nodes_searched
     
-    # Getter for number of tablebase hits
+    # Getter for number of tablebase hits (includes cache hits)
     def get_tbhits(self) -> int:
         return self.__tbhits
+    
+    # Getter for number of tablebase hits that were answered by the WDL cache
+    def get_tb_cache_hits(self) -> int:
+        return self.__tb_cache_hits
+    
+    # Getter for the static evaluation cache (hits and misses are stored in the cache)
+    def get_eval_cache(self) -> EvalCache:
+        return self.__eval_cache
+    
+    # Getter for the search statistics (None if statistics are not collected)
+    def get_stats(self) -> SearchStats:
+        return self.__stats
 
     # Returns the best move found using minimax as a move object
     def best_move(self) -> Move:
@@ -543,6 +996,15 @@ class Tree:
 
         return uci_str if ucimode else node_str
     
+    # Returns the moves of the best line (the best child of every node from the root)
+    def get_pv(self) -> list[Move]:
+        pv = []
+        best_child = self.__root.best_child
+        while (best_child != None):
+            pv.append(best_child.previous_move)
+            best_child = best_child.best_child
+        return pv
+
     # Returns a string representing the current line the engine is searching
     # Includes scores and alpha beta values
     def get_current_line(self, ucimode=False) -> str:
@@ -580,9 +1042,13 @@ class Tree:
         return int(self.__current.level / 2) if self.__current != None else 0
     
     # Gets the best move after the best move is played (The ponder move)
+    #
+    # Returns the ponder move, None if the best line has less than two moves
     def ponder_move(self) -> Move:
-        pm = self.best_move().best_child
-        return pm if pm != None else self.best_move().child.previous_move
+        best_child = self.root().best_child if self.root().best_child != None else self.root().child
+        if (best_child == None or best_child.best_child == None):
+            return None
+        return best_child.best_child.previous_move
     
     # NOTE: For debugging
     # Will return true if a specific move is found in a tree
@@ -618,100 +1084,37 @@ class Tree:
             return True
         return False
     
-    # Move Ordering: 
-    # First Hash Moves
-    # Hash moves are stored in a transposition table, and are moves that have been searched before
-    # Then search for captures using the MVVLA heuristic
+    # Move Ordering:
+    # Creates the MovePicker which picks the moves of a node in stages (See MovePicker):
+    # First the Hash Move
+    # The hash move is the best move found from the same position by an earlier tree (or another line of this tree)
+    # Then search for good captures using the MVV/LVA heuristic
     # MVVLA (Most Valuable Victim, Least Valuable Attacker):
     # Find the most valuable victim that can be captured in a position
     # Search in order of the least valuable attacker that can capture the most valuable victim
     # Then search for killer moves
-    # Killer moves are moves that have caused a beta cutoff in the past
-    # Checkmate killer moves are checked first, then beta cutoff killer moves
+    # Killer moves are quiet moves that have caused a beta cutoff in another node on the same level
+    # Then the other quiet moves (checks first) and last the captures losing material
     # @profile
-    def move_ordering(self, node: Node) -> [Move]:
-        # Potential order:
-        # Hash moves
-        # Mate-killer-moves (checkmates)
-        # Winning capture moves (hanging pieces, MVVLVA, Static Exchange Evaluator)
-        # Queen captures w/ promotion
-        # Queen promotion w/o capture
-        # Killer moves (anything that raises the alpha value)
-        #   - Moves that should not be considered killer: winning material, good captures, promotions 
-        #   - These are considered above and shouldn't be counted double
-        # Losing captures
-
-        legal_moves: list[Move] = node._get_legal_moves()
-        # Create an empty list to store each type of move and a score associated with the move
-        ordered_moves = []
-        hash_moves = []
-        checks = []
-        captures = []
-        promotions = []
-        other_moves = []
+    def move_ordering(self, node: Node) -> MovePicker:
+        return MovePicker(self.__tboard, node._get_legal_moves(), self.__hash_moves, self.__killer_moves[node.level],
+                          self.__get_pv_move(node))
 
-        # Iterate through each move and sort them into their respective lists
-        for move in legal_moves:
-            # Hash moves
-            zobrist_hash = self.__tboard.update_zobrist_hash(move)
-            if zobrist_hash in self.__transposition_table:
-                # print("REUSED HASH: " + str(zobrist_hash))
-                hash_moves.append((move, self.__transposition_table[zobrist_hash]))
-
-            # Checks
-            elif self.__tboard.move_causes_check(move):
-                if self.is_capture(move):
-                    # print('Capture Check: ', move)
-                    checks.append((move, 10))
-                else:
-                    # print('Check: ', move)
-                    captures.append((move, 0))
-
-            # MVV/LVA captures
-            # If the move is a capture move, get the victim and the attacker and assign a score to the move 
-            # based on the MVV/LVA heuristic
-            elif self.is_capture(move):
-                x1, y1 = move.from_coord.row, move.from_coord.col
-                x2, y2 = move.to_coord.row, move.to_coord.col
-
-                victim: Piece = self.__tboard._board_arr[x2][y2]
-                attacker: Piece = self.__tboard._board_arr[x1][y1]
-                score = self.__tboard.get_piece_value(victim.Type) * 10
-                score -= self.__tboard.get_piece_value(attacker.Type)
-                if move.promotion is not None:
-                    score += self.__tboard.get_piece_value(move.promotion)
-                captures.append((move, score))
-
-            # Add promotions, with the material value of the piece being promoted to
-            elif move.promotion is not None:
-                promotions.append((move, self.__tboard.get_piece_value(move.promotion)))
-
-            # Any other move that doesn't fit into the above categories
-            else:
-                other_moves.append((move, 0))
-            # Killer moves
-            # Get king, check if any attacks in attack array
-            # If there are no valid moves and the king is in check, it is checkmate
-            # If there are no valid moves and there is no check, it is a draw
-            # killer_moves = self.killer_moves.get(node.level, [])
-            # killer_moves = [move for move in killer_moves if move not in hash_moves and move not in captures]
-
-        # Sort the moves by their score
-        hash_moves.sort(key=lambda x: x[1], reverse=True)
-        checks.sort(key=lambda x: x[1], reverse=True)
-        captures.sort(key=lambda x: x[1], reverse=True)
-        promotions.sort(key=lambda x: x[1], reverse=True)
-
-        # Add the moves to the ordered moves list
-        ordered_moves = hash_moves + checks + captures + promotions + other_moves
-        ordered_moves = [move[0] for move in ordered_moves]
-
-        # print('New Order: ', ordered_moves)
-
-        return ordered_moves
+    # Gets the move of the principal variation from a node
+    #
+    # Returns the PV move, None if the node isn't on the principal variation
+    def __get_pv_move(self, node: Node) -> Move:
+        if (node.level >= len(self.__pv)):
+            return None
+        pv_move = self.__pv[node.level]
+        while (node.parent != None):
+            if (node.previous_move != self.__pv[node.level - 1]):
+                return None
+            node = node.parent
+        return pv_move
 
-    # Similar to move_ordering() but only for captures. Will assume each move passed into it is a capture without 
-    # checking it. Should only be called in quiescence() or any situation where a list of moves is guaranteed to only be captures.
+    # Similar to move_ordering() but only for captures. Will assume each move passed into it is a capture or a promotion
+    # without checking it. Should only be called in quiescence() or any situation where a list of moves is guaranteed to only be captures.
     def order_captures(self, node: Node) -> [Move]:
         legal_moves: list[Move] = node._get_legal_captures()
         hash_moves = []
@@ -737,7 +1140,13 @@ class Tree:
 
                 victim: Piece = self.__tboard._board_arr[x2][y2]
                 attacker: Piece = self.__tboard._board_arr[x1][y1]
-                score = self.__tboard.get_piece_value(victim.Type) * 10
+                # No victim on the to square for en passant (captures a pawn) and promotions without a capture
+                if victim is not None:
+                    score = self.__tboard.get_piece_value(victim.Type) * 10
+                elif attacker.Type == PieceType.PAWN and y1 != y2:
+                    score = self.__tboard.get_piece_value(PieceType.PAWN) * 10
+                else:
+                    score = 0
                 score -= self.__tboard.get_piece_value(attacker.Type)
                 if move.promotion is not None:
                     score += self.__tboard.get_piece_value(move.promotion)
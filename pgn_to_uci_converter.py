@@ -1,6 +1,20 @@
+import argparse
 import os
 import re
 import chess
+from functools import partial
+from multiprocessing import Pool
+from Board import Board, Move
+
+# Converts PGN archives into UCI move lists. Games are read one at a time so archives of any size can be converted, and
+# are converted by a pool of worker processes.
+#
+# Every converted game is written as one line of the output file with tab separated columns:
+#   result    uci moves (space separated)    zobrist hash of every position as hex (space separated, optional)
+# There is one more hash than moves since the position after the last move is included
+
+# Number of games sent to a worker process at a time
+CHUNK_SIZE = 64
 
 def get_pgn_file():
     pgn_file = input("Enter the name of the pgn file: ")
@@ -13,32 +27,59 @@ def get_output_file():
     output_file = input("Enter the name of the output file: ")
     if os.path.isfile(output_file):
         print("File already exists")
-        get_output_file()
-    
+        return get_output_file()
+
     return output_file
 
-def get_pgn_data(pgn_file):
-    with open(pgn_file, "r") as f:
-        pgn_data = f.read()
-    
-    return pgn_data
-
-def get_game_data(pgn_data):
-    game_data = pgn_data.split("\n\n")
-    if len(game_data) < 2:
-        print("No games found")
-    else:
-        game_data = game_data[1]
-        game_data = re.sub("\n", " ", game_data)
-        game_data = re.sub(" \{.*?\}", "", game_data)
-        game_data = re.sub("[0-9]+\. ", "", game_data)
-        game_data = re.sub("[0-9]+\... ", "", game_data)
+# Reads the games of a PGN file one at a time
+#
+# Parameters:
+#   pgn_file: the path of the PGN file
+#
+# Returns a generator of (headers, movetext) tuples, headers is a dict of the tag pairs of the game
+#
+# NOTE: The lines of the movetext are kept on separate lines so a ";" comment only removes the rest of its line
+def read_games(pgn_file):
+    with open(pgn_file, "r", errors="replace") as f:
+        headers = {}
+        movetext = []
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                tag = re.match(r'\[(\w+)\s+"(.*)"\]', line)
+                # A tag after the movetext or an Event tag is the start of the next game (a game can have no movetext)
+                if movetext or (headers and tag and tag.group(1) == "Event"):
+                    yield headers, "\n".join(movetext)
+                    headers = {}
+                    movetext = []
+                if tag:
+                    headers[tag.group(1)] = tag.group(2)
+            elif line and not line.startswith("%"):
+                movetext.append(line)
+        if movetext or headers:
+            yield headers, "\n".join(movetext)
+
+# Removes everything that isn't a move from the movetext of a game
+#
+# Parameters:
+#   game_data: the movetext of a game
+#
+# Returns the cleaned movetext
+def get_game_data(game_data):
+    game_data = re.sub(r"\{[^}]*\}", " ", game_data)
+    game_data = re.sub(r";[^\n]*", " ", game_data)
+    # Remove variations, starting with the innermost ones
+    while re.search(r"\([^()]*\)", game_data):
+        game_data = re.sub(r"\([^()]*\)", " ", game_data)
+    game_data = re.sub(r"\$[0-9]+", " ", game_data)
+    # Remove the move annotations (!, ?, !?, ?!, ...)
+    game_data = re.sub(r"[!?]+", "", game_data)
+    game_data = re.sub(r"[0-9]+\.(\.\.)?", " ", game_data)
     return game_data
 
 def get_moves(game_data):
-    moves = game_data.strip().split(" ")
-    moves = [move for move in moves if move != ""]
-    if "-" in moves[-1]:
+    moves = game_data.strip().split()
+    if moves and moves[-1] in ("1-0", "0-1", "1/2-1/2", "*"):
         moves.pop()
     return moves
 
@@ -49,35 +90,78 @@ def algebraic_to_uci(moves):
         uci_moves.append(board.push_san(move).uci())
     return uci_moves
 
-def write_to_file(output_file, uci_moves):
-    with open(output_file, "w") as f:
-        for move in uci_moves:
-            f.write(move + "\n")
-    
-    print("File written")
+# Gets the zobrist hash of every position of a game using our Board
+#
+# Parameters:
+#   uci_moves: the moves of the game
+#
+# Returns a list of hashes, the first is the starting position
+def get_hashes(uci_moves):
+    board = Board()
+    hashes = [board.get_zobrist_hash()]
+    for move in uci_moves:
+        board.move(Move.from_uci_str(move))
+        hashes.append(board.get_zobrist_hash())
+    return hashes
+
+# Converts one game (used by the worker processes)
+#
+# Parameters:
+#   game: a (headers, movetext) tuple from read_games()
+#   hashes: also compute the zobrist hash of every position
+#
+# Returns a tuple (uci moves, hashes, result), None if the game couldn't be converted
+def convert_game(game, hashes=True):
+    headers, movetext = game
+    # Games from another starting position can't be replayed from the start position
+    if "FEN" in headers:
+        return None
+
+    try:
+        uci_moves = algebraic_to_uci(get_moves(get_game_data(movetext)))
+    except ValueError:
+        return None
+    return uci_moves, get_hashes(uci_moves) if hashes else [], headers.get("Result", "*")
+
+# Converts every game of a PGN file and writes them to the output file
+#
+# Parameters:
+#   pgn_file: the path of the PGN file
+#   output_file: the path of the output file
+#   processes: the number of worker processes (default value is None - one per CPU)
+#   hashes: also write the zobrist hash of every position
+#
+# Returns a tuple (games converted, games skipped)
+def convert_pgn(pgn_file, output_file, processes=None, hashes=True):
+    converted = 0
+    skipped = 0
+    with Pool(processes) as pool, open(output_file, "w") as f:
+        # imap keeps the games in the same order as the PGN file
+        for result in pool.imap(partial(convert_game, hashes=hashes), read_games(pgn_file), CHUNK_SIZE):
+            if result is None:
+                skipped += 1
+                continue
+            uci_moves, game_hashes, game_result = result
+            f.write(game_result + "\t" + " ".join(uci_moves) + "\t" + " ".join(format(h, "x") for h in game_hashes) + "\n")
+            converted += 1
+    return converted, skipped
 
 def main():
-    pgn_file = get_pgn_file()
+    parser = argparse.ArgumentParser(description="Convert the games of a PGN file to UCI moves")
+    parser.add_argument("pgn_file", nargs="?", help="the PGN file to convert")
+    parser.add_argument("output_file", nargs="?", help="the file to write the converted games to")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--no-hashes", action="store_true", help="don't write the zobrist hashes of the positions")
+    args = parser.parse_args()
+
+    # Ask for the files if they weren't given
+    pgn_file = args.pgn_file if args.pgn_file and os.path.isfile(args.pgn_file) else None
     while pgn_file == None:
         pgn_file = get_pgn_file()
-    # output_file = get_output_file()
-    pgn_data = get_pgn_data(pgn_file)
-    print("PGN Data:")
-    print(pgn_data)
-    print()
-    game_data = get_game_data(pgn_data)
-    print("Game Data:")
-    print(game_data)
-    print()
-    moves = get_moves(game_data)
-    print("Moves:")
-    print(moves)
-    print()
-    uci_moves = algebraic_to_uci(moves)
-    # write_to_file(output_file, uci_moves)
-    print("UCI Moves:")
-    print("\n".join(uci_moves))
-    print()
+    output_file = args.output_file if args.output_file else get_output_file()
+
+    converted, skipped = convert_pgn(pgn_file, output_file, args.processes, not args.no_hashes)
+    print(f"Converted {converted} games ({skipped} skipped) to {output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,19 @@
+import json
+from Bench import run_bench, bench_position
+
+# Tests that the bench searches every depth and that the signature is the same every run
+def test_bench():
+    results = run_bench(2, ['endgame'], verbose=False)
+    assert len(results['positions']) == 5
+    assert len(results['time_to_depth']) == 2
+    assert results['nodes'] == sum(result['nodes'] for result in results['positions'])
+    assert results['signature'] == run_bench(2, ['endgame'], verbose=False)['signature']
+    # Results can be saved as JSON
+    assert json.loads(json.dumps(results))['signature'] == results['signature']
+
+# Tests the results of a single position
+def test_bench_position():
+    result = bench_position("k7/8/4n3/3P4/8/8/8/K7 w - - 0 1", 2)
+    assert result['best_move'] == 'd5e6'
+    assert result['nodes'] > 0
+    assert result['time_to_depth'][0] <= result['time_to_depth'][1] == result['time']
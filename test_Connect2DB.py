@@ -0,0 +1,70 @@
+import pytest
+import Connect2DB
+
+# Uses a new SQLite DB for every test
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setenv(Connect2DB.BACKEND_ENV, 'sqlite')
+    monkeypatch.setenv(Connect2DB.SQLITE_PATH_ENV, str(tmp_path / 'chess.db'))
+    Connect2DB.Connect2DB.shutdown()
+    connection = Connect2DB.Connect2DB()
+    yield connection
+    del connection
+    Connect2DB.Connect2DB.shutdown()
+
+# Tests that %s placeholders are converted for SQLite
+def test_convert_sql():
+    assert Connect2DB.convert_sql("SELECT * FROM engine WHERE EngineCode = %s", 'sqlite') == "SELECT * FROM engine WHERE EngineCode = ?"
+    assert Connect2DB.convert_sql("SELECT * FROM engine WHERE EngineCode = %s", 'mysql') == "SELECT * FROM engine WHERE EngineCode = %s"
+
+# Tests that registering an engine and saving its history are written in the background, in order
+def test_write_behind(db):
+    assert Connect2DB.Connect2DB._pool.backend == 'sqlite'
+    db.register_engine('1234', 'engine')
+    # The id of the history isn't known until the write-behind thread inserted it
+    assert db.set_History('e2e4 e7e5', 'fen', 'engine', '1234', 5) == None
+    db.set_History('d2d4', 'fen2', 'engine', '1234')
+    db.flush()
+
+    db.cursor.execute("SELECT idEngine FROM engine WHERE EngineCode = %s", ('1234',))
+    id_engine = db.cursor.fetchone()[0]
+    db.cursor.execute("SELECT moveHistory, FenString, idEngine, idOpeningBook FROM history ORDER BY idHistory")
+    assert db.cursor.fetchall() == [('e2e4 e7e5', 'fen', id_engine, 5), ('d2d4', 'fen2', id_engine, -1)]
+
+# Tests that set_History inserts the row right away and returns its id when wait is True
+def test_set_history_wait(db):
+    db.register_engine('1234', 'engine')
+    id_history = db.set_History('e2e4', 'fen', 'engine', '1234', wait=True)
+    db.cursor.execute("SELECT moveHistory FROM history WHERE idHistory = %s", (id_history,))
+    assert db.cursor.fetchall() == [('e2e4',)]
+    # Nothing is inserted for an engine that isn't registered
+    assert db.set_History('e2e4', 'fen', 'engine', '5678', wait=True) == None
+
+# Tests that a failing write only drops the writes with the same SQL, and that the error isn't printed to stdout (UCI)
+def test_write_error(db, capsys):
+    db.register_engine('1234', 'engine')
+    Connect2DB.Connect2DB._writer.put("INSERT INTO missing (id) VALUES (%s)", (1,))
+    db.set_History('e2e4', 'fen', 'engine', '1234')
+    db.flush()
+
+    db.cursor.execute("SELECT moveHistory FROM history")
+    assert db.cursor.fetchall() == [('e2e4',)]
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert 'Error writing to database' in captured.err
+
+# Tests that connections are only checked out of the pool while a statement runs, however many Connect2DB exist
+def test_pool_reuse(db):
+    pool = Connect2DB.Connect2DB._pool
+    connections = [Connect2DB.Connect2DB() for i in range(Connect2DB.POOL_SIZE * 2)]
+    for connection in connections:
+        connection.cursor.execute("INSERT INTO users (idEngine, username) VALUES (%s, %s)", (1, 'user'))
+        connection.register_engine('1234', 'engine')
+    db.flush()
+    assert pool.in_use() == 0
+
+    db.cursor.execute("SELECT username FROM users WHERE idEngine = %s", (1,))
+    assert len(db.cursor.fetchall()) == len(connections)
+    assert db.get_username(1) == ('user',)
+    assert db.get_username(2) == None
+    assert pool.in_use() == 0
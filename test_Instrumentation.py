@@ -0,0 +1,37 @@
+from Board import Board
+from generateTree import Tree, MovePicker
+from Instrumentation import Instrumentation
+
+# Tests that the hot path timers count calls while enabled and are removed when disabled
+def test_instrumentation():
+    original_move = Board.move
+    original_next = MovePicker.next
+
+    Instrumentation.enable()
+    Instrumentation.reset()
+    try:
+        assert Instrumentation.is_enabled()
+        assert Board.move is not original_move
+        tree = Tree(Board("k7/8/4n3/3P4/8/8/8/K7 w - - 0 1"), 2, q_depth=1)
+        while (tree.next()):
+            pass
+        summary = Instrumentation.get_summary()
+    finally:
+        Instrumentation.disable()
+
+    assert summary['Board.move']['calls'] > 0
+    assert summary['Board.undo_move']['calls'] > 0
+    assert summary['Board.evaluate']['calls'] > 0
+    assert summary['MovePicker.next']['calls'] > 0
+    assert summary['Board.move']['total_ms'] > 0
+    # Sorted by highest total time
+    totals = [hook['total_ms'] for hook in summary.values()]
+    assert totals == sorted(totals, reverse=True)
+
+    # The original methods are back and calls aren't counted anymore
+    assert not Instrumentation.is_enabled()
+    assert Board.move is original_move
+    assert MovePicker.next is original_next
+    calls = summary['Board.move']['calls']
+    Board().move(Board().get_all_legal_moves()[0])
+    assert Instrumentation.get_summary()['Board.move']['calls'] == calls
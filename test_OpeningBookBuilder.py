@@ -0,0 +1,49 @@
+import sqlite3
+from OpeningBookBuilder import OpeningBookBuilder, ShardedCounter
+from OpeningBookFile import OpeningBookFile
+from Connect2DB import SQLITE_SCHEMA
+from Board import Board, Move
+
+# Tests that counts are summed over the spill files
+def test_sharded_counter(tmp_path):
+    counter = ShardedCounter(str(tmp_path), shards=2, max_entries=2)
+    counter.add('a', (1, 0, 0))
+    counter.add('b', (0, 1, 0))
+    counter.add('c', (0, 0, 1))
+    counter.add('a', (0, 1, 0))
+    counter.add('a', (1, 0, 0))
+    assert counter.spills == 1
+    assert sorted(counter.items()) == [('a', [2, 1, 0]), ('b', [0, 1, 0]), ('c', [0, 0, 1])]
+
+# Tests that the book file and SQL file are built from the games
+def test_opening_book_builder(tmp_path):
+    builder = OpeningBookBuilder(str(tmp_path / 'spill'), max_ply=2, min_games=2, max_entries=2)
+    board = Board()
+    e4_hashes = [board.get_zobrist_hash()]
+    for move in ['e2e4', 'e7e5']:
+        board.move(Move.from_uci_str(move))
+        e4_hashes.append(board.get_zobrist_hash())
+    builder.add_game((['e2e4', 'e7e5'], e4_hashes, '1-0'))
+    builder.add_game((['e2e4', 'e7e5'], e4_hashes, '1/2-1/2'))
+    builder.add_game((['e2e4', 'c7c5'], [e4_hashes[0], e4_hashes[1], 3], '0-1'))
+    builder.add_game((['d2d4'], [e4_hashes[0], 4], '*'))
+    assert builder.games == 3
+    assert builder.skipped == 1
+
+    # Only moves played in at least 2 games are in the book
+    assert builder.write_book(str(tmp_path / 'book.bin')) == 2
+    book = OpeningBookFile(str(tmp_path / 'book.bin'))
+    # The learn value is the idOpeningBook of the line in the SQL file
+    assert [(str(move), weight, learn) for move, weight, learn in book.get_entries(e4_hashes[0])] == [('e2e4', 50, 1)]
+    # Black scored 1/4 after e7e5
+    assert [(str(move), weight, learn) for move, weight, learn in book.get_entries(e4_hashes[1])] == [('e7e5', 25, 1)]
+    book.close()
+
+    assert builder.write_sql(str(tmp_path / 'book.sql')) == 1
+    conn = sqlite3.connect(':memory:')
+    conn.executescript(SQLITE_SCHEMA)
+    conn.executescript((tmp_path / 'book.sql').read_text())
+    assert conn.execute("SELECT idOpeningBook, Moves, WinRate FROM openingbook").fetchall() == [(1, 'e2e4 e7e5', 0.75)]
+    board = Board()
+    board.move(Move.from_uci_str('e2e4'))
+    assert conn.execute("SELECT MoveNumber FROM openingbookfen WHERE Fen = ?", (board.get_fen(),)).fetchall() == [(1,)]
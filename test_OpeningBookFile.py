@@ -0,0 +1,56 @@
+from OpeningBookFile import OpeningBookFile, encode_move, decode_move, write_book, compile_book, ENTRY_SIZE
+from Board import Board, Move
+
+# Fake of Connect2DB with the opening lines in the openingbook table
+class FakeConnection:
+    class Cursor:
+        def execute(self, sql, params=None):
+            self.sql = sql
+
+        def fetchall(self):
+            return [(1, 'e2e4 e7e5 g1f3', 0.5), (2, 'e2e4 c7c5', 0.75), (3, 'd2d4 d7d5', 0.25)]
+
+    def __init__(self):
+        self.cursor = self.Cursor()
+
+# Tests that moves keep their coordinates and promotion when encoded
+def test_encode_move():
+    for move_str in ['e2e4', 'a1h8', 'h7h8q', 'b2a1n', 'e1g1']:
+        move = Move.from_uci_str(move_str)
+        assert decode_move(encode_move(move)) == move
+    # Same layout as Polyglot: e2e4 is from row 1 col 4 to row 3 col 4
+    assert encode_move(Move.from_uci_str('e2e4')) == 4 | 3 << 3 | 4 << 6 | 1 << 9
+
+# Tests that entries are found using binary search and the move with the highest weight is chosen
+def test_book_file_probe(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    board = Board()
+    start_key = board.get_zobrist_hash()
+    board.move(Move.from_uci_str('e2e4'))
+    e4_key = board.get_zobrist_hash()
+    entries = [(start_key, Move.from_uci_str('d2d4'), 10, 1), (start_key, Move.from_uci_str('e2e4'), 20, 2),
+               (e4_key, Move.from_uci_str('c7c5'), 5, 3), (1, Move.from_uci_str('a2a3'), 1, 4)]
+    assert write_book(path, entries) == 4
+
+    book = OpeningBookFile(path)
+    assert len(book) == 4
+    assert [(str(move), weight, learn) for move, weight, learn in book.get_entries(start_key)] == [('e2e4', 20, 2), ('d2d4', 10, 1)]
+    assert book.get_entries(2) == []
+    assert book.probe(board) == (Move.from_uci_str('c7c5'), 3)
+    board.move(Move.from_uci_str('c7c5'))
+    assert book.probe(board) == None
+    book.close()
+
+# Tests that the opening lines of the DB are replayed into book entries
+def test_compile_book(tmp_path):
+    path = str(tmp_path / 'book.bin')
+    assert compile_book(FakeConnection(), path) == 6
+    assert (tmp_path / 'book.bin').stat().st_size == 6 * ENTRY_SIZE
+
+    book = OpeningBookFile(path)
+    board = Board()
+    # e2e4 is in two lines, the weight and id of the line with the highest WinRate are kept
+    assert [(str(move), weight, learn) for move, weight, learn in book.get_entries(board.get_zobrist_hash())] == [('e2e4', 75, 2), ('d2d4', 25, 3)]
+    board.move(Move.from_uci_str('e2e4'))
+    assert sorted(str(move) for move, weight, learn in book.get_entries(board.get_zobrist_hash())) == ['c7c5', 'e7e5']
+    book.close()
@@ -0,0 +1,32 @@
+import json
+from Profiler import profile_bench, compare_hotspots
+
+# Tests that profiling the bench writes sorted hotspots and collapsed stacks that can be compared
+def test_profile_bench(tmp_path):
+    json_path, folded_path = profile_bench(depth=1, suites=['demo'], q_depth=1, output_dir=str(tmp_path))
+
+    with open(json_path) as f:
+        profile = json.load(f)
+    hotspots = profile['hotspots']
+    assert profile['signature'] > 0
+    assert [hotspot['tottime'] for hotspot in hotspots] == sorted((hotspot['tottime'] for hotspot in hotspots), reverse=True)
+    # Functions are labeled by file, qualified name and line, the same as in the collapsed stacks
+    functions = [hotspot['function'] for hotspot in hotspots]
+    assert len(functions) == len(set(functions))
+    assert len([function for function in functions if function.startswith('Board.py:Board.move:')]) == 1
+    assert len([function for function in functions if '.__init__:' in function and function.startswith('Board.py:')]) > 1
+
+    # Every line is "stack count", with the stack starting from the outermost call
+    with open(folded_path) as f:
+        lines = f.read().splitlines()
+    samples = 0
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        samples += int(count)
+        assert 'Profiler.py:profile_bench:' in stack
+        assert all(label in functions for label in stack.split(';') if label.startswith('Board.py:'))
+    assert samples == profile['samples']
+
+    # A profile compared with itself has no changes
+    changes = compare_hotspots(json_path, json_path)
+    assert all(old == new for function, old, new in changes)
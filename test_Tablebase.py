@@ -0,0 +1,128 @@
+import chess
+from Board import Board, Move
+import Tablebase as Tablebase_module
+from Tablebase import Tablebase
+from MiniMax import MiniMax
+
+# Tests that the python-chess board built from a Board matches the one parsed from the Board's FEN
+def test_to_chess_board():
+    board = Board('8/8/4k3/8/2p5/8/1P6/4K2R w K - 0 1')
+    chess_board = Tablebase.to_chess_board(board)
+    assert chess_board.board_fen() == chess.Board(board.get_fen()).board_fen()
+    assert chess_board.turn == chess.WHITE
+    # Castling rights aren't copied (not in Syzygy tablebases)
+    assert chess_board.castling_rights == 0
+    
+    # Black to move with en passant available
+    board.move(Move.from_uci_str('b2b4'))
+    chess_board = Tablebase.to_chess_board(board)
+    assert chess_board.board_fen() == chess.Board(board.get_fen()).board_fen()
+    assert chess_board.turn == chess.BLACK
+    assert chess_board.ep_square == chess.B3
+    assert chess.Move.from_uci('c4b3') in chess_board.legal_moves
+
+# Fake of chess.syzygy.Tablebase that counts the probes
+class CountingTablebase:
+    def __init__(self):
+        self.wdl_probes = 0
+        self.dtz_probes = 0
+
+    def probe_wdl(self, chess_board):
+        self.wdl_probes += 1
+        return 2 if chess_board.turn == chess.WHITE else -2
+
+    def probe_dtz(self, chess_board):
+        self.dtz_probes += 1
+        return 1
+
+# Tests that WDL results are cached by zobrist hash and the least recently used result is removed when full
+def test_wdl_cache(monkeypatch):
+    monkeypatch.setattr(Tablebase, 'load_tablebase', lambda self: CountingTablebase())
+    tablebase = Tablebase(wdl_cache_size=2)
+    board = Board('8/8/4k3/8/8/8/1P6/4K2R w - - 0 1')
+
+    assert tablebase.probeWDL(board) == (2, False)
+    assert tablebase.probeWDL(board) == (2, True)
+    assert tablebase.tablebase.wdl_probes == 1
+    assert tablebase.tablebase.dtz_probes == 0
+
+    # Fill the cache with two other positions, removing the first position
+    board.move(Move.from_uci_str('b2b4'))
+    assert tablebase.probeWDL(board) == (-2, False)
+    board.move(Move.from_uci_str('e6e5'))
+    assert tablebase.probeWDL(board) == (2, False)
+    board.undo_move()
+    board.undo_move()
+    assert tablebase.probeWDL(board) == (2, False)
+    assert tablebase.tablebase.wdl_probes == 4
+    assert tablebase.wdl_cache_hits == 1
+
+# Fake of chess.syzygy.Tablebase without any table file
+class MissingTablebase(CountingTablebase):
+    def probe_wdl(self, chess_board):
+        self.wdl_probes += 1
+        raise chess.syzygy.MissingTableError(f"did not find wdl table {chess.syzygy.calc_key(chess_board)}")
+
+# Tests that positions without a table are cached and the error is only printed to stderr once per material signature
+def test_wdl_cache_misses(monkeypatch, capsys):
+    monkeypatch.setattr(Tablebase, 'load_tablebase', lambda self: MissingTablebase())
+    tablebase = Tablebase()
+    board = Board('8/8/4k3/8/8/8/1P6/4K2R w - - 0 1')
+
+    assert tablebase.probeWDL(board) == None
+    assert tablebase.probeWDL(board) == None
+    assert tablebase.tablebase.wdl_probes == 1
+    # Another position with the same pieces is probed, but the error isn't printed again
+    board.move(Move.from_uci_str('b2b4'))
+    assert tablebase.probeWDL(board) == None
+    assert tablebase.tablebase.wdl_probes == 2
+
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert captured.err.count('KRPvK') == 1
+
+# Tests that the tablebase is shared, loaded lazily, and that prefetch only reads the 3-4-5 piece tables
+def test_shared_lazy_tablebase(monkeypatch, tmp_path):
+    assert Tablebase.get_instance() is Tablebase.get_instance()
+
+    monkeypatch.setattr(Tablebase_module, 'LOCAL_PATH', str(tmp_path / 'missing'))
+    tablebase = Tablebase()
+    assert tablebase.tablebase == None
+    assert not tablebase.available()
+    assert tablebase.probeWDL(Board('8/8/4k3/8/8/8/8/4K2R w - - 0 1')) == None
+    assert tablebase.prefetch() == 0
+
+    (tmp_path / 'KQvK.rtbw').write_bytes(b'\0' * 10)
+    (tmp_path / 'KQvK.rtbz').write_bytes(b'\0' * 20)
+    (tmp_path / 'KQRvKRR.rtbw').write_bytes(b'\0' * 40)
+    monkeypatch.setattr(Tablebase_module, 'LOCAL_PATH', str(tmp_path))
+    tablebase = Tablebase()
+    assert tablebase.available()
+    assert tablebase.prefetch() == 30
+
+# Fake tablebase where the rook is only winning while it is on the h file, with the lowest dtz on h8
+class RookFileTablebase:
+    def probe_wdl(self, chess_board):
+        return -2 if chess_board.pieces(chess.ROOK, chess.WHITE) & chess.BB_FILE_H else 0
+
+    def probe_dtz(self, chess_board):
+        return -3 if chess_board.piece_at(chess.H8) else -5
+
+# Tests that the root is probed before searching and the tablebase move is played without a full search
+def test_root_probe(monkeypatch):
+    monkeypatch.setattr(Tablebase, 'load_tablebase', lambda self: RookFileTablebase())
+    monkeypatch.setattr(Tablebase, '_instance', Tablebase())
+    board = Board('8/8/4k3/8/8/8/8/4K2R w - - 0 1')
+
+    best_move, best_moves = Tablebase.get_instance().probeRoot(board)
+    assert best_move == Move.from_uci_str('h1h8')
+    # Every king move and rook move on the h file keeps the win
+    assert len(best_moves) == 12
+    assert Move.from_uci_str('h1g1') not in best_moves
+    assert Tablebase.get_instance().getBestMove(board.get_fen()) == Move.from_uci_str('h1h8')
+
+    results = []
+    minimax = MiniMax(board, 4)
+    minimax.run(lambda stopped, best_child, depth_to_mate: results.append(best_child)).wait(5)
+    assert results[0].previous_move == Move.from_uci_str('h1h8')
+    assert minimax.info()['depth'] == 1
@@ -0,0 +1,80 @@
+import pytest
+from TimeManager import TimeManager
+from Board import Move
+
+# Tests the limits computed from the clock
+def test_time_manager_clock_limits():
+    # 40 seconds left and no increment is one second per move
+    time_manager = TimeManager(0.05, time_left=40000)
+
+    assert time_manager.is_limited()
+    assert time_manager.soft_limit() == pytest.approx(0.95)
+    assert time_manager.hard_limit() == pytest.approx(3 - 0.05)
+
+    # The increment is added to the time per move and movestogo replaces the estimated moves left
+    time_manager = TimeManager(0.05, time_left=10000, increment=1000, movestogo=10)
+    assert time_manager.soft_limit() == pytest.approx(2 - 0.05)
+
+    # The hard limit never uses more than half of the clock
+    time_manager = TimeManager(0.05, time_left=1000, movestogo=1)
+    assert time_manager.hard_limit() == pytest.approx(0.5 - 0.05)
+    assert time_manager.soft_limit() <= time_manager.hard_limit()
+
+# Tests the limits when there is no clock, a movetime, or a forced move
+def test_time_manager_other_limits():
+    time_manager = TimeManager(0.05)
+    assert not time_manager.is_limited()
+    assert time_manager.should_start_next_iteration()
+
+    time_manager = TimeManager(0.05, movetime=2000)
+    assert time_manager.soft_limit() == pytest.approx(1.95)
+    assert time_manager.hard_limit() == pytest.approx(1.95)
+
+    # Limits never drop below the minimum time limit
+    time_manager = TimeManager(0.05, movetime=10)
+    assert time_manager.hard_limit() == TimeManager.MIN_TIME_LIMIT
+
+    # Only one legal move so no time should be spent
+    time_manager = TimeManager(0.05, time_left=60000, legal_move_count=1)
+    assert time_manager.soft_limit() == 0
+    assert time_manager.hard_limit() == TimeManager.FORCED_MOVE_TIME
+    assert not time_manager.should_start_next_iteration()
+
+# Tests that the nps and branching factor are measured and used to predict the next iteration
+def test_time_manager_prediction():
+    time_manager = TimeManager(0.05, time_left=40000)
+    move = Move.from_uci_str('e2e4')
+
+    time_manager.record_iteration(100, 0.01, move, 0.5)
+    assert time_manager.get_nps() == pytest.approx(10000)
+    assert time_manager.get_branching_factor() == TimeManager.DEFAULT_BRANCHING_FACTOR
+
+    time_manager.record_iteration(1000, 0.1, move, 0.5)
+    assert time_manager.get_branching_factor() == pytest.approx(10)
+    assert time_manager.predict_next_iteration() == pytest.approx(1)
+    assert time_manager.should_start_next_iteration()
+
+    # An iteration of 10 seconds can not finish before the hard limit
+    time_manager.record_iteration(10000, 1, move, 0.5)
+    assert time_manager.predict_next_iteration() == pytest.approx(10)
+    assert not time_manager.should_start_next_iteration()
+
+# Tests that the soft limit is extended when the best move changes or the score drops
+def test_time_manager_extensions():
+    time_manager = TimeManager(0.05, time_left=40000)
+    soft_limit = time_manager.soft_limit()
+
+    time_manager.record_iteration(100, 0.01, Move.from_uci_str('e2e4'), 0.5)
+    assert time_manager.soft_limit() == pytest.approx(soft_limit)
+
+    # Best move changed
+    time_manager.record_iteration(1000, 0.1, Move.from_uci_str('d2d4'), 0.5)
+    assert time_manager.soft_limit() == pytest.approx(soft_limit * 1.5)
+
+    # Score dropped
+    time_manager.record_iteration(10000, 1, Move.from_uci_str('d2d4'), -0.5)
+    assert time_manager.soft_limit() == pytest.approx(soft_limit * 2.25)
+
+    # Extensions are capped
+    time_manager.record_iteration(10000, 1, Move.from_uci_str('e2e4'), -1.5)
+    assert time_manager.soft_limit() == pytest.approx(soft_limit * TimeManager.MAX_EXTENSION)
@@ -2937,4 +2937,163 @@ def get_white_score_from_fen_str(fen_str: str):
         # Add score to total score if white piece, subtract if black piece
         score += score_to_add if char.isupper() else -score_to_add
     
-    return score
\ No newline at end of file
+    return score
+
+# Test that the zobrist hash is the same whether the position was reached by moves or set from a FEN, including
+# promotions, castling and en passant captures, and that the hash preview matches the hash after the move
+def test_zobrist_hash_matches_fen():
+    moves = ['e2e4', 'd7d5', 'e4d5', 'c7c5', 'd5c6', 'g8f6', 'c6b7', 'e7e6', 'b7a8q', 'f8e7', 'g1f3', 'e8g8', 'f1e2', 'd8d5', 'e1g1']
+    board = Board()
+    hashes = []
+    for move in moves:
+        move = Move.from_uci_str(move)
+        preview_hash = board.update_zobrist_hash(move)
+        hashes.append(board.get_zobrist_hash())
+        assert board.move(move)
+        assert board.get_zobrist_hash() == preview_hash
+        assert board.get_zobrist_hash() == Board(board.get_fen()).get_zobrist_hash()
+    
+    for prev_hash in reversed(hashes):
+        board.undo_move()
+        assert board.get_zobrist_hash() == prev_hash
+
+    # Promoting to different pieces gives different hashes
+    board = Board('k7/4P3/8/8/8/8/8/K7 w - - 0 1')
+    assert board.update_zobrist_hash(Move.from_uci_str('e7e8q')) != board.update_zobrist_hash(Move.from_uci_str('e7e8n'))
+
+# Test that the legal captures are the captures, en passant captures and promotions of the legal moves
+def test_get_legal_captures():
+    # En passant (the last move was d7d5) and a promotion without a capture
+    board = Board('k7/6P1/8/3pP3/8/8/8/K7 w - d6 0 1')
+    captures = [str(move) for move in board.get_legal_captures()]
+    assert 'e5d6' in captures
+    assert set(['g7g8q', 'g7g8r', 'g7g8b', 'g7g8n']).issubset(captures)
+    assert 'e5e6' not in captures and 'a1b1' not in captures
+
+    # A pinned piece can't capture off the pin line
+    board = Board('4r2k/8/8/8/8/3p4/4B3/4K3 w - - 0 1')
+    assert 'e2d3' not in [str(move) for move in board.get_legal_captures()]
+    # A capture that doesn't get out of check isn't legal
+    board = Board('k7/8/8/3q4/8/1r6/2B5/3K4 w - - 0 1')
+    assert 'c2b3' not in [str(move) for move in board.get_legal_captures()]
+
+    # Compare with the legal moves of random games (captures are generated before the legal moves are cached)
+    random.seed(7)
+    for _ in range(5):
+        board = Board()
+        for _ in range(60):
+            captures = board.get_legal_captures()
+            legal_moves = board.get_all_legal_moves()
+            if (len(legal_moves) == 0):
+                break
+            expected = []
+            for move in legal_moves:
+                from_piece = board._board_arr[move.from_coord.row][move.from_coord.col]
+                to_piece = board._board_arr[move.to_coord.row][move.to_coord.col]
+                if (to_piece != None or move.promotion != None or
+                    (from_piece.Type == PieceType.PAWN and move.from_coord.col != move.to_coord.col)):
+                    expected.append(move)
+            assert captures == expected
+            # The cached legal moves are filtered the same way
+            assert board.get_legal_captures() == expected
+            # Prefer captures so the games have more of them
+            board.move(random.choice(captures if captures and random.random() < 0.5 else legal_moves))
+
+# Test that the pin and check masks only allow the legal moves of pinned pieces, check evasions and en passant
+def test_legal_move_masks():
+    # A pinned pawn can push along the pin line but not capture off it
+    board = Board('8/4r3/k7/3p4/4P3/8/4K3/8 w - - 0 1')
+    moves = [str(move) for move in board.get_all_legal_moves()]
+    assert 'e4e5' in moves and 'e4d5' not in moves
+
+    # A pinned rook can move along the pin line and capture the pinning piece
+    board = Board('k3r3/8/8/8/4R3/8/8/4K3 w - - 0 1')
+    moves = [str(move) for move in board.get_all_legal_moves()]
+    assert set(['e4e2', 'e4e3', 'e4e5', 'e4e6', 'e4e7', 'e4e8']).issubset(moves)
+    assert 'e4d4' not in moves
+
+    # The king can't move away from a checking rook along the line of the check
+    board = Board('k3r3/8/8/8/8/8/8/4K3 w - - 0 1')
+    moves = [str(move) for move in board.get_all_legal_moves()]
+    assert 'e1e2' not in moves and 'e1d1' in moves
+
+    # Double check - only the king can move
+    board = Board('k3r3/8/8/8/8/8/5n2/R3K3 w - - 0 1')
+    assert all(str(move).startswith('e1') for move in board.get_all_legal_moves())
+
+    # En passant is illegal if both pawns leave the rank of the king and a rook attacks it
+    board = Board('8/8/8/KPp4r/8/8/8/7k w - c6 0 1')
+    assert 'b5c6' not in [str(move) for move in board.get_all_legal_moves()]
+    # En passant can capture the pawn giving check
+    board = Board('8/8/8/3k4/3pP3/8/8/4K3 b - e3 0 1')
+    moves = [str(move) for move in board.get_all_legal_moves()]
+    assert 'd4e3' in moves
+    assert board._is_game_over() == False
+
+
+def test_move_causes_check():
+    def gives_check(fen, move):
+        board = Board(fen)
+        return board.move_causes_check(Move.from_uci_str(move))
+
+    # Direct checks, including from row and col 0
+    assert gives_check('k7/8/8/8/8/8/8/4K2R w - - 0 1', 'h1h8') == True
+    assert gives_check('k7/8/8/8/8/8/8/4K2R w - - 0 1', 'h1h7') == False
+    assert gives_check('7k/8/8/8/8/8/8/B3K3 w - - 0 1', 'a1b2') == True
+    assert gives_check('k7/8/8/8/8/8/8/4K1N1 w - - 0 1', 'g1f3') == False
+    assert gives_check('k7/8/8/8/8/8/8/4KN2 w - - 0 1', 'f1d2') == False
+    assert gives_check('k7/8/8/8/2N5/8/8/4K3 w - - 0 1', 'c4b6') == True
+    assert gives_check('8/8/2k5/8/1P6/8/8/4K3 w - - 0 1', 'b4b5') == True
+    # A blocked line doesn't give check
+    assert gives_check('k7/p7/8/8/8/8/8/4K2R w - - 0 1', 'h1a1') == False
+
+    # A rook moving along the line it was blocking, and a promotion on the line the pawn was blocking
+    assert gives_check('4k3/8/8/8/4R3/8/8/K7 w - - 0 1', 'e4e7') == True
+    assert gives_check('1K1k4/8/8/8/8/8/1p6/8 b - - 0 1', 'b2b1q') == True
+    assert gives_check('1K1k4/8/8/8/8/8/1p6/8 b - - 0 1', 'b2b1n') == False
+
+    # Discovered check
+    assert gives_check('4k3/8/8/4N3/8/8/4R3/K7 w - - 0 1', 'e5c6') == True
+    assert gives_check('4k3/8/8/4R3/8/8/4R3/K7 w - - 0 1', 'e5e6') == True
+    assert gives_check('4k3/8/8/4P3/8/8/4R3/K7 w - - 0 1', 'e5e6') == False
+
+    # The cache is reset after a move and an undo
+    board = Board('k7/8/8/8/8/8/8/4K2R w - - 0 1')
+    assert board.move_causes_check(Move.from_uci_str('h1h8')) == True
+    board.move(Move.from_uci_str('e1e2'))
+    assert board.move_causes_check(Move.from_uci_str('a8b8')) == False
+    board.undo_move()
+    assert board.move_causes_check(Move.from_uci_str('h1h8')) == True
+
+def test_moves_match_fen_board():
+    def valid_move_coords(board):
+        coords = {}
+        for piece_type in PieceType:
+            for team in TeamColor:
+                for coord, action_info in board._pieces.get_piece_locations_and_action_info(piece_type, team).items():
+                    coords[(piece_type, team, str(coord))] = sorted(str(valid_coord) for valid_coord in action_info.valid_move_coords)
+        return coords
+
+    # Plays the moves (None undoes the last move) and checks the board matches one set up from it's fen after each move
+    def check_moves(fen, moves):
+        board = Board(fen)
+        for move in moves:
+            if (move == None):
+                board.undo_move()
+            else:
+                board.move(Move.from_uci_str(move))
+            fen_board = Board(board.get_fen())
+            assert valid_move_coords(board) == valid_move_coords(fen_board)
+            assert board._get_mobility() == fen_board._get_mobility()
+            assert sorted(str(move) for move in board.get_all_legal_moves()) == sorted(str(move) for move in fen_board.get_all_legal_moves())
+
+    # Undoing a capture in the same direction as a knight that attacks the captured piece
+    check_moves('3q2r1/rbpp2pp/3b2k1/pP2p3/4p1PP/1QNP1PnR/PP2N1K1/R1B2B2 w - - 2 21', ['d3e4', None])
+    # Undoing en passant with a bishop behind the capturing pawn
+    check_moves('r1bk4/2qp4/p1nb2p1/4p1P1/1p2P3/1PP1BP2/P2Q4/RN2K3 w - - 0 38', ['a2a4', 'b4a3', None])
+    # Undoing en passant with a rook behind the captured pawn
+    check_moves('1nb2k1r/rppp2p1/5n2/4P1Bp/p3p3/NPP2N1q/P2R1PP1/2K2B1R b - - 0 19', ['d7d5', 'e5d6', None])
+    # Undoing en passant on a row with a rook beside the pawns
+    check_moves('8/2p5/8/NP5r/1R3p1k/4P3/6P1/K7 b - - 0 1', ['c7c5', 'b5c6', None])
+    # Castling is only available to the team whose turn it is, and is lost when the rook or king moves
+    check_moves('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', ['h1h2', 'a8a7', 'h2h1', 'e8g8', None, 'e8f8'])
@@ -1,5 +1,6 @@
 import io
 from CommandLine import CommandLine
+from Instrumentation import Instrumentation
 
 # This class is used to test the CommandLine class. It tests the following methods:
 #     - run_command_loop
@@ -27,7 +28,7 @@ class TestCommandLine:
     # into the GUI. 
     def test_many_commands(self, capsys, monkeypatch):
         # Test that the command loop outputs the expected output when the user types many commands
-        input_str = 'uci\ndebug on\nisready\nsetoption name TestOption value 2\nquit\n'
+        input_str = 'uci\ndebug on\nisready\nsetoption name TestOption value 2\ndebug off\nquit\n'
         monkeypatch.setattr('sys.stdin', io.StringIO(input_str))
         command_line = CommandLine()
         command_line.run_command_loop()
@@ -62,6 +63,10 @@ class TestCommandLine:
         command_line.run_command_loop()
         captured = capsys.readouterr()
         assert 'debug - True\n' in captured.out
+        # Debug mode installs the hot path timers until it is turned off
+        assert Instrumentation.is_enabled()
+        command_line.process_command('debug off')
+        assert not Instrumentation.is_enabled()
 
     # Tests that the ucinewgame method of the CommandLine class prints the expected output
     def test_ucinewgame_command(self, capsys, monkeypatch):
@@ -93,6 +98,33 @@ class TestCommandLine:
         command_line.run_command_loop()
         assert command_line._board.get_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2'
 
+    # Tests that the position method only plays the new moves when the moves extend the last position
+    def test_position_command_incremental(self, capsys, monkeypatch):
+        monkeypatch.setattr('sys.stdin', io.StringIO('uci\nquit\n'))
+        command_line = CommandLine()
+        command_line.run_command_loop()
+        command_line.process_command('position startpos moves e2e4')
+        board = command_line._board
+        command_line.process_command('position startpos moves e2e4 e7e5')
+        # The same board is used with only e7e5 played on it
+        assert command_line._board is board
+        assert len(board.get_previous_moves_as_str().split()) == 2
+        assert board.get_fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2'
+
+        # A different line sets up the board again
+        command_line.process_command('position startpos moves d2d4')
+        assert command_line._board.get_fen() == 'rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq d3 0 1'
+
+    # Tests that the bench command prints the totals of the bench
+    def test_bench_command(self, capsys, monkeypatch):
+        input_str = 'uci\nbench 1\nquit\n'
+        monkeypatch.setattr('sys.stdin', io.StringIO(input_str))
+        command_line = CommandLine()
+        command_line.run_command_loop()
+        captured = capsys.readouterr()
+        assert 'Nodes searched' in captured.out
+        assert 'Signature' in captured.out
+
     # Tests that the go method of the CommandLine class prints the expected output
     def test_go_command(self, capsys, monkeypatch):
         # Test that the "go" command prints the expected output
@@ -114,6 +146,16 @@ class TestCommandLine:
         captured = capsys.readouterr()
         assert 'e2e4' in captured.out
 
+    # Tests that the go method of the CommandLine class sends the move it expects the user to play as the ponder move
+    def test_go_command_with_ponder_move(self, capsys, monkeypatch):
+        # Test that the "bestmove" output includes the reply from the principal variation
+        input_str = 'uci\nposition startpos\ngo depth 2\nquit\n'
+        monkeypatch.setattr('sys.stdin', io.StringIO(input_str))
+        command_line = CommandLine()
+        command_line.run_command_loop()
+        captured = capsys.readouterr()
+        assert 'bestmove ' + str(command_line.best_move) + ' ponder ' + str(command_line.ponder_move) in captured.out
+
     # Tests that the go method of the CommandLine class prints the expected output when given a movetime as a 
     # # time limit
     # def test_go_command_with_movetime(self, capsys, monkeypatch):
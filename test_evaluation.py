@@ -1,4 +1,4 @@
-from Board import Board
+from Board import Board, Move, TeamColor
 
 '''
 This class is used to test the evaluation methods in the Board class. It tests the following methods:
@@ -102,4 +102,61 @@ class TestEvaluation:
         assert board._pawn_structure() == 4
 
     
-    
\ No newline at end of file
+    
+    # Test that the running material and pawn column totals match a freshly created board after moves and undos
+    # (captures, en passant and promotions)
+    def test_incremental_material_and_pawn_columns(self):
+        def assert_totals_match(board):
+            fresh_board = Board(board.get_fen())
+            assert board._count_material() == fresh_board._count_material()
+            assert board.get_total_material() == fresh_board.get_total_material()
+            assert board._pieces.get_pawn_columns(TeamColor.WHITE) == fresh_board._pieces.get_pawn_columns(TeamColor.WHITE)
+            assert board._pieces.get_pawn_columns(TeamColor.BLACK) == fresh_board._pieces.get_pawn_columns(TeamColor.BLACK)
+            assert board._pawn_structure() == fresh_board._pawn_structure()
+
+        board = Board('r3k2r/1ppp1pP1/8/4P3/8/8/P1PP1P2/R3K2R b KQkq - 0 1')
+        start_material = board._count_material()
+        start_total = board.get_total_material()
+        # Double pawn push, en passant capture, capture promotion, capture
+        moves = ['d7d5', 'e5d6', 'c7d6', 'g7h8q', 'e8d7', 'h8a8']
+        for move in moves:
+            board.move(Move.from_uci_str(move))
+            assert_totals_match(board)
+        
+        for i in range(len(moves)):
+            board.undo_move()
+            assert_totals_match(board)
+        
+        assert board._count_material() == start_material
+        assert board.get_total_material() == start_total
+
+    # Test that the pawn hash only depends on the pawns and that pawn structure scores are cached
+    def test_pawn_hash_and_pawn_table(self):
+        board = Board()
+        start_hash = board.get_pawn_hash()
+
+        # Knight moves don't change the pawn hash
+        board.move(Move.from_uci_str('g1f3'))
+        assert board.get_pawn_hash() == start_hash
+        board.move(Move.from_uci_str('e7e5'))
+        assert board.get_pawn_hash() != start_hash
+        
+        # Same pawn structure reached a different way has the same pawn hash
+        assert board.get_pawn_hash() == Board('rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1').get_pawn_hash()
+
+        board.undo_move()
+        board.undo_move()
+        assert board.get_pawn_hash() == start_hash
+
+        # Second score of the same pawn structure comes from the pawn table
+        Board._pawn_table.clear()
+        assert board._pawn_structure() == Board()._pawn_structure()
+        assert Board._pawn_table.hits == 1
+        assert Board._pawn_table.misses == 1
+
+    # Test the mobility term (pseudo-legal moves of white minus pseudo-legal moves of black)
+    def test_mobility(self):
+        assert Board()._get_mobility() == 0
+        # White has 20 moves. After e7e5 black has 15 pawn, 5 knight, 5 bishop, 4 queen and 1 king move
+        board = Board('rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+        assert board._get_mobility() == 20 - 30
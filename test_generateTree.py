@@ -1,5 +1,6 @@
 import pytest
-from generateTree import Tree, Node
+from generateTree import Tree, Node, EvalCache, SearchStats, MovePicker, SearchState
+import json
 from Board import Board, Move
 import copy
 
@@ -47,6 +48,23 @@ def test_node_load_legal_moves():
     assert Move.from_uci_str('d1e2') in m1
     assert Move.from_uci_str('d1e1') in m1
 
+# Tests a reused node is the same as a new node
+def test_node_reset():
+    root = Node(None)
+    node = Node(root)
+    node._load_legal_moves(Board('3k4/8/1p6/2p5/1P6/2P5/8/3K4 w - - 0 1'))
+    node._next_move()
+    node.score = 5
+    assert len(node._get_legal_moves()) == 7
+
+    node._reset(None)
+    assert node.parent == None
+    assert node.level == 0
+    assert node.score == float('-inf')
+    assert node._next_move() == None
+    # Fields are fixed so nodes stay small
+    assert not hasattr(node, '__dict__')
+
 # Tests tree initialization values
 def test_tree_constructor():
     board = Board('3k4/8/1p6/2p5/1P6/2P5/8/3K4 w - - 0 1')
@@ -113,4 +131,139 @@ def check_moves(startboard : Board, node : Node, moves : list):
     startboard.move(node.child.previous_move)
     moves[node.level].remove(node.child.previous_move)
     
-    check_moves(startboard, node.child, moves)
\ No newline at end of file
+    check_moves(startboard, node.child, moves)
+
+# Tests the static evaluation cache
+def test_eval_cache():
+    cache = EvalCache(size=4)
+    board = Board()
+
+    assert cache.get(board.get_zobrist_hash()) == None
+    cache.store(board.get_zobrist_hash(), board.evaluate())
+    assert cache.get(board.get_zobrist_hash()) == 0
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+    # The same position reached through a different move order has the same hash
+    board1 = Board()
+    for move in ['g1f3', 'g8f6', 'b1c3']:
+        board1.move(Move.from_uci_str(move))
+    board2 = Board()
+    for move in ['b1c3', 'g8f6', 'g1f3']:
+        board2.move(Move.from_uci_str(move))
+    cache.store(board1.get_zobrist_hash(), board1.evaluate())
+    assert cache.get(board2.get_zobrist_hash()) == board2.evaluate()
+
+    # A different position in the same slot replaces the old entry
+    cache.store(board.get_zobrist_hash() + 4, 1)
+    assert cache.get(board.get_zobrist_hash()) == None
+
+# Tests the search statistics
+def test_search_stats(tmp_path):
+    board = Board("k7/8/4n3/3P4/8/8/8/K7 w - - 0 1")
+    stats = SearchStats()
+    tree = Tree(board, 2, stats=stats)
+    while (tree.next()):
+        pass
+
+    # Statistics don't change the search
+    tree_no_stats = Tree(board, 2)
+    while (tree_no_stats.next()):
+        pass
+    assert tree.get_stats() == stats
+    assert tree_no_stats.get_stats() == None
+    assert tree.get_nodes_searched() == tree_no_stats.get_nodes_searched()
+    assert tree.best_move() == tree_no_stats.best_move()
+
+    # Every node searched is counted at its ply
+    assert sum(stats.nodes) + sum(stats.q_nodes) == tree.get_nodes_searched()
+    assert stats.nodes[0] == 0 and stats.nodes[1] == len(board.get_all_legal_moves())
+    assert sum(stats.first_move_cutoffs) <= sum(stats.beta_cutoffs)
+    assert all(hits <= probes for hits, probes in zip(stats.tt_hits, stats.tt_probes))
+    assert sum(stats.eval_calls) > 0
+
+    path = tmp_path / "stats.json"
+    stats.dump(str(path))
+    with open(path) as f:
+        dumped = json.load(f)
+    assert dumped['totals']['nodes'] == sum(stats.nodes)
+    assert len(dumped['nodes']) == stats.max_ply()
+    # The root isn't counted as a node, so the first branching factor is from ply 1 to ply 2
+    assert dumped['branching_factors'][0] == stats.nodes[2] / stats.nodes[1]
+
+# Tests the MovePicker picks every move once, stage by stage
+def test_move_picker():
+    board = Board('8/7k/8/3p1r2/4P3/8/8/3QK3 w - - 0 1')
+    legal_moves = board.get_all_legal_moves()
+    # The second killer move isn't legal in this position
+    picker = MovePicker(board, legal_moves, dict(), [Move.from_uci_str('e1e2'), Move.from_uci_str('a1a2')])
+    moves = []
+    move = picker.next()
+    while (move != None):
+        moves.append(str(move))
+        move = picker.next()
+
+    assert picker.stage() == MovePicker.DONE
+    assert sorted(moves) == sorted(str(move) for move in legal_moves)
+    # Good captures by MVV/LVA, then the killer move, then quiet moves with checks first, then the bad capture
+    assert moves[:3] == ['e4f5', 'e4d5', 'e1e2']
+    assert moves[3] == 'd1h5'
+    assert moves[-1] == 'd1d5'
+
+    # The hash move of the position is picked first, a hash move of another position isn't picked
+    hash_move = Move.from_uci_str('d1d3')
+    picker = MovePicker(board, board.get_all_legal_moves(), {board.get_zobrist_hash(): hash_move,
+                                                             board.update_zobrist_hash(hash_move): Move.from_uci_str('e4f5')}, [])
+    assert picker.next() == hash_move
+    assert picker.next() == Move.from_uci_str('e4f5')
+    assert picker.stage() == MovePicker.GOOD_CAPTURES
+
+# Tests the SearchState is kept when the root moves two plies down the PV and cleared otherwise
+def test_search_state():
+    board = Board('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1')
+    state = SearchState()
+    assert state.set_root(board) == None
+    tree = Tree(board, 3, q_depth=2, search_state=state)
+    while (tree.next()):
+        pass
+    pv = tree.get_pv()
+    state.update(board, pv)
+    assert len(pv) == 3 and state.pv == pv
+    assert state.hash_moves[board.get_zobrist_hash()] == pv[0]
+    assert len(state.killer_moves) == 4
+    # Another iteration from the same root keeps everything
+    assert state.set_root(board) == 0 and state.pv == pv
+
+    # The next tree searches the PV first
+    tree = Tree(board, 2, q_depth=2, search_state=state)
+    assert tree.root()._next_move() == pv[0]
+
+    # Our move and the expected reply were played
+    board.move(pv[0])
+    board.move(pv[1])
+    assert state.set_root(board) == 2
+    assert state.pv == pv[2:]
+    assert len(state.hash_moves) > 0
+
+    # Another reply was played
+    board.move(pv[2])
+    replies = board.get_all_legal_moves()
+    board.undo_move()
+    state.update(board, [pv[2], replies[0]])
+    board.move(pv[2])
+    board.move(replies[1])
+    assert state.set_root(board) == 2
+    assert state.pv == []
+
+    # An unrelated position clears the state
+    assert state.set_root(Board()) == None
+    assert state.pv == [] and len(state.hash_moves) == 0 and state.killer_moves == []
+
+    # Too many hash moves clears the state
+    board = Board('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1')
+    state.update(board, pv)
+    state.hash_moves.update((i, pv[0]) for i in range(SearchState.MAX_TT_SIZE + 1))
+    board.move(pv[0])
+    board.move(pv[1])
+    assert state.set_root(board) == None
+    assert state.pv == [] and len(state.hash_moves) == 0
@@ -0,0 +1,66 @@
+from pgn_to_uci_converter import read_games, convert_game, convert_pgn
+from Board import Board, Move
+
+PGN = """[Event "Game 1"]
+[Result "1-0"]
+
+1. e4 {best by test} e5 2. Nf3 (2. f4 exf4) Nc6 3. Bb5 $1 a6
+1-0
+
+[Event "Game 2"]
+[Result "1/2-1/2"]
+
+1. d4 d5 2. c4 1/2-1/2
+
+[Event "Game 3"]
+[FEN "8/8/4k3/8/8/8/8/4K2R w - - 0 1"]
+
+1. Rh6+ *
+"""
+
+# Tests that the games are read one at a time and converted to UCI moves and hashes
+def test_convert_game(tmp_path):
+    pgn_file = tmp_path / "games.pgn"
+    pgn_file.write_text(PGN)
+    games = list(read_games(str(pgn_file)))
+    assert len(games) == 3
+    assert games[0][0]["Event"] == "Game 1"
+
+    uci_moves, hashes, result = convert_game(games[0])
+    assert uci_moves == ["e2e4", "e7e5", "g1f3", "b8c6", "f1b5", "a7a6"]
+    assert result == "1-0"
+    assert len(hashes) == 7
+    board = Board()
+    for move in uci_moves[:2]:
+        board.move(Move.from_uci_str(move))
+    assert hashes[2] == board.get_zobrist_hash()
+
+    # Games that don't start from the start position are skipped
+    assert convert_game(games[2]) == None
+
+# Tests that every game is written to the output file in order
+def test_convert_pgn(tmp_path):
+    pgn_file = tmp_path / "games.pgn"
+    pgn_file.write_text(PGN)
+    output_file = tmp_path / "games.txt"
+    assert convert_pgn(str(pgn_file), str(output_file), processes=2, hashes=False) == (2, 1)
+    assert output_file.read_text().splitlines() == ["1-0\te2e4 e7e5 g1f3 b8c6 f1b5 a7a6\t", "1/2-1/2\td2d4 d7d5 c2c4\t"]
+
+# Tests that a ";" comment only removes the rest of its line and that a game without movetext isn't merged into the
+# next game
+def test_read_games_comments(tmp_path):
+    pgn_file = tmp_path / "games.pgn"
+    pgn_file.write_text('[Event "Game 1"]\n[Result "*"]\n\n[Event "Game 2"]\n[Result "1-0"]\n\n'
+                        + '1. e4 ; king pawn\ne5 2. Nf3 Nc6 1-0\n')
+    games = list(read_games(str(pgn_file)))
+    assert len(games) == 2
+    assert games[0] == ({"Event": "Game 1", "Result": "*"}, "")
+    assert games[1][0]["Event"] == "Game 2"
+    assert convert_game(games[1], hashes=False) == (["e2e4", "e7e5", "g1f3", "b8c6"], [], "1-0")
+
+# Tests that the move annotations are removed from the moves
+def test_convert_game_annotations(tmp_path):
+    pgn_file = tmp_path / "games.pgn"
+    pgn_file.write_text('[Event "Game 1"]\n[Result "*"]\n\n1. e4!! e5?! 2. Nf3! Nc6? 3. Bb5!? *\n')
+    games = list(read_games(str(pgn_file)))
+    assert convert_game(games[0], hashes=False) == (["e2e4", "e7e5", "g1f3", "b8c6", "f1b5"], [], "*")